@@ -1,35 +1,50 @@
+from __future__ import annotations
+
 import gdb
 import os
-import sys
-import importlib
-import re
 import time
 import json
 import os
-from typing import Dict, Iterable, Optional, List, Tuple, Union, Set
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, List, Tuple, Union, Set
 
 # --- Setup ---
 
-# import plugin name from config.py
-# currently we only allow 1 plugin at a time
+# Sourcing main.py only has to register the commands. elftools (through the
+# DWARF modules), the call graph and the runtime plugins are imported when a
+# command first needs them; `async-startup-times` shows what loaded when.
+
+# import plugin names from config.py
 from core.config import (
-    PLUGIN_NAME,
+    PLUGIN_NAMES,
     CALL_GRAPH_DOT_PATH,
     ENABLE_SYNC_DESCENDANTS,
     ENABLE_ASYNC_DESCENDANTS,
     SYNC_DESCENDANT_DEPTH,
     SYNC_DESCENDANT_EXCLUDE_PREFIXES,
+    SYNC_DESCENDANT_BUDGET,
+    COUNT_ONLY_SYNC_DESCENDANTS,
+    COUNT_ONLY_PATTERNS,
 )
-from core.callgraph import find_call_graph, CallGraph
-if not PLUGIN_NAME:
-    print("[rust-future-tracing] No plugin name specified in config.py. Please set PLUGIN_NAME.")
-    sys.exit(1)
+from core.sampling import sampling_policy_for
+from core.governor import governor, AsyncGovernorCommand
+from core.counting import install_counting_breakpoints, AsyncCountsCommand
+from core.future_polls import FuturePollIndex, is_fresh
+from core.tracers.base import TracerSet
+from core.tracers.timestamp import thread_clock
+from core.flamegraph import write_folded, write_speedscope
+from core.runtime_plugins.base import RuntimePlugin
+from core.runtime_plugins.registry import registry
+from core.init_dwarf_analysis import get_dwarf_tree, get_library_tree
+
+if TYPE_CHECKING:
+    from core.callgraph import CallGraph
+    from elftools.dwarf.die import DIE
 
-from core.init_dwarf_analysis import get_dwarf_tree
-from core.dwarf.tree import load_children
-from core.dwarf.dwarfutil import safe_DIE_name, DIE_has_name
-from elftools.dwarf.die import DIE
-from elftools.dwarf.compileunit import CompileUnit
+
+def safe_DIE_name(die, default=''):
+    # core.dwarf.dwarfutil imports elftools; by the time there are DIEs to name it is loaded anyway
+    from core.dwarf.dwarfutil import safe_DIE_name
+    return safe_DIE_name(die, default)
 
 
 
@@ -40,6 +55,7 @@ from elftools.dwarf.compileunit import CompileUnit
 #   "symbol_name": [
 #     {
 #       "thread_id": gdb.Thread.ptid,
+#       "sample_weight": hits this invocation stands for (see core/sampling.py),
 #       "entry_tracers": { "TracerClassName": data, ... },
 #       "exit_tracers": { "TracerClassName": data, ... }
 #     },
@@ -52,49 +68,79 @@ traced_data = {}
 # This list holds temporary commands for breakpoints.
 bp_commands = []
 
+# Sampling policy of every sampled instrument point, by symbol.
+sampling_policies = {}
+
 # Make bp_commands available in GDB's global namespace
 import __main__
 __main__.bp_commands = bp_commands
 
-def run_tracers(symbol_name, entry_tracers, exit_tracers):
+def run_tracers(symbol_name, entry_tracers, exit_tracers, sample_weight=1, resumed_at=None):
     """
     Called by the temporary breakpoint's command to run tracers
-    after the function prolog has safely completed.
+    after the function prolog has safely completed. `entry_tracers` and
+    `exit_tracers` are the instrument point's `TracerSet`s; `resumed_at` is
+    when the entry breakpoint's stop() returned, for the governor.
     """
+    started = time.perf_counter()
     thread = gdb.selected_thread()
     if symbol_name not in traced_data:
         traced_data[symbol_name] = []
     
     invocation_data = {
         "thread_id": thread.ptid,
-        "entry_tracers": {},
+        "timestamp": time.time(),
+        "sample_weight": sample_weight,
+        "entry_tracers": None,
         "exit_tracers": {},
     }
     traced_data[symbol_name].append(invocation_data)
 
-    for tracer_factory in entry_tracers:
-        tracer = tracer_factory()
-        tracer.start(thread)
-        invocation_data["entry_tracers"][str(tracer)] = tracer.read_data()
+    invocation_data["entry_tracers"] = entry_tracers.run(thread, sample_weight)
+
+    dispatch_event(symbol_name, "entry", invocation_data)
 
     if exit_tracers:
         FinishBreakpoint(gdb.newest_frame(), symbol_name, invocation_data, exit_tracers)
+    finished = time.perf_counter()
+    if resumed_at is not None:
+        governor.record_round_trip(symbol_name, finished - resumed_at)
+        # The thread's clock stopped at the entry stop; the trap before it and the continue after are untimed
+        thread_clock.resume(thread.ptid)
+        thread_clock.charge(thread.ptid, int(governor.stop_seconds * 1e9))
+    else:
+        governor.record(symbol_name, finished - started)
 
 # Make run_tracers available in GDB's global namespace since it's called by the instrumentation framework
 __main__.run_tracers = run_tracers
 
+def dispatch_event(symbol_name, phase, invocation_data):
+    """Let every plugin instrumenting the symbol update its live model from one breakpoint hit."""
+    for plugin, plugin_symbol in registry.subscribers(symbol_name):
+        try:
+            plugin.on_event(plugin_symbol, phase, invocation_data)
+        except Exception as e:
+            print(f"[rust-future-tracing] WARNING: plugin {plugin.name} failed to handle {phase} of {symbol_name}: {e}")
+
 
-# --- Load Plugin (Plugin loaders load tracers)---
+# --- Load Plugins (Plugin loaders load tracers)---
 
-# todo: 自动搜索/加载多个插件，这个工作比较次要，所以暂时先不做：
-# 1. 查找并加载指定目录下的所有插件
-# 2. 插件之间如何配合
-try:
-    plugin = importlib.import_module(PLUGIN_NAME)
-    print(f"[rust-future-tracing] Loaded runtime plugin: {PLUGIN_NAME} (currently does nothing)")
-except (ImportError, AttributeError) as e:
-    print(f"[rust-future-tracing] ERROR: Failed to load plugin '{PLUGIN_NAME}': {e}.")
-    plugin = None
+def load_plugins():
+    """Imports the runtime plugins in PLUGIN_NAMES on first use and registers them."""
+    for name, e in registry.load(PLUGIN_NAMES):
+        print(f"[rust-future-tracing] ERROR: Failed to load plugin '{name}': {e}.")
+
+def breakpoint_location(symbol: str):
+    """
+    Where GDB resolves `symbol` to, as a key for merging instrument points;
+    the symbol itself if GDB can't resolve it (yet).
+    """
+    try:
+        _, sals = gdb.decode_line(symbol)
+    except gdb.error:
+        return symbol
+    pcs = tuple(sorted(sal.pc for sal in sals or () if sal.pc))
+    return pcs or symbol
 
 
 # --- Breakpoint Implementation ---
@@ -103,7 +149,7 @@ class FinishBreakpoint(gdb.FinishBreakpoint):
     """
     A finish breakpoint that runs tracers when a function call completes.
     """
-    def __init__(self, frame: gdb.Frame, symbol_name: str, invocation_data: dict, exit_tracers: list):
+    def __init__(self, frame: gdb.Frame, symbol_name: str, invocation_data: dict, exit_tracers: TracerSet):
         super().__init__(frame, internal=True)
         self.symbol_name = symbol_name
         self.invocation_data = invocation_data
@@ -111,11 +157,15 @@ class FinishBreakpoint(gdb.FinishBreakpoint):
 
     def stop(self):
         """Called when the frame is about to return."""
+        started = time.perf_counter()
         thread = gdb.selected_thread()
-        for tracer_factory in self.exit_tracers:
-            tracer = tracer_factory()
-            tracer.start(thread)
-            self.invocation_data["exit_tracers"][str(tracer)] = tracer.read_data()
+        thread_clock.pause(thread.ptid)
+        thread_clock.charge(thread.ptid, int(governor.stop_seconds * 1e9))
+        self.invocation_data["exit_timestamp"] = time.time()
+        self.invocation_data["exit_tracers"] = self.exit_tracers.run(thread, self.invocation_data["sample_weight"])
+        dispatch_event(self.symbol_name, "exit", self.invocation_data)
+        governor.record(self.symbol_name, time.perf_counter() - started, stops=1)
+        thread_clock.resume(thread.ptid)
         return False  # Always continue execution
 
     def out_of_scope(self):
@@ -128,14 +178,52 @@ class EntryBreakpoint(gdb.Breakpoint):
     A two-stage breakpoint to reliably trace function arguments by
     stepping over the function's prolog code.
     """
-    def __init__(self, symbol: str, entry_tracers: list, exit_tracers: list):
+    def __init__(self, symbol: str, entry_tracers: list, exit_tracers: list, sampling=None):
         print(f"[rust-future-tracing] Setting up entry breakpoint for: {symbol}")
         super().__init__(symbol, internal=True)
         self.symbol_name = symbol
-        self.entry_tracers = entry_tracers
-        self.exit_tracers = exit_tracers
+        # Tracers are created once per instrument point and reused on every hit.
+        self.entry_tracers = TracerSet(entry_tracers)
+        self.exit_tracers = TracerSet(exit_tracers)
+        self.sampling = None
+        if sampling is not None:
+            self.set_sampling(sampling)
+        # ptid -> when stop() returned, for hits whose temporary breakpoint is pending
+        self.resumed_at = {}
+
+    def set_sampling(self, sampling):
+        """Installs a SamplingPolicy (see core/sampling.py) for this point."""
+        self.sampling = sampling
+        sampling_policies[self.symbol_name] = sampling
 
     def stop(self):
+        if self.ignore_count:
+            # Counting-only (see core/governor.py): GDB counts the ignored hit.
+            return False
+        started = time.perf_counter()
+        ptid = gdb.selected_thread().ptid
+        thread_clock.pause(ptid)
+        try:
+            return self._stop()
+        finally:
+            finished = time.perf_counter()
+            governor.record(self.symbol_name, finished - started, hit=True, stops=1)
+            if ptid in self.resumed_at:
+                # The clock stays paused until the temporary breakpoint's tracers are done
+                self.resumed_at[ptid] = finished
+            else:
+                thread_clock.resume(ptid)
+                thread_clock.charge(ptid, int(governor.stop_seconds * 1e9))
+
+    def _stop(self):
+        sample_weight = 1
+        if self.sampling is not None:
+            sample_weight = self.sampling.admit()
+            if sample_weight is None:
+                if self.sampling.exhausted:
+                    self.sampling.pause(self)
+                return False
+
         # This breakpoint hits at the raw function entry. We now set a
         # temporary breakpoint at the same spot to run our tracers.
         pc = gdb.selected_frame().pc()
@@ -144,7 +232,9 @@ class EntryBreakpoint(gdb.Breakpoint):
         # We store the Python function to call in a global list and use its
         # index to call it from the breakpoint's command string.
         cmd_index = len(bp_commands)
-        bp_commands.append(lambda: run_tracers(self.symbol_name, self.entry_tracers, self.exit_tracers))
+        ptid = gdb.selected_thread().ptid
+        bp_commands.append(lambda: run_tracers(self.symbol_name, self.entry_tracers, self.exit_tracers, sample_weight,
+                                               self.resumed_at.pop(ptid, None)))
 
         # The command string for the temporary breakpoint. It calls our Python
         # function, then tells GDB to continue automatically.
@@ -152,6 +242,7 @@ class EntryBreakpoint(gdb.Breakpoint):
 python bp_commands[{cmd_index}]()
 continue
 """
+        self.resumed_at[ptid] = None
         return False # Immediately continue to hit the temporary breakpoint.
 
 
@@ -162,6 +253,10 @@ class StartAsyncDebugCommand(gdb.Command):
     def __init__(self):
         super().__init__("start-async-debug", gdb.COMMAND_USER)
         self._call_graph: Optional[CallGraph] = None
+        self.count_only_functions: List[str] = []
+        # Future <-> poll pairs from a fresh async_deps.json (see core/future_polls.py)
+        self.future_polls: Optional[FuturePollIndex] = None
+        self.async_deps: Optional[dict] = None
 
     def _ensure_call_graph(self) -> Optional[CallGraph]:
         """Load and cache the LLVM call graph if synchronous descendants are enabled."""
@@ -169,61 +264,26 @@ class StartAsyncDebugCommand(gdb.Command):
             return None
 
         if self._call_graph is None:
+            from core.callgraph import find_call_graph
             self._call_graph = find_call_graph(CALL_GRAPH_DOT_PATH)
 
         return self._call_graph
 
     def _call_graph_seed_aliases(self, poll_names: Iterable[str], call_graph: CallGraph) -> Dict[str, Set[str]]:
         """Map poll function names to call-graph node aliases found in the graph."""
-
-        def strip_signature(name: str) -> str:
-            return name.split("(", 1)[0].strip()
-
-        def remove_generics(name: str) -> str:
-            result = []
-            depth = 0
-            for ch in name:
-                if ch == "<":
-                    depth += 1
-                    continue
-                if ch == ">":
-                    if depth:
-                        depth -= 1
-                    continue
-                if depth == 0:
-                    result.append(ch)
-            return "".join(result)
-
         alias_map: Dict[str, Set[str]] = {}
+        unmatched: List[str] = []
 
         for raw_name in poll_names:
-            normalized = re.sub(r"^static\\s+fn\\s+", "", raw_name).strip()
-            if not normalized:
-                alias_map[raw_name] = set()
-                continue
-
-            candidates = {
-                normalized,
-                strip_signature(normalized),
-            }
-
-            expanded_candidates = set()
-            for cand in candidates:
-                if not cand:
-                    continue
-                no_generics = remove_generics(cand)
-                expanded_candidates.add(cand)
-                expanded_candidates.add(no_generics)
-                expanded_candidates.add(re.sub(r"::\{async[^}]+\}", "::{{closure}}", no_generics))
-                expanded_candidates.add(re.sub(r"::\{async[^}]+\}", "", no_generics))
-
-            matched = set()
-            for cand in expanded_candidates:
-                candidate = cand.strip(":")
-                if candidate and call_graph.has_node(candidate):
-                    matched.add(candidate)
-
+            matched = call_graph.match_seed(raw_name)
             alias_map[raw_name] = matched
+            if not matched:
+                unmatched.append(raw_name)
+
+        if unmatched:
+            print(f"[rust-future-tracing] INFO: {len(unmatched)} of {len(alias_map)} poll functions have no call graph node:")
+            for name in unmatched:
+                print(f"  - {name}")
 
         return alias_map
 
@@ -353,9 +413,7 @@ class StartAsyncDebugCommand(gdb.Command):
             cu_index (int): Index of compilation unit to print (default: 0)
             max_depth (int): Maximum depth to print (default: 2)
         """
-        from .init_dwarf_analysis import get_dwarf_tree
         from .dwarf.tree import load_children
-        from .dwarf.dwarfutil import safe_DIE_name
         
         tree = get_dwarf_tree()
         if not tree:
@@ -495,6 +553,19 @@ class StartAsyncDebugCommand(gdb.Command):
         tag = die.tag if hasattr(die, 'tag') else ""
         return tag == 'DW_TAG_namespace'
     
+    def _cu_search_passes(self, tree, hierarchy):
+        """
+        The top DIEs a name search goes through, in two passes: the CUs of
+        the crate named by the first component, then all the others. Indexing
+        a CU's children parses the whole CU, so the second pass only runs if
+        the first finds nothing, e.g. for a generic instantiated in another
+        crate or a name that doesn't start with a crate (`<T as Trait>::...`).
+        """
+        from core.dwarf.libtree import crate_of_cu
+        crates = [(cu_die, crate_of_cu(cu_die)) for cu_die in tree.top_dies]
+        return ([cu_die for (cu_die, crate) in crates if crate == hierarchy[0]],
+                [cu_die for (cu_die, crate) in crates if crate != hierarchy[0]])
+
     def search_poll_hierarchy_in_cu(self, cu_die, hierarchy, depth=0):
         """
         Search for a hierarchy of names in a compilation unit.
@@ -507,39 +578,7 @@ class StartAsyncDebugCommand(gdb.Command):
         Returns:
             list: Matching DIEs that match the full hierarchy.
         """
-        if depth >= len(hierarchy):
-            return []
-        
-        current_name = hierarchy[depth]
-        matches = []
-        
-        # Load children if not already loaded
-        load_children(cu_die, True)
-        
-        # Iterate through all children of the current DIE
-        for child_die in cu_die._children:
-            child_name = safe_DIE_name(child_die, "")
-            child_tag = child_die.tag if hasattr(child_die, 'tag') else ""
-            
-            # Check if this child matches the current hierarchy level
-            if child_name == current_name:
-                if depth == len(hierarchy) - 1:
-                    # We've matched the full hierarchy - this is a final match
-                    # check if it's an function (not necessarily an async function)
-                    if child_tag == 'DW_TAG_subprogram':
-                        matches.append(child_die)
-                else:
-                    # Continue searching deeper in this subtree
-                    sub_matches = self.search_poll_hierarchy_in_cu(child_die, hierarchy, depth + 1)
-                    matches.extend(sub_matches)
-            
-            # Also recursively search in child's subtree even if name doesn't match
-            # This handles nested namespace structures caused by, for example, {impl#0}
-            if child_die.has_children:
-                sub_matches = self.search_poll_hierarchy_in_cu(child_die, hierarchy, depth)
-                matches.extend(sub_matches)
-        
-        return matches
+        return self._search_hierarchy_in_cu(cu_die, hierarchy, depth, 'DW_TAG_subprogram')
 
     def search_future_struct_in_cu(self, cu_die, hierarchy, depth=0):
         """
@@ -553,38 +592,37 @@ class StartAsyncDebugCommand(gdb.Command):
         Returns:
             list: Matching future struct DIEs
         """
+        return self._search_hierarchy_in_cu(cu_die, hierarchy, depth, 'DW_TAG_structure_type')
+
+    def _search_hierarchy_in_cu(self, parent_die, hierarchy, depth, final_tag):
+        """
+        Shared walk of search_poll_hierarchy_in_cu/search_future_struct_in_cu:
+        children named hierarchy[depth] continue the match (or end it, if they
+        have `final_tag` at the last level), and every subtree is searched
+        from the same depth too, for nesting such as {impl#0}. Children come
+        from the library tree - file order, looked up by name, never sorted.
+        """
         if depth >= len(hierarchy):
             return []
-        
-        current_name = hierarchy[depth]
+
+        library_tree = get_library_tree()
         matches = []
-        
-        # Load children if not already loaded
-        load_children(cu_die, True)
-        
-        # Iterate through all children of the current DIE
-        for child_die in cu_die._children:
-            child_name = safe_DIE_name(child_die, "")
-            child_tag = child_die.tag if hasattr(child_die, 'tag') else ""
-            
-            # Check if this child matches the current hierarchy level
-            if child_name == current_name:
-                if depth == len(hierarchy) - 1:
-                    # We've matched the full hierarchy - check if it's a structure_type
-                    if child_tag == 'DW_TAG_structure_type':
-                        matches.append(child_die)
-                else:
-                    # Continue searching deeper in this subtree
-                    sub_matches = self.search_future_struct_in_cu(child_die, hierarchy, depth + 1)
-                    matches.extend(sub_matches)
-            
-            # Also recursively search in child's subtree even if name doesn't match
-            # This handles nested namespace structures
+        named = library_tree.named(parent_die, hierarchy[depth])
+        if depth == len(hierarchy) - 1:
+            # We've matched the full hierarchy - keep the DIEs of the wanted kind
+            matches.extend(die for die in named if die.tag == final_tag)
+        else:
+            for child_die in named:
+                matches.extend(self._search_hierarchy_in_cu(child_die, hierarchy, depth + 1, final_tag))
+
+        # Also recursively search in each child's subtree even if its name doesn't match
+        # This handles nested namespace structures caused by, for example, {impl#0}
+        for child_die in library_tree.children(parent_die):
             if child_die.has_children:
-                sub_matches = self.search_future_struct_in_cu(child_die, hierarchy, depth)
-                matches.extend(sub_matches)
-        
+                matches.extend(self._search_hierarchy_in_cu(child_die, hierarchy, depth, final_tag))
+
         return matches
+
     def _find_sibling_future_struct(self, async_fn_die):
         """
         为一个 async function DIE 查找其对应的 Future 结构体兄弟节点。
@@ -608,12 +646,10 @@ class StartAsyncDebugCommand(gdb.Command):
         # 2. 构造我们想要寻找的目标 Future 结构体的名字模式
         target_struct_pattern = f"{{{base_name}_env#{counter}}}"
         
-        # 3. 遍历兄弟节点，寻找匹配的结构体
-        load_children(parent_die, True)
-        for sibling in parent_die._children:
-            if (sibling.tag == 'DW_TAG_structure_type' and
-                target_struct_pattern in safe_DIE_name(sibling, "")):
-                return sibling
+        # 3. 在兄弟节点中寻找匹配的结构体
+        sibling = get_library_tree().find_child(parent_die, 'DW_TAG_structure_type', target_struct_pattern)
+        if sibling:
+            return sibling
 
         # print(f"[rust-future-tracing] No future struct found for function: {fn_name}")
         return None
@@ -641,12 +677,10 @@ class StartAsyncDebugCommand(gdb.Command):
         # 2. 构造我们想要寻找的目标 poll 函数的名字模式
         target_fn_pattern = f"{{{base_name}#{counter}}}"
 
-        # 3. 遍历兄弟节点，寻找匹配的 poll 函数
-        load_children(parent_die, True)
-        for sibling in parent_die._children:
-            if (sibling.tag == 'DW_TAG_subprogram' and
-                target_fn_pattern in safe_DIE_name(sibling, "")):
-                return sibling
+        # 3. 在兄弟节点中寻找匹配的 poll 函数
+        sibling = get_library_tree().find_child(parent_die, 'DW_TAG_subprogram', target_fn_pattern)
+        if sibling:
+            return sibling
         
         # print(f"[rust-future-tracing] No poll function found for future struct: {struct_name}")
         return None    
@@ -664,6 +698,13 @@ class StartAsyncDebugCommand(gdb.Command):
         if not die:
             return ""
         
+        # Namespaces, types and functions come precomputed from a pass over their CU
+        library_tree = get_library_tree()
+        if library_tree is not None:
+            full_name = library_tree.qualified_name(die)
+            if full_name is not None:
+                return full_name
+        
         # Get the name of the current DIE
         current_name = safe_DIE_name(die, "")
         if not current_name:
@@ -775,13 +816,16 @@ class StartAsyncDebugCommand(gdb.Command):
         if not tree:
             return []  # Not initialized
 
-        # Search for the poll function across all compilation units
+        # Search for the poll function in the crate's compilation units, then in the others
         all_matches = []
-        for cu_die in tree.top_dies:
-            matches = self.search_poll_hierarchy_in_cu(cu_die, components, 0)
-            # Convert matches to (DIE, offset) tuples
-            for match in matches:
-                all_matches.append((match, match.offset))
+        for cu_dies in self._cu_search_passes(tree, components):
+            for cu_die in cu_dies:
+                matches = self.search_poll_hierarchy_in_cu(cu_die, components, 0)
+                # Convert matches to (DIE, offset) tuples
+                for match in matches:
+                    all_matches.append((match, match.offset))
+            if all_matches:
+                break
         
         if not all_matches:
             print(f"[rust-future-tracing] No matches found for hierarchy: {components}")
@@ -825,6 +869,17 @@ class StartAsyncDebugCommand(gdb.Command):
         Note:
             This method finds DIE objects with .offset attribute (int) for DIE offsets
         """
+        # Precomputed by async_deps.py: no DWARF tree walk
+        if self.future_polls is not None:
+            pairs = self.future_polls.polls_named("::".join(self.parse_poll_function_hierarchy(poll_fn_name)))
+            if pairs:
+                if len(pairs) > 1:
+                    print(f"[rust-future-tracing] Warning: Multiple future structs found for poll function {poll_fn_name}, the following are ignored:")
+                    for pair in pairs[1:]:
+                        print(f"  - {pair.future_name} (DIE offset: {pair.future_offset})")
+                print(f"[rust-future-tracing] Mapped {poll_fn_name} -> {pairs[0].future_name} (DIE offset: {pairs[0].future_offset}, precomputed)")
+                return pairs[0].future_name
+
         # Step 1: Find poll function DIEs in DWARF tree
         poll_matches = self.find_poll_function_in_dwarf_tree(poll_fn_name)
         if not poll_matches:
@@ -886,13 +941,16 @@ class StartAsyncDebugCommand(gdb.Command):
         if not tree:
             return []  # Not initialized
 
-        # Search for the future struct across all compilation units
+        # Search for the future struct in the crate's compilation units, then in the others
         all_matches = []
-        for cu_die in tree.top_dies:
-            matches = self.search_future_struct_in_cu(cu_die, components, 0)
-            # Convert matches to (DIE, offset) tuples
-            for match in matches:
-                all_matches.append((match, match.offset))
+        for cu_dies in self._cu_search_passes(tree, components):
+            for cu_die in cu_dies:
+                matches = self.search_future_struct_in_cu(cu_die, components, 0)
+                # Convert matches to (DIE, offset) tuples
+                for match in matches:
+                    all_matches.append((match, match.offset))
+            if all_matches:
+                break
         
         if not all_matches:
             print(f"[rust-future-tracing] No future struct matches found for hierarchy: {components}")
@@ -1044,7 +1102,7 @@ class StartAsyncDebugCommand(gdb.Command):
         
         # Use the tree model's find_offset method (similar to on_byoffset in dwarf/__main__.py)
         try:
-            index = tree.find_offset(die_offset)
+            index = tree.find_offset(die_offset, exact=True)
             if not index:
                 print(f"[rust-future-tracing] DIE offset {die_offset} not found in DWARF tree")
                 return None
@@ -1084,6 +1142,16 @@ class StartAsyncDebugCommand(gdb.Command):
         
         for future_name in interesting_futures:
             print(f"[rust-future-tracing] Converting future to DIE offset: {future_name}")
+
+            pairs = self.future_polls.futures_named(future_name) if self.future_polls is not None else []
+            if pairs:
+                if len(pairs) > 1:
+                    print(f"[rust-future-tracing] Warning: Multiple poll functions found for future {future_name}, the following are ignored:")
+                    for pair in pairs[1:]:
+                        print(f"  - DIE offset: {pair.future_offset}")
+                die_offsets.append(pairs[0].future_offset)
+                print(f"[rust-future-tracing] Mapped {future_name} -> DIE offset: {pairs[0].future_offset} (precomputed)")
+                continue
             
             # Use our decomposed method from Step 2 to find the future struct DIE
             future_matches = self.find_future_struct_in_dwarf_tree(future_name)
@@ -1149,11 +1217,21 @@ class StartAsyncDebugCommand(gdb.Command):
             with open(deps_path, "r") as f:
                 deps_data = json.load(f)
             print(f"[rust-future-tracing] Loaded async dependencies from {deps_path}")
-            return deps_data
         except Exception as e:
             print(f"[rust-future-tracing] ERROR loading async_deps.json: {e}")
             return None
 
+        self.future_polls = None
+        if not is_fresh(deps_data, target_bin):
+            print(f"[rust-future-tracing] async_deps.json was not generated from this build of {target_bin}; pairing futures and poll functions through the DWARF tree")
+        else:
+            self.future_polls = FuturePollIndex.from_deps(deps_data)
+            if self.future_polls is None:
+                print("[rust-future-tracing] async_deps.json has no future_polls (regenerate it to skip the DWARF tree walk)")
+            else:
+                print(f"[rust-future-tracing] Using {len(self.future_polls)} precomputed future/poll pairs")
+        return deps_data
+
 
     def expand_future_dependencies(self, interesting_die_offsets: List[int]) -> dict:
         """
@@ -1176,8 +1254,8 @@ class StartAsyncDebugCommand(gdb.Command):
                     "call_stack_tops": List[int]  # Top-level futures
                 }
         """
-        # Load dependency data
-        deps_data = self.load_async_dependencies()
+        # Load dependency data (invoke() has loaded it already, unless that failed)
+        deps_data = self.async_deps or self.load_async_dependencies()
         if not deps_data:
             return {"expanded_offsets": [], "ancestors": {}, "descendants": {}, "coroutines": [], "call_stack_tops": []}
         
@@ -1305,6 +1383,10 @@ class StartAsyncDebugCommand(gdb.Command):
         }
         
         for die_offset in expanded_info["expanded_offsets"]:
+            if self.future_polls is not None:
+                self._classify_offset_offline(die_offset, validated_futures)
+                continue
+
             # Use offsetToDIE method to get DIE and classify its type
             die_result = self.offsetToDIE(die_offset)
             
@@ -1342,6 +1424,41 @@ class StartAsyncDebugCommand(gdb.Command):
         
         return validated_futures
 
+    def _classify_offset_offline(self, die_offset: int, validated_futures: dict):
+        """
+        validate_expanded_futures_with_die_tree for a fresh async_deps.json:
+        futures with a precomputed poll function carry it as "poll" and no
+        DIE. The names of the other state machines come from offset_to_name,
+        but they are only printed.
+        """
+        pair = self.future_polls.for_future(die_offset)
+        hex_offset = format(die_offset, "x")
+        if pair is not None:
+            validated_futures["future_structs"].append({
+                "offset": die_offset,
+                "die": None,
+                "name": self.parse_future_struct_hierarchy(pair.future_name)[-1],
+                "poll": pair,
+            })
+        elif hex_offset in self.async_deps.get("async_functions", {}):
+            # A future struct whose poll function async_deps.py didn't find
+            validated_futures["future_structs"].append({
+                "offset": die_offset,
+                "die": None,
+                "name": self.async_deps["async_functions"][hex_offset]["name"],
+                "poll": None,
+            })
+        elif hex_offset in self.async_deps.get("offset_to_name", {}):
+            validated_futures["other_dies"].append({
+                "offset": die_offset,
+                "die": None,
+                "type": "other",
+                "name": self.async_deps["offset_to_name"][hex_offset],
+            })
+        else:
+            validated_futures["invalid_offsets"].append(die_offset)
+            print(f"[rust-future-tracing] WARNING: Invalid DIE offset during validation: {die_offset}")
+
     def perform_future_expansion(self, interesting_futures: List[str]) -> dict:
         """
         Complete Step 3: Perform future expansion on interesting futures.
@@ -1413,6 +1530,9 @@ class StartAsyncDebugCommand(gdb.Command):
             print("[rust-future-tracing] No async-related DIEs found in expansion results")
             return []
 
+        # Functions that only get a CountingBreakpoint (see core/counting.py).
+        self.count_only_functions: List[str] = []
+
         future_structs_by_offset = {info["offset"]: info for info in future_structs}
         async_functions_by_offset = {info["offset"]: info for info in async_functions}
 
@@ -1435,6 +1555,15 @@ class StartAsyncDebugCommand(gdb.Command):
         def handle_future_struct(info, context: str):
             future_offset = info["offset"]
             future_die = info["die"]
+            if future_die is None:
+                # Classified from a fresh async_deps.json, with the poll function it found
+                pair = info["poll"]
+                if pair is None:
+                    print(f"[rust-future-tracing] WARNING: No poll function found for future: {info['name']} (offset: {future_offset})")
+                    return
+                print(f"[rust-future-tracing] Mapped future -> poll: {pair.future_name} -> {pair.poll_name} (DIE offset: {pair.poll_offset}, precomputed)")
+                add_poll_function(pair.poll_name, context)
+                return
             future_display_name = self.dieToFullName(future_die) or safe_DIE_name(future_die, f"<future@{future_offset}>")
 
             print(f"[rust-future-tracing] Converting future to poll function ({context}): {future_display_name} (offset: {future_offset})")
@@ -1470,6 +1599,9 @@ class StartAsyncDebugCommand(gdb.Command):
                     handle_future_struct(future_structs_by_offset[offset], "descendant future")
                 elif offset in async_functions_by_offset:
                     handle_async_function(async_functions_by_offset[offset], "descendant async function")
+                elif self.future_polls is not None:
+                    # async_deps.json knows it as neither
+                    print(f"[rust-future-tracing] INFO: Descendant offset 0x{offset:x} is not an async future/function")
                 else:
                     die_result = self.offsetToDIE(offset)
                     if not die_result:
@@ -1519,20 +1651,44 @@ class StartAsyncDebugCommand(gdb.Command):
                             alias_list = ", ".join(sorted(aliases))
                             print(f"[rust-future-tracing] Call graph seeds for {poll_name}: {alias_list}")
 
-                    descendants = call_graph.descendants(alias_seeds, SYNC_DESCENDANT_DEPTH)
-                    exclude_prefixes = SYNC_DESCENDANT_EXCLUDE_PREFIXES
+                    reach = call_graph.descendants_by_seed(
+                        alias_seeds,
+                        SYNC_DESCENDANT_DEPTH,
+                        exclude_prefixes=SYNC_DESCENDANT_EXCLUDE_PREFIXES,
+                        budget=SYNC_DESCENDANT_BUDGET,
+                        uncounted=seen,
+                    )
+
+                    # Attribute every descendant back to the poll functions seeding it
+                    # and add them shallowest first, so a budget cut drops the deep ones.
+                    descendant_depth: Dict[str, int] = {}
+                    descendant_sources: Dict[str, Set[str]] = defaultdict(set)
+                    for poll_name, aliases in alias_map.items():
+                        for alias in aliases:
+                            for name, dist in reach.get(alias, {}).items():
+                                descendant_depth[name] = min(dist, descendant_depth.get(name, dist))
+                                descendant_sources[name].add(poll_name)
 
-                    for name in sorted(descendants):
-                        top_level = name.split("::", 1)[0]
-                        if top_level in exclude_prefixes:
-                            continue
+                    per_poll_counts: Dict[str, int] = defaultdict(int)
+                    for name in sorted(descendant_depth, key=lambda n: (descendant_depth[n], n)):
                         if name in seen:
                             continue
-                        add_poll_function(name, "synchronous descendant via call graph")
+                        if COUNT_ONLY_SYNC_DESCENDANTS:
+                            seen.add(name)
+                            self.count_only_functions.append(name)
+                        else:
+                            add_poll_function(name, f"synchronous descendant via call graph (depth {descendant_depth[name]})")
                         sync_descendant_count += 1
+                        for poll_name in descendant_sources[name]:
+                            per_poll_counts[poll_name] += 1
 
                     if sync_descendant_count:
-                        print(f"[rust-future-tracing] Added {sync_descendant_count} synchronous descendants from call graph")
+                        tier = " (counting only)" if COUNT_ONLY_SYNC_DESCENDANTS else ""
+                        print(f"[rust-future-tracing] Added {sync_descendant_count} synchronous descendants from call graph{tier}")
+                        for poll_name, count in sorted(per_poll_counts.items(), key=lambda item: -item[1]):
+                            print(f"  - {count:>5} via {poll_name}")
+                        if SYNC_DESCENDANT_BUDGET > 0 and sync_descendant_count >= SYNC_DESCENDANT_BUDGET:
+                            print(f"[rust-future-tracing] INFO: Synchronous descendant budget ({SYNC_DESCENDANT_BUDGET}) reached")
                 else:
                     print("[rust-future-tracing] INFO: No call graph nodes matched poll functions; skipping synchronous descendants")
             else:
@@ -1549,6 +1705,11 @@ class StartAsyncDebugCommand(gdb.Command):
         return poll_functions
 
     def invoke(self, arg, from_tty):
+        # A fresh async_deps.json also pairs futures with their poll functions,
+        # which then need no DWARF tree walk in any of the steps below
+        self.future_polls = None
+        self.async_deps = self.load_async_dependencies()
+
         # === STEP 1: Read poll_map.json and convert interesting poll functions to futures ===
         print("[rust-future-tracing] Step 1: Reading user-selected interesting functions...")
         
@@ -1582,28 +1743,59 @@ class StartAsyncDebugCommand(gdb.Command):
         
         print(f"[rust-future-tracing] Step 4 complete. Ready to instrument {len(poll_functions_to_instrument)} poll functions")
         
+        # Functions matching COUNT_ONLY_PATTERNS are counted instead of traced.
+        if COUNT_ONLY_PATTERNS:
+            traced = []
+            for name in poll_functions_to_instrument:
+                if any(pattern in name for pattern in COUNT_ONLY_PATTERNS):
+                    self.count_only_functions.append(name)
+                else:
+                    traced.append(name)
+            poll_functions_to_instrument = traced
+
         # === STEP 5 & 6: Set up instrumentation using the async backtrace plugin ===
-        # This plugin will use the tracer to collect data into async_backtrace_store
-        plugin = AsyncBacktracePlugin(poll_functions_to_instrument, expansion_results, self)
+        # This plugin will use the tracer to collect data into async_backtrace_store;
+        # it joins the runtime plugins from PLUGIN_NAMES in the registry.
+        from .runtime_plugins.async_backtrace_plugin import AsyncBacktracePlugin
+        load_plugins()
+        registry.register(AsyncBacktracePlugin(poll_functions_to_instrument, expansion_results, self))
         
         # The original instrumentation logic from gdb-debugger
         # This will set the breakpoints and run the tracers
         global traced_data
         traced_data = defaultdict(list)
+        sampling_policies.clear()
+        governor.reset()
+        thread_clock.reset()
+        
+        # One breakpoint per location: plugins instrumenting the same function share it,
+        # its tracers fan out to all of them and dispatch_event() notifies each.
+        merged_points = registry.merged_points(breakpoint_location)
+        for point in merged_points:
+            try:
+                # Use EntryBreakpoint which handles both entry and exit tracers correctly
+                breakpoint = EntryBreakpoint(
+                    point.symbol,
+                    point.entry_tracers,
+                    point.exit_tracers,
+                    sampling_policy_for(point.symbol, use_defaults=point.sample_by_default),
+                )
+            except gdb.error as e:
+                print(f"[rust-future-tracing] WARNING: Could not instrument {point.symbol} ({', '.join(point.plugin_names)}): {e}")
+                continue
+            if point.sample_by_default:
+                governor.register(breakpoint)
+        shared = sum(1 for point in merged_points if len(point.subscribers) > 1)
+        print(f"[rust-future-tracing] Instrumented {len(merged_points)} points for plugins "
+              f"{', '.join(plugin.name for plugin in registry)} ({shared} shared by several plugins)")
         
-        instrument_points = plugin.instrument_points()
-        for point in instrument_points:
-            spec = point["symbol"]
-            entry_tracers = point.get("entry_tracers", [])
-            exit_tracers = point.get("exit_tracers", [])
-            
-            # Use EntryBreakpoint which handles both entry and exit tracers correctly
-            EntryBreakpoint(spec, entry_tracers, exit_tracers)
-        
+        if self.count_only_functions:
+            installed = install_counting_breakpoints(self.count_only_functions)
+            print(f"[rust-future-tracing] Installed {installed} counting-only breakpoints (see 'async-counts')")
+
         print("[rust-future-tracing] All steps complete. Instrumentation is active.")
         print("Hint: Use 'continue' or 'run' to start the program, then 'inspect-async' to see results.")
 
-from .runtime_plugins.async_backtrace_plugin import AsyncBacktracePlugin
 from .runtime_plugins.async_backtrace_data import async_backtrace_store
 from collections import defaultdict
 
@@ -1679,18 +1871,81 @@ class InspectAsync(gdb.Command):
         print("=" * 80)
 
 
+def write_flame_graphs():
+    """
+    Exports the async stacks collected so far as flame graphs, next to the
+    other artifacts in <target_project_root>/async_trace_results/:
+    snapshot counts and poll self time as folded stacks, plus both as one
+    speedscope file.
+    """
+    trie = async_backtrace_store.trie
+    if len(trie) <= 1:
+        return
+    target_bin = gdb.current_progspace().filename
+    if target_bin:
+        project_root = os.path.abspath(os.path.join(os.path.dirname(target_bin), "..", ".."))
+        result_dir = os.path.join(project_root, "async_trace_results")
+    else:
+        result_dir = "results"
+    try:
+        os.makedirs(result_dir, exist_ok=True)
+        counts_path = os.path.join(result_dir, "async_flame.folded")
+        time_path = os.path.join(result_dir, "async_flame_time.folded")
+        speedscope_path = os.path.join(result_dir, "async_flame.speedscope.json")
+        stacks = write_folded(counts_path, trie)
+        write_folded(time_path, trie, async_backtrace_store.poll_timer.self_ns)
+        write_speedscope(speedscope_path, trie, async_backtrace_store.poll_timer)
+    except OSError as e:
+        print(f"[rust-future-tracing] Failed to write flame graphs to {result_dir}: {e}")
+        return
+    print(f"[rust-future-tracing] Wrote {stacks} distinct async stacks to {counts_path}, {time_path} and {speedscope_path}")
+
+
 class DumpAsyncData(gdb.Command):
-    """GDB command to process and dump the collected trace data."""
+    """GDB command to process and dump the collected trace data.
+
+    Usage: dump-async-data [EXPORT_PATH]
+    With EXPORT_PATH, the plugins' data is also written there as JSON; when
+    several plugins export, each writes EXPORT_PATH with its name inserted
+    before the extension.
+    """
     def __init__(self):
         super().__init__("dump-async-data", gdb.COMMAND_USER)
 
     def invoke(self, arg, from_tty):
-        if not plugin:
+        load_plugins()
+        if not len(registry):
             print("[gdb_debugger] No plugin loaded.")
             return
         
         print("[gdb_debugger] Processing collected data...")
-        plugin.process_data(traced_data)
+        for plugin in registry:
+            plugin.process_data(registry.traced_data_for(plugin, traced_data))
+
+        write_flame_graphs()
+
+        if sampling_policies:
+            print("[gdb_debugger] Sampled instrument points (scale counts by sample_weight):")
+            for symbol, policy in sorted(sampling_policies.items()):
+                print(f"  - {symbol}: {policy.describe()}")
+
+        export_path = arg.strip()
+        if export_path:
+            exporters = [plugin for plugin in registry if type(plugin).export_data is not RuntimePlugin.export_data]
+            if not exporters:
+                print(f"[gdb_debugger] None of the plugins ({', '.join(plugin.name for plugin in registry)}) support exporting data.")
+            for plugin in exporters:
+                path = export_path
+                if len(exporters) > 1:
+                    root, ext = os.path.splitext(export_path)
+                    path = f"{root}.{plugin.name}{ext}"
+                try:
+                    plugin.export_data(path)
+                except OSError as e:
+                    print(f"[gdb_debugger] Failed to export {plugin.name} data to {path}: {e}")
 
 StartAsyncDebugCommand()
 InspectAsync()
+DumpAsyncData()
+AsyncGovernorCommand()
+AsyncCountsCommand()
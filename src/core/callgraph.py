@@ -1,11 +1,169 @@
 from __future__ import annotations
 
 import glob
+import hashlib
+import json
+import os
 import re
+import shutil
 import subprocess
-from collections import defaultdict, deque
+from array import array
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, Iterable, Optional, Set
+from typing import Dict, Iterable, List, Optional, Set
+
+
+# Compiler-generated closure/coroutine path segments. DWARF spells them
+# `{async_fn#0}` / `{async_block#1}` / `{closure#2}`, while legacy demangling in
+# the call graph spells them `{{closure}}`; both are folded to `{{closure}}`.
+_CLOSURE_SEGMENT_RE = re.compile(r"\{\{closure\}\}|\{(?:async_fn|async_block|closure)(?:_env)?#\d+\}")
+_CLOSURE_KEY = "{{closure}}"
+
+
+def _remove_generics(name: str) -> str:
+    result = []
+    depth = 0
+    for ch in name:
+        if ch == "<":
+            depth += 1
+            continue
+        if ch == ">":
+            if depth:
+                depth -= 1
+            continue
+        if depth == 0:
+            result.append(ch)
+    return "".join(result)
+
+
+def seed_key(name: str) -> str:
+    """Normalize a function name into the key used for call-graph seed matching.
+
+    Drops a leading ``static fn``, the signature and generic arguments, and
+    canonicalizes closure/async segments, e.g.
+    ``static fn a::b::{async_fn#0}<T>(...)`` -> ``a::b::{{closure}}``.
+    Qualified paths (``<A as B>::poll``) keep their generics, since stripping
+    them would fold every trait impl into the same bare method name.
+    """
+    name = re.sub(r"^static\s+fn\s+", "", name).strip()
+    name = name.split("(", 1)[0].strip()
+    if not name.startswith("<"):
+        name = _remove_generics(name)
+    name = _CLOSURE_SEGMENT_RE.sub(_CLOSURE_KEY, name)
+    return name.strip(":")
+
+
+def _strip_closure_segments(key: str) -> str:
+    return key.replace("::" + _CLOSURE_KEY, "").strip(":")
+
+
+# Bump when the JSON layout written by CallGraph.from_dot(use_cache=True) changes.
+_CACHE_VERSION = 2
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "rust-future-tracing", "call-graphs")
+
+_REGEX_META = set(".^$*+?{}[]()|\\")
+_REGEX_OPTIONAL = set("*?{")
+# Hex digits that follow \x, \u and \U
+_ESCAPE_HEX_DIGITS = {"x": 2, "u": 4, "U": 8}
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _escape_end(pattern: str, i: int) -> int:
+    """Index just past the alphanumeric escape starting at ``pattern[i]``."""
+    nxt = pattern[i + 1]
+    if nxt in _ESCAPE_HEX_DIGITS:
+        return i + 2 + _ESCAPE_HEX_DIGITS[nxt]
+    if nxt == "N" and pattern[i + 2:i + 3] == "{":
+        close = pattern.find("}", i)
+        return close + 1 if close != -1 else len(pattern)
+    end = i + 2
+    if nxt.isdigit():
+        # Octal (\0, \012, \123) or a group reference (\1, \12)
+        while end < len(pattern) and end < i + 4 and pattern[end].isdigit():
+            end += 1
+    return end
+
+
+def _required_literals(pattern: str) -> List[str]:
+    """Return literal substrings every match of *pattern* must contain.
+
+    Conservative: alternation or inline flags give up (empty list), groups and
+    character classes just end the current literal run, and a literal char
+    followed by ``*``, ``?`` or ``{`` is treated as optional.
+    """
+    if "|" in pattern or "(?" in pattern:
+        return []
+
+    literals: List[str] = []
+    run: List[str] = []
+
+    def flush():
+        if run:
+            literals.append("".join(run))
+            run.clear()
+
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            if nxt.isalnum():
+                # \d, \w, \b, ... are classes or assertions; \x70, \0123, \N{...}
+                # and backrefs \1 are longer, and their digits aren't literals
+                flush()
+                i = _escape_end(pattern, i)
+            else:
+                run.append(nxt)
+                i += 2
+            continue
+        if ch in _REGEX_OPTIONAL:
+            if run:
+                run.pop()
+            flush()
+            if ch == "{":
+                close = pattern.find("}", i)
+                i = close + 1 if close != -1 else len(pattern)
+                continue
+        elif ch == "[":
+            flush()
+            i += 1
+            if pattern[i:i + 1] == "^":
+                i += 1
+            if pattern[i:i + 1] == "]":  # `[]...]` starts with a literal `]`
+                i += 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+            continue
+        elif ch == "(":
+            flush()
+            nesting = 0
+            while i < len(pattern):
+                if pattern[i] == "\\":
+                    i += 2
+                    continue
+                if pattern[i] == "(":
+                    nesting += 1
+                elif pattern[i] == ")":
+                    nesting -= 1
+                    if nesting == 0:
+                        break
+                i += 1
+            # A quantified group is optional as a whole; its contents were skipped anyway.
+        elif ch in _REGEX_META:
+            flush()
+        else:
+            run.append(ch)
+        i += 1
+    flush()
+    return literals
 
 
 class CallGraph:
@@ -17,12 +175,27 @@ class CallGraph:
         self._name_to_nodes: Dict[str, Set[str]] = defaultdict(set)
         for node_id, name in node_to_name.items():
             self._name_to_nodes[name].add(node_id)
+        self._seed_index: Optional[Dict[str, Set[str]]] = None
+        self._label_names: Optional[List[str]] = None
+        self._label_index: Optional[Dict[str, array]] = None
 
     @classmethod
-    def from_dot(cls, path: Path) -> Optional["CallGraph"]:
+    def from_dot(cls, path: Path, use_cache: bool = False) -> Optional["CallGraph"]:
+        """Parse *path*; with *use_cache*, reuse/refresh its cache.
+
+        The cache is a JSON file under `default_cache_dir()`, named after the
+        DOT file's path and never executed, so a DOT file's directory cannot
+        smuggle code in. It also stores the label search index, so repeated
+        loads of the same graph skip both DOT parsing and demangling.
+        """
         if not path.exists():
             return None
 
+        if use_cache:
+            graph = cls._load_cache(path)
+            if graph is not None:
+                return graph
+
         raw_node_labels: Dict[str, str] = {}
         edges = []
 
@@ -69,7 +242,56 @@ class CallGraph:
                 continue
             adjacency[src_name].add(dst_name)
 
-        return cls(node_to_name, adjacency)
+        graph = cls(node_to_name, adjacency)
+        if use_cache:
+            graph._save_cache(path)
+        return graph
+
+    @staticmethod
+    def _cache_path(path: Path) -> Path:
+        key = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:32]
+        return Path(default_cache_dir()) / f"{key}.json"
+
+    @staticmethod
+    def _cache_stamp(path: Path) -> list:
+        stat = path.stat()
+        # Labels are left mangled without rustfilt; installing it invalidates such a cache
+        return [_CACHE_VERSION, str(path.resolve()), stat.st_mtime_ns, stat.st_size, shutil.which("rustfilt") is not None]
+
+    @classmethod
+    def _load_cache(cls, path: Path) -> Optional["CallGraph"]:
+        cache_path = cls._cache_path(path)
+        if not cache_path.exists():
+            return None
+        try:
+            with cache_path.open("r") as f:
+                payload = json.load(f)
+            if not isinstance(payload, dict) or payload.get("stamp") != cls._cache_stamp(path):
+                return None
+            adjacency = {name: set(children) for name, children in payload["adjacency"].items()}
+            graph = cls(payload["node_to_name"], adjacency)
+            graph._label_names = payload["label_names"]
+            graph._label_index = {gram: array("I", ids) for gram, ids in payload["label_index"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, OverflowError):
+            return None
+        return graph
+
+    def _save_cache(self, path: Path) -> None:
+        self._ensure_label_index()
+        payload = {
+            "stamp": self._cache_stamp(path),
+            "node_to_name": self._node_to_name,
+            "adjacency": {name: sorted(children) for name, children in self._adjacency.items()},
+            "label_names": self._label_names,
+            "label_index": {gram: ids.tolist() for gram, ids in self._label_index.items()},
+        }
+        cache_path = self._cache_path(path)
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with cache_path.open("w") as f:
+                json.dump(payload, f, separators=(",", ":"))
+        except OSError as e:
+            print(f"[rust-future-tracing] WARNING: Unable to write call graph cache: {e}")
 
     @staticmethod
     def _extract_label(joined: str) -> str:
@@ -105,33 +327,185 @@ class CallGraph:
 
     def descendants(self, start_names: Iterable[str], depth: int) -> Set[str]:
         """Return demangled descendants up to *depth* (excluding the start nodes)."""
-        if depth <= 0:
-            return set()
+        reach = self.descendants_by_seed(start_names, depth)
+        return set().union(*reach.values()) if reach else set()
 
-        visited: Set[str] = set()
-        result: Set[str] = set()
-        queue: deque = deque()
+    def descendants_by_seed(
+        self,
+        start_names: Iterable[str],
+        depth: int,
+        exclude_prefixes: Iterable[str] = (),
+        budget: int = 0,
+        uncounted: Iterable[str] = (),
+    ) -> Dict[str, Dict[str, int]]:
+        """Return ``{seed: {descendant: depth}}`` for descendants up to *depth*.
 
-        for name in start_names:
-            if name in self._adjacency:
-                visited.add(name)
-                queue.append((name, 0))
+        The traversal is a level-synchronous multi-source BFS, so every
+        descendant is reported at its shallowest depth and attributed to all
+        seeds reaching it at that depth. Nodes whose top-level namespace is in
+        *exclude_prefixes* are neither reported nor expanded. A positive
+        *budget* caps the number of distinct descendants; since levels are
+        visited shallowest first, the cut drops the deepest candidates.
+        Descendants in *uncounted* (already instrumented by the caller) are
+        reported and expanded without taking up any of the budget.
+        """
+        seeds = [name for name in dict.fromkeys(start_names) if name in self._adjacency]
+        reach: Dict[str, Dict[str, int]] = {seed: {} for seed in seeds}
+        if depth <= 0 or not seeds:
+            return reach
 
-        while queue:
-            node, dist = queue.popleft()
-            if dist >= depth:
-                continue
-            for child in self._adjacency.get(node, ()):  # type: ignore[arg-type]
-                if child not in visited:
-                    visited.add(child)
-                    result.add(child)
-                    queue.append((child, dist + 1))
+        excluded = set(exclude_prefixes)
+        uncounted = set(uncounted)
+        owners: Dict[str, Set[str]] = {seed: {seed} for seed in seeds}
+        frontier = list(seeds)
+        found = 0
+
+        for level in range(1, depth + 1):
+            next_owners: Dict[str, Set[str]] = {}
+            for node in frontier:
+                node_owners = owners[node]
+                for child in self._adjacency.get(node, ()):  # type: ignore[arg-type]
+                    if child in owners:
+                        continue
+                    if excluded and child.split("::", 1)[0] in excluded:
+                        continue
+                    pending = next_owners.get(child)
+                    if pending is None:
+                        next_owners[child] = set(node_owners)
+                    else:
+                        pending |= node_owners
 
-        return result
+            if not next_owners:
+                break
+
+            level_nodes = sorted(next_owners)
+            counted = [name for name in level_nodes if name not in uncounted]
+            if budget > 0 and found + len(counted) > budget:
+                counted = counted[: budget - found]
+                kept = set(counted)
+                level_nodes = [name for name in level_nodes if name in kept or name in uncounted]
+
+            for child in level_nodes:
+                child_owners = next_owners[child]
+                owners[child] = child_owners
+                for seed in child_owners:
+                    reach[seed][child] = level
+            found += len(counted)
+
+            if budget > 0 and found >= budget:
+                break
+            frontier = level_nodes
+
+        return reach
 
     def has_node(self, name: str) -> bool:
         return name in self._name_to_nodes
 
+    def _ensure_seed_index(self) -> Dict[str, Set[str]]:
+        """Build the normalized-key -> node names index on first use."""
+        if self._seed_index is not None:
+            return self._seed_index
+
+        index: Dict[str, Set[str]] = defaultdict(set)
+        for name in self._name_to_nodes:
+            key = seed_key(name)
+            if key:
+                index[key].add(name)
+
+        # A poll function `f::{async_fn#0}` is also seeded by the plain `f` node
+        # (the non-async wrapper that constructs the future), so fold those in
+        # once here instead of probing a second key per lookup.
+        for key in [k for k in index if _CLOSURE_KEY in k]:
+            plain = index.get(_strip_closure_segments(key))
+            if plain:
+                index[key] |= plain
+
+        self._seed_index = dict(index)
+        return self._seed_index
+
+    def match_seed(self, name: str) -> Set[str]:
+        """Return the call-graph node names matching a poll function name."""
+        index = self._ensure_seed_index()
+        key = seed_key(name)
+        if not key:
+            return set()
+        matched = index.get(key)
+        if matched is None and _CLOSURE_KEY in key:
+            matched = index.get(_strip_closure_segments(key))
+        return set(matched) if matched else set()
+
+    def _ensure_label_index(self) -> Dict[str, array]:
+        """Build the trigram -> sorted node-name ids index on first use."""
+        if self._label_index is not None:
+            return self._label_index
+
+        names = sorted(self._name_to_nodes)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for name_id, name in enumerate(names):
+            for gram in _trigrams(name):
+                postings[gram].append(name_id)
+
+        self._label_names = names
+        self._label_index = {gram: array("I", ids) for gram, ids in postings.items()}
+        return self._label_index
+
+    def find_nodes(self, pattern: str, regex: bool = False) -> List[str]:
+        """Return node names containing *pattern* (or matching it with *regex*).
+
+        Candidates come from intersecting the trigram postings of the literal
+        parts of the pattern; only those are checked against the real matcher.
+        Patterns without a literal of three or more characters scan all names.
+        """
+        index = self._ensure_label_index()
+        names = self._label_names
+
+        if regex:
+            compiled = re.compile(pattern)
+            matcher = lambda name: compiled.search(name) is not None
+            literals = _required_literals(pattern)
+        else:
+            matcher = lambda name: pattern in name
+            literals = [pattern]
+
+        grams = set()
+        for literal in literals:
+            grams |= _trigrams(literal)
+
+        if not grams:
+            return [name for name in names if matcher(name)]
+
+        candidates: Optional[Set[int]] = None
+        for gram in sorted(grams, key=lambda g: len(index.get(g, ()))):
+            ids = index.get(gram)
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates.intersection(ids)
+            if not candidates:
+                return []
+
+        return [names[i] for i in sorted(candidates) if matcher(names[i])]
+
+    def subgraph(self, pattern: str, depth: int, regex: bool = False) -> Set[str]:
+        """Return the nodes matching *pattern* plus their descendants up to *depth*."""
+        starts = self.find_nodes(pattern, regex)
+        return set(starts) | self.descendants(starts, depth)
+
+    def write_dot(self, path: Path, names: Iterable[str], graph_name: str = "subgraph") -> None:
+        """Write *names* and the edges between them as a standalone DOT file."""
+        selected = set(names)
+        node_ids = {name: min(self._name_to_nodes[name]) if name in self._name_to_nodes else name for name in selected}
+
+        with path.open("w") as f:
+            f.write(f'digraph "{graph_name}" {{\n')
+            for name in sorted(selected):
+                label = name.replace("\\", "\\\\").replace('"', '\\"')
+                f.write(f'    {node_ids[name]} [label="{label}"];\n')
+            for src in sorted(selected):
+                for dst in sorted(self._adjacency.get(src, ())):
+                    if dst in selected:
+                        f.write(f"    {node_ids[src]} -> {node_ids[dst]};\n")
+            f.write("}\n")
+
 
 def find_call_graph(path_hint: str) -> Optional[CallGraph]:
     """Locate and load the call graph DOT file."""
@@ -171,7 +545,7 @@ def find_call_graph(path_hint: str) -> Optional[CallGraph]:
         candidates.sort(key=lambda p: p.stat().st_mtime, reverse=True)
 
     for path in candidates:
-        graph = CallGraph.from_dot(path)
+        graph = CallGraph.from_dot(path, use_cache=True)
         if graph:
             print(f"[rust-future-tracing] Loaded call graph from {path}")
             return graph
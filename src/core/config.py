@@ -1,6 +1,8 @@
 # different compilers may produce different poll types
 poll_type = "core::task::poll::Poll"
-PLUGIN_NAME = "tokio"
+# Runtime plugin packages (importable from src/) loaded by start-async-debug, all at once.
+# Points that several plugins instrument share one breakpoint (see core/runtime_plugins/registry.py).
+PLUGIN_NAMES = ["tokio"]
 # with 
 # result_path = "results/"
 
@@ -17,10 +19,64 @@ SYNC_DESCENDANT_DEPTH = 2
 # Top-level namespace prefixes to ignore when collecting synchronous descendants.
 SYNC_DESCENDANT_EXCLUDE_PREFIXES = {"core", "alloc", "std", "llvm", "serde", "icu"}
 
+# Maximum number of synchronous descendants to instrument across all poll functions.
+# Shallower descendants are kept first when the budget is hit. Set to 0 for no limit.
+SYNC_DESCENDANT_BUDGET = 0
+
 # Toggle asynchronous descendant instrumentation discovered via dependency expansion.
 ENABLE_ASYNC_DESCENDANTS = True
 
 # Maximum number of frames to display from the start and end of each coroutine stack.
 # Set to 0 to suppress the corresponding section.
 ASYNC_STACK_HEAD_LIMIT = 5
-ASYNC_STACK_TAIL_LIMIT = 5
\ No newline at end of file
+ASYNC_STACK_TAIL_LIMIT = 5
+
+# Sampling of instrumented poll functions, for futures polled too often to trace every hit.
+# Only every Nth hit of an instrument point runs its tracers (1 traces every hit).
+POLL_SAMPLE_EVERY = 1
+
+# Maximum traced hits per second per instrument point; when exceeded the breakpoint is
+# disabled until the rate allows another hit. Set to 0 for no limit.
+POLL_SAMPLE_MAX_PER_SEC = 0
+
+# Per-symbol sampling settings, matched by substring: {"symbol fragment": (every, max_per_sec)}.
+# Overrides also apply to the runtime plugin's own instrument points, which are otherwise unsampled.
+POLL_SAMPLE_OVERRIDES = {}
+
+# Overhead governor: fraction of wall time that breakpoint handling of poll functions may take
+# (e.g. 0.2 for 20%). While over budget, the hottest breakpoint is downgraded once per window,
+# first to 1-in-OVERHEAD_SAMPLE_EVERY sampling, then to counting only. Set to 0 to disable.
+OVERHEAD_BUDGET = 0
+OVERHEAD_WINDOW_SECONDS = 1.0
+OVERHEAD_SAMPLE_EVERY = 100
+
+# Counting-only tier: these functions get a breakpoint that only counts hits (see `async-counts`),
+# no tracers. Set COUNT_ONLY_SYNC_DESCENDANTS to count the call-graph descendants instead of
+# tracing them; COUNT_ONLY_PATTERNS moves poll functions whose name contains a pattern there too.
+COUNT_ONLY_SYNC_DESCENDANTS = False
+COUNT_ONLY_PATTERNS = []
+
+# Lazy DWARF loading for init-dwarf-analysis: only the compile unit headers are read up front
+# and a CU's DIEs are parsed when a lookup reaches it. CUs are then kept in file order, since
+# sorting them by source file name needs every CU's top DIE.
+DWARF_LAZY_CUS = True
+
+# Map the binary with mmap and read its DWARF sections in place instead of copying each
+# section into memory. Compressed or relocated sections are still copied.
+DWARF_MMAP_SECTIONS = True
+
+# Split DWARF (-C split-debuginfo=unpacked/packed): follow the skeleton units of the binary
+# into their .dwo files or <binary>.dwp. The split files' unit headers are read by up to
+# DWARF_SPLIT_WORKERS threads at once; their DIEs are parsed on demand like any other CU.
+DWARF_SPLIT_UNITS = True
+DWARF_SPLIT_WORKERS = 4
+
+# Compressed debug sections (SHF_COMPRESSED, e.g. -Z debuginfo-compression=zlib/zstd; zstd needs
+# the zstandard package) are decompressed on first access. With DWARF_SECTION_CACHE the
+# decompressed bytes are also kept on disk under DWARF_SECTION_CACHE_DIR, by build id, and mapped
+# from there next time. An empty DWARF_SECTION_CACHE_DIR means ~/.cache/rust-future-tracing/debug-sections.
+# Each build takes the full decompressed size of its debug info; past DWARF_SECTION_CACHE_MAX_MB
+# the least recently used builds are removed (0 for no limit).
+DWARF_SECTION_CACHE = True
+DWARF_SECTION_CACHE_DIR = ""
+DWARF_SECTION_CACHE_MAX_MB = 2048
@@ -0,0 +1,98 @@
+"""
+Counting-only instrumentation tier.
+
+For functions where only "how often was this called" matters, a
+`CountingBreakpoint` replaces the tracing `EntryBreakpoint`: its `stop()`
+bumps one slot of a preallocated array and returns, with no tracer objects,
+no per-hit dicts and no FinishBreakpoint. The `async-counts` command prints
+and exports the totals.
+"""
+import json
+from array import array
+from typing import Iterable, List
+
+import gdb
+
+# Hit counts, one slot per counting breakpoint, indexed by `CountingBreakpoint.index`.
+counts = array("Q")
+# Symbol of each slot in `counts`.
+count_symbols: List[str] = []
+
+
+class CountingBreakpoint(gdb.Breakpoint):
+    """A breakpoint that only counts its hits."""
+    def __init__(self, symbol: str, index: int):
+        super().__init__(symbol, internal=True)
+        self.index = index
+
+    def stop(self):
+        counts[self.index] += 1
+        return False
+
+
+def install_counting_breakpoints(symbols: Iterable[str]) -> int:
+    """
+    Replaces any previous counting tier with one breakpoint per symbol.
+    The counts array is allocated once, up front. Returns how many were set.
+    """
+    for breakpoint in gdb.breakpoints():
+        if isinstance(breakpoint, CountingBreakpoint):
+            breakpoint.delete()
+
+    symbols = list(dict.fromkeys(symbols))
+    del count_symbols[:]
+    counts[:] = array("Q", bytes(8 * len(symbols)))
+    installed = 0
+    for index, symbol in enumerate(symbols):
+        count_symbols.append(symbol)
+        try:
+            CountingBreakpoint(symbol, index)
+            installed += 1
+        except gdb.error as e:
+            print(f"[rust-future-tracing] WARNING: Could not set counting breakpoint for {symbol}: {e}")
+    return installed
+
+
+def sorted_counts():
+    """(symbol, hits) pairs, most hits first."""
+    return sorted(zip(count_symbols, counts), key=lambda item: (-item[1], item[0]))
+
+
+class AsyncCountsCommand(gdb.Command):
+    """
+    Prints the hit counts of the counting-only tier.
+    Usage: async-counts [N] [EXPORT_PATH]
+    N limits the listing to the top N functions (default 20, 0 for all);
+    with EXPORT_PATH all counts are also written there as JSON.
+    """
+    def __init__(self):
+        super().__init__("async-counts", gdb.COMMAND_USER)
+
+    def invoke(self, arg, from_tty):
+        self.dont_repeat()
+        args = gdb.string_to_argv(arg)
+        limit = 20
+        if args and args[0].isdigit():
+            limit = int(args.pop(0))
+        export_path = args[0] if args else None
+
+        if not count_symbols:
+            print("[rust-future-tracing] No counting breakpoints installed.")
+            print("Hint: set COUNT_ONLY_SYNC_DESCENDANTS or COUNT_ONLY_PATTERNS in config.py and run 'start-async-debug'.")
+            return
+
+        ranked = sorted_counts()
+        total = sum(counts)
+        hit = sum(1 for _, n in ranked if n)
+        print(f"[rust-future-tracing] {total} hits across {hit}/{len(ranked)} counted functions")
+        print(f"{'Hits':>12}  Function")
+        for symbol, n in (ranked[:limit] if limit else ranked):
+            print(f"{n:>12}  {symbol}")
+
+        if export_path:
+            try:
+                with open(export_path, "w") as f:
+                    json.dump({"total": total, "counts": dict(ranked)}, f, indent=2)
+                print(f"[rust-future-tracing] Exported {len(ranked)} counts to {export_path}")
+            except OSError as e:
+                print(f"[rust-future-tracing] Failed to export counts to {export_path}: {e}")
@@ -4,12 +4,45 @@
 # This version fixes a critical bug in the recursive dependency resolution that caused
 # the dependency tree to be empty. The cycle detection logic (`seen` set) is now handled correctly.
 
+import bisect
+from struct import unpack_from
 import subprocess
 import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Set
+from typing import List, Dict, Optional, Set, Tuple
 import json
 import os
+import sys
+
+try:
+    from .splitdwarf import dwp_path, resolve_split_files
+    from .compressed import (CompressedSectionError, SectionCache, binary_identity, build_id, decompressed_elf,
+                             default_cache_dir, is_compressed_debug_section, section_data)
+except ImportError: # Run as a script from this directory
+    from splitdwarf import dwp_path, resolve_split_files
+    from compressed import (CompressedSectionError, SectionCache, binary_identity, build_id, decompressed_elf,
+                            default_cache_dir, is_compressed_debug_section, section_data)
+
+# objdump prints strings read through an offset or an index with a prefix:
+# "(indirect string, offset: 0x1f): name" or "(indexed string: 0x1f): name"
+_STRING = r'(?:\((?:indirect|indexed) string(?:, offset)?: (?:0x)?[0-9a-f]+\):\s*)?(.+)'
+# "Contents of the .debug_info.dwo section (loaded from /path/x.dwo):"
+_SECTION_HEADER = re.compile(r'Contents of the (\.debug_\w+(?:\.dwo)?) section(?: \(loaded from (.+)\))?:$')
+_DIE_HEADER = re.compile(r'\s*<(\d+)><([0-9a-f]+)>: Abbrev Number:')
+_DIE_TAG = re.compile(r'\s*<(\d+)><([0-9a-f]+)>: Abbrev Number: \d+ \((DW_TAG_\w+)\)')
+# "DW_AT_low_pc : 0x16a00", or "DW_AT_low_pc : (index: 0x3): 0x15d50" in split
+# units - or ": (index: 0x3): 0" when objdump has no .debug_addr to look in (a .dwp)
+_LOW_PC = re.compile(r'DW_AT_low_pc\s*:\s*(?:\(index: (0x[0-9a-f]+)\):\s*)?(0x[0-9a-f]+|\d+)')
+# The id pairing a skeleton unit with its split unit: an attribute in DWARF 4,
+# a unit header field ("DWO ID: 0x...") in DWARF 5
+_DWO_ID = re.compile(r'(?:DW_AT_GNU_dwo_id\s*:|^\s*DWO ID:)\s*0x([0-9a-f]+)')
+_ADDR_BASE = re.compile(r'DW_AT_(?:GNU_)?addr_base\s*:\s*(0x[0-9a-f]+|\d+)')
+# A row of `--dwarf=decodedline` output: file, line ("-" ends a sequence), address
+_LINE_ROW = re.compile(r'\S+\s+(\d+|-)\s+0x([0-9a-f]+)')
+# The future struct of an async fn or block, and the function that polls it
+_FUTURE_ENV = re.compile(r'\{(async_fn|async_block)_env#(\d+)\}')
+_POLL_FN = re.compile(r'\{(async_fn|async_block)#(\d+)\}')
 
 @dataclass
 class StructMember:
@@ -33,6 +66,15 @@ class Struct:
     type_id: Optional[str] = None
     locations: List[Dict[str, any]] = field(default_factory=list)
 
+@dataclass
+class ScopeDIE:
+    """A future struct or poll function, with the scope it is declared in."""
+    offset: str
+    parent: Optional[str]
+    name: str
+    qualified_name: str
+    low_pc: Optional[int] = None
+
 class DwarfAnalyzer:
     def __init__(self, binary_path: str):
         self.binary_path = binary_path
@@ -41,18 +83,176 @@ class DwarfAnalyzer:
         self.file_table: Dict[str, str] = {}
         self.current_struct: Optional[Struct] = None
         self.current_member: Optional[StructMember] = None
+        # Added to the DIE offsets of the output being parsed; non-zero for split DWARF
+        # files, which get offset ranges of their own (see splitdwarf.py)
+        self.base = 0
+        # Future structs and poll functions by (parent DIE, async_fn/async_block, N)
+        self.future_dies: List[Tuple[Tuple[Optional[str], str, str], ScopeDIE]] = []
+        self.poll_dies: Dict[Tuple[Optional[str], str, str], List[ScopeDIE]] = {}
+        # (address, ends a sequence) of every line table row, sorted
+        self.line_rows: List[Tuple[int, bool]] = []
+        # Skeleton units' .debug_addr base, by DWO id
+        self.addr_bases: Dict[int, int] = {}
+        self._debug_addr = None
 
-    def run_objdump(self) -> str:
-        """Run objdump and return its output."""
-        result = subprocess.run(['objdump', '--dwarf=info', self.binary_path],
-                              capture_output=True, text=True, check=True)
+    def run_objdump(self, path: Optional[str] = None, dwarf: str = 'info') -> str:
+        """
+        Run objdump on the binary (or on `path`) and return its output for the
+        `dwarf` sections. objdump can't read zstd compressed debug sections, so
+        a binary with compressed ones is dumped from a copy with them
+        decompressed.
+        """
+        path = path or self.binary_path
+        try:
+            plain = decompressed_elf(path, SectionCache(default_cache_dir()))
+        except CompressedSectionError as e:
+            print(f"Warning: {e}; dumping {path} as it is", file=sys.stderr)
+            plain = None
+        try:
+            result = subprocess.run(['objdump', f'--dwarf={dwarf}', plain or path],
+                                  capture_output=True, text=True, check=True)
+        finally:
+            if plain:
+                os.unlink(plain)
         return result.stdout
 
+    def objdump_sections(self) -> List[Tuple[int, List[str]]]:
+        """
+        objdump's .debug_info output for the binary and its split DWARF files,
+        as (DIE offset base, lines) chunks. objdump follows skeleton units into
+        .dwo files by itself, but not into a .dwp, which gets its own objdump
+        run alongside the main one. The main run also decodes the line table,
+        into `line_rows`.
+        """
+        dwp = dwp_path(self.binary_path)
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            main = pool.submit(self.run_objdump, None, 'info,decodedline')
+            packed = pool.submit(self.run_objdump, dwp) if os.path.isfile(dwp) else None
+            sections = self._split_sections(main.result())
+            packed_sections = self._split_sections(packed.result()) if packed else []
+
+        skeletons = [skeleton for (name, _, lines) in sections if name == '.debug_info'
+                     for skeleton in self._skeletons(lines)]
+        split_files = resolve_split_files(self.binary_path, skeletons)
+        bases = {split_file.path: split_file.base for split_file in split_files}
+        chunks = []
+        for (name, loaded_from, lines) in sections:
+            if name == '.debug_line':
+                self._parse_line_rows(lines)
+            elif name == '.debug_info':
+                chunks.append((0, lines))
+            elif name != '.debug_info.dwo':
+                continue
+            elif os.path.realpath(loaded_from or '') in bases:
+                chunks.append((bases[os.path.realpath(loaded_from)], lines))
+            else:
+                print(f"Warning: skipping {name} from {loaded_from}, not a split file of {self.binary_path}", file=sys.stderr)
+        if split_files and split_files[0].packed:
+            chunks.extend((split_files[0].base, lines) for (name, _, lines) in packed_sections
+                          if name == '.debug_info.dwo')
+        return chunks
+
+    def _parse_line_rows(self, lines):
+        for line in lines:
+            m = _LINE_ROW.match(line)
+            if m:
+                self.line_rows.append((int(m.group(2), 16), m.group(1) == '-'))
+        # An end of sequence sorts before a row starting the next one at the same address
+        self.line_rows.sort(key=lambda row: (row[0], not row[1]))
+
+    def _split_sections(self, output: str) -> List[Tuple[str, Optional[str], List[str]]]:
+        """Splits objdump output at its section headers into (section, loaded from, lines)."""
+        sections = []
+        for line in output.split('\n'):
+            m = _SECTION_HEADER.match(line)
+            if m:
+                sections.append((m.group(1), m.group(2), []))
+            elif sections:
+                sections[-1][2].append(line)
+        return sections
+
+    def _skeletons(self, lines):
+        """
+        (dwo name, comp dir, None) for the skeleton units in .debug_info output
+        lines. Also records their .debug_addr bases in `addr_bases`.
+        """
+        skeletons = []
+        dwo_name = comp_dir = None
+        dwo_id = addr_base = None
+        in_top_die = False
+        for line in lines:
+            m = _DIE_HEADER.match(line)
+            if m:
+                if dwo_name:
+                    skeletons.append((dwo_name, comp_dir, None))
+                if in_top_die and dwo_id is not None and addr_base is not None:
+                    self.addr_bases[dwo_id] = addr_base
+                in_top_die = m.group(1) == '0'
+                dwo_name = comp_dir = addr_base = None
+                if not in_top_die:
+                    dwo_id = None
+                continue
+            match = _DWO_ID.search(line)
+            if match:
+                dwo_id = int(match.group(1), 16)
+            elif in_top_die:
+                match = _ADDR_BASE.search(line)
+                if match:
+                    addr_base = int(match.group(1), 0)
+                match = re.search(r'DW_AT_(?:GNU_)?dwo_name\s*:\s*' + _STRING, line)
+                if match:
+                    dwo_name = match.group(1).strip()
+                match = re.search(r'DW_AT_comp_dir\s*:\s*' + _STRING, line)
+                if match:
+                    comp_dir = match.group(1).strip()
+        if dwo_name:
+            skeletons.append((dwo_name, comp_dir, None))
+        if in_top_die and dwo_id is not None and addr_base is not None:
+            self.addr_bases[dwo_id] = addr_base
+        return skeletons
+
+    def debug_addr(self):
+        """
+        The binary's .debug_addr contents, address size and byte order, or
+        None without one. Read once, for the split units objdump dumps without
+        it (those in a .dwp).
+        """
+        if self._debug_addr is None:
+            from elftools.elf.elffile import ELFFile
+            self._debug_addr = False
+            with open(self.binary_path, 'rb') as file:
+                elffile = ELFFile(file)
+                section = elffile.get_section_by_name('.debug_addr')
+                if section is not None:
+                    data = section_data(section, build_id(elffile), SectionCache(default_cache_dir())) \
+                        if is_compressed_debug_section(section) else section.data()
+                    self._debug_addr = (bytes(data), elffile.elfclass // 8, '<' if elffile.little_endian else '>')
+        return self._debug_addr or None
+
+    def _indexed_address(self, addr_base: int, index: int) -> Optional[int]:
+        debug_addr = self.debug_addr()
+        if debug_addr is None:
+            return None
+        (data, size, byte_order) = debug_addr
+        offset = addr_base + index * size
+        if offset + size > len(data):
+            return None
+        return unpack_from(byte_order + ('Q' if size == 8 else 'I'), data, offset)[0]
+
     def parse_dwarf(self):
-        """Parse DWARF information from objdump output (robust block detection)."""
-        output = self.run_objdump()
-        lines = output.split('\n')
-        
+        """Parse DWARF information from objdump output, following split DWARF."""
+        for (base, lines) in self.objdump_sections():
+            self.base = base
+            self._parse_lines(lines)
+            self._scan_scopes(lines)
+        self.base = 0
+
+    def _die_id(self, offset: str) -> str:
+        """A DIE offset from objdump, moved into the split file's range if it comes from one."""
+        return format(int(offset, 16) + self.base, 'x') if self.base else offset
+
+    def _parse_lines(self, lines: List[str]):
+        """Parse objdump's .debug_info output lines (robust block detection)."""
         i = 0
         while i < len(lines):
             line = lines[i]
@@ -82,11 +282,123 @@ class DwarfAnalyzer:
                 continue
             i += 1
 
+    def _scan_scopes(self, lines: List[str]):
+        """
+        Collects the future structs and poll functions in .debug_info output
+        lines, qualified with the names of the DIEs they are nested in (the
+        compile unit's name left out), the way GDB's DWARF tree names them.
+        Indexed addresses of split units are looked up in the binary's
+        .debug_addr, from the base of their skeleton.
+        """
+        # (depth, offset, qualified name) of the DIEs enclosing the current one
+        scopes = []
+        die = None
+        # .debug_addr base of the current unit, if it is a split unit
+        addr_base = None
+        for line in lines:
+            if 'Compilation Unit @' in line:
+                addr_base = None
+            elif 'DWO ID' in line or 'DW_AT_GNU_dwo_id' in line:
+                dwo_id = _DWO_ID.search(line)
+                if dwo_id:
+                    addr_base = self.addr_bases.get(int(dwo_id.group(1), 16))
+            m = _DIE_HEADER.match(line)
+            if m:
+                if die:
+                    self._close_scope_die(die, scopes)
+                tag = _DIE_TAG.match(line)
+                # [depth, offset, tag, name, low_pc]
+                die = [int(m.group(1)), m.group(2), tag.group(3) if tag else None, None, None]
+            elif die:
+                if die[3] is None and 'DW_AT_name' in line:
+                    name_match = re.search(r'DW_AT_name\s*:\s*' + _STRING, line)
+                    if name_match:
+                        die[3] = name_match.group(1).strip()
+                elif 'DW_AT_low_pc' in line:
+                    pc_match = _LOW_PC.search(line)
+                    if pc_match:
+                        die[4] = self._low_pc(pc_match, addr_base)
+        if die:
+            self._close_scope_die(die, scopes)
+
+    def _low_pc(self, pc_match, addr_base: Optional[int]) -> Optional[int]:
+        (index, value) = pc_match.groups()
+        if index is None:
+            return int(value, 0)
+        if addr_base is not None:
+            address = self._indexed_address(addr_base, int(index, 16))
+            if address is not None:
+                return address
+        # objdump prints 0 for an index it could not look up
+        return int(value, 0) or None
+
+    def _close_scope_die(self, die, scopes):
+        (depth, offset, tag, name, low_pc) = die
+        while scopes and scopes[-1][0] >= depth:
+            scopes.pop()
+        parent = scopes[-1][1] if scopes else None
+        prefix = scopes[-1][2] if scopes else ''
+        if name and tag != 'DW_TAG_compile_unit':
+            qualified_name = f"{prefix}::{name}" if prefix else name
+        else:
+            qualified_name = prefix
+        offset = self._die_id(offset)
+        scopes.append((depth, offset, qualified_name))
+        if not name:
+            return
+        if tag == 'DW_TAG_structure_type':
+            m = _FUTURE_ENV.search(name)
+            if m:
+                self.future_dies.append(((parent, m.group(1), m.group(2)), ScopeDIE(offset, parent, name, qualified_name)))
+        elif tag == 'DW_TAG_subprogram':
+            m = _POLL_FN.search(name)
+            if m:
+                self.poll_dies.setdefault((parent, m.group(1), m.group(2)), []).append(
+                    ScopeDIE(offset, parent, name, qualified_name, low_pc))
+
+    def post_prologue_pc(self, low_pc: Optional[int]) -> Optional[int]:
+        """
+        Where GDB puts a breakpoint on the function at `low_pc`: the address of
+        the next line table row, or low_pc itself if the function has a single
+        row. None if the line table doesn't cover low_pc.
+        """
+        if low_pc is None:
+            return None
+        i = bisect.bisect_left(self.line_rows, (low_pc, False))
+        if i == len(self.line_rows) or self.line_rows[i][0] != low_pc:
+            return None
+        j = bisect.bisect_right(self.line_rows, (low_pc, True))
+        if j == len(self.line_rows) or self.line_rows[j][1]:
+            return low_pc
+        return self.line_rows[j][0]
+
+    def future_polls(self) -> Dict[str, Dict[str, any]]:
+        """
+        The poll function of each future struct: the `{async_fn#N}` declared
+        next to its `{async_fn_env#N}`, preferring one of exactly that name
+        over, e.g., a generic instance.
+        """
+        pairs = {}
+        for (key, future) in self.future_dies:
+            polls = self.poll_dies.get(key)
+            if not polls:
+                continue
+            expected = future.name.replace('_env#', '#', 1)
+            poll = next((poll for poll in polls if poll.name == expected), polls[0])
+            pairs[future.offset] = {
+                'future_name': future.qualified_name,
+                'poll_offset': poll.offset,
+                'poll_name': poll.qualified_name,
+                'low_pc': poll.low_pc,
+                'post_prologue_pc': self.post_prologue_pc(poll.low_pc),
+            }
+        return pairs
+
     def _parse_file_table(self, comp_unit_lines):
         comp_dir = ""
         for line in comp_unit_lines:
             if 'DW_AT_comp_dir' in line:
-                match = re.search(r'DW_AT_comp_dir\s*:\s*(?:\(indirect string, offset: 0x[0-9a-f]+\):\s*)?(.+)', line)
+                match = re.search(r'DW_AT_comp_dir\s*:\s*' + _STRING, line)
                 if match:
                     comp_dir = match.group(1).strip().strip('"')
                     break
@@ -95,7 +407,7 @@ class DwarfAnalyzer:
         found_main_cu_name = False
         for line in comp_unit_lines:
             if 'DW_AT_name' in line:
-                match = re.search(r'DW_AT_name\s*:\s*(?:\(indirect string, offset: 0x[0-9a-f]+\):\s*)?(.+)', line)
+                match = re.search(r'DW_AT_name\s*:\s*' + _STRING, line)
                 if match:
                     name = match.group(1).strip()
                     if not found_main_cu_name:
@@ -116,11 +428,11 @@ class DwarfAnalyzer:
 
         m = re.search(r'<[0-9a-f]+><([0-9a-f]+)>', struct_lines[0].lstrip())
         if m:
-            type_id = m.group(1)
+            type_id = self._die_id(m.group(1))
 
         for line in struct_lines:
             if name is None and 'DW_AT_name' in line:
-                name_match = re.search(r'DW_AT_name\s*:\s*(?:\(indirect string, offset: 0x[0-9a-f]+\):\s*)?(.+)', line)
+                name_match = re.search(r'DW_AT_name\s*:\s*' + _STRING, line)
                 if name_match:
                     name = name_match.group(1).strip()
             if 'DW_AT_byte_size' in line:
@@ -177,7 +489,7 @@ class DwarfAnalyzer:
         decl_line = None
         for line in member_lines:
             if 'DW_AT_name' in line and name is None:
-                name_match = re.search(r'DW_AT_name\s*:\s*(?:\(indirect string, offset: 0x[0-9a-f]+\):\s*)?(.+)', line)
+                name_match = re.search(r'DW_AT_name\s*:\s*' + _STRING, line)
                 if name_match:
                     name = name_match.group(1).strip()
             if 'DW_AT_decl_file' in line:
@@ -191,7 +503,7 @@ class DwarfAnalyzer:
             if 'DW_AT_type' in line:
                 type_match = re.search(r'DW_AT_type\s*:\s*<0x([0-9a-f]+)>', line)
                 if type_match:
-                    type_str = type_match.group(1)
+                    type_str = self._die_id(type_match.group(1))
             if 'DW_AT_data_member_location' in line:
                 offset_match = re.search(r'DW_AT_data_member_location\s*:\s*(\d+)', line)
                 if offset_match:
@@ -294,10 +606,13 @@ class DwarfAnalyzer:
         }
         
         out = {
+            # The build the DIE offsets below belong to (see core/future_polls.py)
+            'binary': binary_identity(self.binary_path),
             'async_functions': async_functions_by_offset,
             'state_machines': state_machines_by_offset,
             'dependency_tree': dep_tree,
-            'offset_to_name': offset_to_name
+            'offset_to_name': offset_to_name,
+            'future_polls': self.future_polls()
         }
         print(json.dumps(out, indent=2, ensure_ascii=False))
 
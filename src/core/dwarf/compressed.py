@@ -0,0 +1,223 @@
+"""
+Compressed debug sections (SHF_COMPRESSED), as written by
+`-Z debuginfo-compression=zlib|zstd` or `ld --compress-debug-sections`.
+
+A compressed section starts with an Elf_Chdr (compression type, size after
+decompression, alignment) followed by a zlib stream or a zstd frame. zlib
+comes with Python; zstd needs the optional `zstandard` package.
+
+Decompressed sections can be kept in a `SectionCache`: one file per section
+under a directory named after the binary's GNU build id, which is the same
+for every copy of a build however it was compressed. A cached section is
+mapped rather than read, so repeated loads cost neither the decompression
+nor the memory for a private copy.
+
+The DWARF reader decompresses each section on first access through this
+module; async_deps.py, which runs objdump, uses `decompressed_elf` to hand
+objdump a copy of the binary with its debug sections stored plain.
+"""
+import os
+import shutil
+import tempfile
+import zlib
+from typing import Optional
+
+ELFCOMPRESS_ZLIB = 1
+ELFCOMPRESS_ZSTD = 2
+
+SHF_COMPRESSED = 0x800
+
+# Default size limit of a SectionCache; the least recently used builds go first
+DEFAULT_CACHE_MAX_BYTES = 2 << 30
+
+
+class CompressedSectionError(Exception):
+    pass
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "rust-future-tracing", "debug-sections")
+
+
+def _compression_type(ch_type) -> int:
+    # pyelftools names the types it knows and leaves the others as numbers
+    return {'ELFCOMPRESS_ZLIB': ELFCOMPRESS_ZLIB, 'ELFCOMPRESS_ZSTD': ELFCOMPRESS_ZSTD}.get(ch_type, ch_type)
+
+
+def decompress(ch_type, data, size: int) -> bytes:
+    """Decompresses the payload of a compressed section to its `size` bytes."""
+    ch_type = _compression_type(ch_type)
+    if ch_type == ELFCOMPRESS_ZLIB:
+        result = zlib.decompressobj().decompress(data, size)
+    elif ch_type == ELFCOMPRESS_ZSTD:
+        try:
+            import zstandard
+        except ImportError:
+            raise CompressedSectionError("zstd compressed debug sections need the zstandard package (pip install zstandard)")
+        result = zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+    else:
+        raise CompressedSectionError("Unsupported debug section compression type %r" % (ch_type,))
+    if len(result) != size:
+        raise CompressedSectionError("Decompressed section is %d bytes long, should be %d" % (len(result), size))
+    return result
+
+
+def build_id(elffile) -> Optional[str]:
+    """The GNU build id of a pyelftools ELFFile as a hex string, or None."""
+    for section in elffile.iter_sections():
+        if section['sh_type'] == 'SHT_NOTE':
+            for note in section.iter_notes():
+                if note['n_type'] == 'NT_GNU_BUILD_ID':
+                    return note['n_desc']
+    return None
+
+
+def binary_identity(path: str) -> dict:
+    """
+    What tells one build of a binary from another: its GNU build id, or its
+    path, size and modification time when it has none.
+    """
+    from elftools.elf.elffile import ELFFile
+    with open(path, 'rb') as file:
+        identity = build_id(ELFFile(file))
+    if identity:
+        return {"build_id": identity}
+    stat = os.stat(path)
+    return {"path": os.path.realpath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class SectionCache:
+    """
+    Decompressed sections on disk, one file per (build id, section name).
+    Once a store takes the directory over `max_bytes` (0 for no limit), the
+    builds loaded least recently are removed, all sections of a build at a
+    time, never the build being stored.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, build_id: str, name: str) -> str:
+        return os.path.join(self.directory, build_id, name.lstrip('.') or '_')
+
+    def load(self, build_id: str, name: str, size: int) -> Optional[memoryview]:
+        """A read-only mapping of the cached section, if it is there and `size` bytes long."""
+        import mmap
+        path = self.path(build_id, name)
+        try:
+            with open(path, 'rb') as file:
+                if size == 0 or os.fstat(file.fileno()).st_size != size:
+                    return None
+                # A build's directory mtime is when it was last used
+                os.utime(os.path.dirname(path))
+                return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+        except OSError:
+            return None
+
+    def store(self, build_id: str, name: str, data) -> bool:
+        """Writes a section atomically; False if the cache directory is not writable."""
+        path = self.path(build_id, name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            (fd, temp) = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    file.write(data)
+                os.replace(temp, path)
+            except BaseException:
+                os.unlink(temp)
+                raise
+        except OSError:
+            return False
+        if self.max_bytes:
+            self._evict(keep=build_id)
+        return True
+
+    def _evict(self, keep: str):
+        builds = []
+        total = 0
+        try:
+            for entry in os.scandir(self.directory):
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file(follow_symlinks=False))
+                total += size
+                if entry.name != keep:
+                    builds.append((entry.stat().st_mtime, entry.path, size))
+        except OSError:
+            return
+        # Mapped sections of a removed build stay readable until unmapped
+        for (_, path, size) in sorted(builds):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def section_data(section, build_id: Optional[str] = None, cache: Optional[SectionCache] = None):
+    """
+    The decompressed contents of a compressed pyelftools section - from the
+    cache when it has them, else decompressed (and then stored in the cache
+    and mapped from there, to give the private copy back).
+    """
+    from elftools.common.utils import struct_parse
+    header = struct_parse(section.structs.Elf_Chdr, section.stream, section['sh_offset'])
+    if cache is not None and build_id:
+        cached = cache.load(build_id, section.name, header.ch_size)
+        if cached is not None:
+            return cached
+    header_size = section.structs.Elf_Chdr.sizeof()
+    section.stream.seek(section['sh_offset'] + header_size)
+    data = decompress(header.ch_type, section.stream.read(section['sh_size'] - header_size), header.ch_size)
+    if cache is not None and build_id and cache.store(build_id, section.name, data):
+        return cache.load(build_id, section.name, header.ch_size) or data
+    return data
+
+
+def is_compressed_debug_section(section) -> bool:
+    return section.name.startswith('.debug') and bool(section['sh_flags'] & SHF_COMPRESSED)
+
+
+def decompressed_elf(binary_path: str, cache: Optional[SectionCache] = None) -> Optional[str]:
+    """
+    If the binary has compressed debug sections, writes a copy with those
+    stored plain and returns its path (a temporary file the caller removes);
+    else returns None. Debug sections aren't loaded, so the decompressed data
+    can go at the end of the file, with only the section headers changed.
+    """
+    from elftools.elf.elffile import ELFFile
+
+    with open(binary_path, 'rb') as file:
+        elffile = ELFFile(file)
+        sections = [(i, section) for (i, section) in enumerate(elffile.iter_sections())
+                    if is_compressed_debug_section(section)]
+        if not sections:
+            return None
+        file_build_id = build_id(elffile)
+        (fd, copy_path) = tempfile.mkstemp(prefix=os.path.basename(binary_path) + '.', suffix='.debug')
+        try:
+            with os.fdopen(fd, 'w+b') as copy:
+                file.seek(0)
+                while True:
+                    chunk = file.read(1 << 20)
+                    if not chunk:
+                        break
+                    copy.write(chunk)
+                for (i, section) in sections:
+                    data = section_data(section, file_build_id, cache)
+                    offset = (copy.seek(0, os.SEEK_END) + 7) & ~7
+                    copy.seek(offset)
+                    copy.write(data)
+                    header = section.header
+                    header.sh_flags &= ~SHF_COMPRESSED
+                    header.sh_offset = offset
+                    header.sh_size = len(data)
+                    header.sh_addralign = 1
+                    copy.seek(elffile['e_shoff'] + i * elffile['e_shentsize'])
+                    copy.write(elffile.structs.Elf_Shdr.build(header))
+        except BaseException:
+            os.unlink(copy_path)
+            raise
+    return copy_path
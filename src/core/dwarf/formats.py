@@ -506,12 +506,166 @@ def read_wasm(file):
     di._frames = None
     return di
 
-# Filename is only needed for supplemental DWARF resolution
-def read_elf(file, filename):
+########################################################################
+######################### Memory mapped ELF
+########################################################################
+
+class _MemoryViewRaw(io.RawIOBase):
+    """ Raw, read-only file over a memoryview - readinto copies only what is asked for.
+        Positions start at origin, i. e. the first byte of the view is at origin.
+    """
+    def __init__(self, view, origin=0):
+        self._view = view
+        self._origin = origin
+        self._pos = origin
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        start = self._pos - self._origin
+        n = min(len(b), len(self._view) - start)
+        if start < 0 or n <= 0:
+            return 0
+        b[:n] = self._view[start:start + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._origin + len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+class MemoryViewStream(io.BufferedReader):
+    """ Seekable stream over a memoryview, typically a slice of an mmap.
+        Reads go through BufferedReader's small buffer, so the section is never
+        copied as a whole, and getbuffer() returns the view like BytesIO's does.
+        With an origin, stream positions are shifted by it - the split DWARF
+        reader uses that to give .dwo DIEs offsets of their own.
+    """
+    def __init__(self, view, buffer_size=io.DEFAULT_BUFFER_SIZE, origin=0):
+        super().__init__(_MemoryViewRaw(view, origin), buffer_size)
+        self._view = view
+
+    def getbuffer(self):
+        return self._view
+
+class LazySectionStream:
+    """ Stream over a section whose bytes are produced - e. g. decompressed - on
+        first access. load() returns the bytes or a memoryview of them; from then
+        on read, seek and tell are the underlying MemoryViewStream's own methods.
+    """
+    def __init__(self, load):
+        self._load = load
+        self._stream = None
+
+    @property
+    def loaded(self):
+        return self._stream is not None
+
+    def _open(self):
+        if self._stream is None:
+            self._stream = MemoryViewStream(memoryview(self._load()))
+            self.read, self.seek, self.tell = self._stream.read, self._stream.seek, self._stream.tell
+        return self._stream
+
+    def read(self, *args):
+        return self._open().read(*args)
+
+    def seek(self, *args):
+        return self._open().seek(*args)
+
+    def tell(self):
+        return self._open().tell()
+
+    def getbuffer(self):
+        return self._open().getbuffer()
+
+def _elffile_class(mmap_sections):
     from elftools.elf.elffile import ELFFile
+    from .compressed import build_id, section_data
+
+    class DwarfELFFile(ELFFile):
+        """ ELFFile that decompresses SHF_COMPRESSED DWARF sections itself - zstd as
+            well as zlib - going through section_cache (a compressed.SectionCache)
+            when there is one.
+        """
+        def __init__(self, stream, stream_loader, section_cache=None):
+            self.section_cache = section_cache
+            self._build_id = False
+            ELFFile.__init__(self, stream, stream_loader)
+
+        def build_id(self):
+            if self._build_id is False:
+                self._build_id = build_id(self)
+            return self._build_id
+
+        def _read_dwarf_section(self, section, relocate_dwarf_sections):
+            if (not section.compressed or self.has_phantom_bytes()
+                    or (relocate_dwarf_sections and self['e_type'] == 'ET_REL')):
+                return ELFFile._read_dwarf_section(self, section, relocate_dwarf_sections)
+            return DebugSectionDescriptor(
+                stream=self._compressed_section_stream(section),
+                name=section.name,
+                global_offset=section['sh_offset'],
+                size=section.data_size,
+                address=section['sh_addr'])
+
+        def _compressed_section_stream(self, section):
+            return MemoryViewStream(memoryview(section_data(section, self.build_id(), self.section_cache)))
+
+    class MappedELFFile(DwarfELFFile):
+        """ ELFFile whose DWARF sections are views of the mapped file rather than
+            BytesIO copies. Compressed sections are decompressed when first read,
+            since the mapping outlives the file. Sections that need rewriting -
+            relocated, or with phantom bytes - go through the regular copying reader.
+        """
+        def __init__(self, view, stream_loader, section_cache=None):
+            self._view = view
+            DwarfELFFile.__init__(self, MemoryViewStream(view), stream_loader, section_cache)
+
+        def _compressed_section_stream(self, section):
+            return LazySectionStream(lambda: section_data(section, self.build_id(), self.section_cache))
+
+        def _read_dwarf_section(self, section, relocate_dwarf_sections):
+            if (section.compressed or section['sh_type'] == 'SHT_NOBITS' or self.has_phantom_bytes()
+                    or (relocate_dwarf_sections and self['e_type'] == 'ET_REL')):
+                return DwarfELFFile._read_dwarf_section(self, section, relocate_dwarf_sections)
+            offset, size = section['sh_offset'], section['sh_size']
+            return DebugSectionDescriptor(
+                stream=MemoryViewStream(self._view[offset:offset + size]),
+                name=section.name,
+                global_offset=offset,
+                size=size,
+                address=section['sh_addr'])
+
+    return MappedELFFile if mmap_sections else DwarfELFFile
+
+def map_file(file):
+    """ Read-only mmap of an open file, as a memoryview. The mapping outlives the
+        file object, and its pages come from the page cache, so reopening the same
+        binary is nearly free.
+    """
+    import mmap
+    return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+# Filename is only needed for supplemental DWARF resolution
+# With mmap_sections, the file must be a real file (not e. g. a BytesIO)
+# section_cache is an optional compressed.SectionCache for compressed DWARF sections
+def read_elf(file, filename, mmap_sections=False, section_cache=None):
     file.seek(0)
     # TODO: interactive supplemental DWARF resolver here...
-    elffile = ELFFile(file, lambda s: open(path.join(path.dirname(filename), s.decode('UTF-8')), 'rb'))
+    stream_loader = lambda s: open(path.join(path.dirname(filename), s.decode('UTF-8')), 'rb')
+    elffile = _elffile_class(mmap_sections)(map_file(file) if mmap_sections else file, stream_loader, section_cache)
 
     # Retrieve the preferred loading address
     load_segment = next((seg for seg in elffile.iter_segments() if seg.header.p_type == 'PT_LOAD'), None)
@@ -659,7 +813,7 @@ def read_staticlib(file, resolve_slice):
 ######################## The main entry point - file in, DWARF out
 #########################################################################
 
-def read_dwarf(filename, resolve_arch):
+def read_dwarf(filename, resolve_arch, mmap_sections=False, section_cache=None):
     """ UI agnostic - resolve_arch might be interactive
         Returns slightly augmented DWARFInfo
         Or None if not a DWARF containing file (or unrecognized)
@@ -667,6 +821,9 @@ def read_dwarf(filename, resolve_arch):
         Or throws an exception
         resolve_arch is for Mach-O fat binaries - see read_macho()
         and repurposed for .a static libraries
+        mmap_sections maps ELF files and reads their DWARF sections in place,
+        see MappedELFFile
+        section_cache keeps decompressed ELF DWARF sections on disk, see compressed.py
         Primary point of call is open_file() in main
     """
     if path.isfile(filename): # On MacOS, opening dSYM bundles as is would be right, and they are technically folders
@@ -677,7 +834,7 @@ def read_dwarf(filename, resolve_arch):
             if xsignature[:2] == b'MZ': # DOS header - this might be a PE. Don't verify the PE header, just feed it to the parser
                 return read_pe(filename)
             elif signature == b'\x7FELF': #It's an ELF
-                return read_elf(file, filename)
+                return read_elf(file, filename, mmap_sections, section_cache)
             elif signature in (b'\xFE\xED\xFA\xCE', b'\xFE\xED\xFA\xCF', b'\xCE\xFA\xED\xFE', b'\xCF\xFA\xED\xFE'):
                 # Mach-O 32/64-bit Mach-O in big/little-endian format, but not a fat binary
                 # TODO: little endian is not supported!
@@ -696,7 +853,7 @@ def read_dwarf(filename, resolve_arch):
     elif path.isdir(filename):
         binary_filename = binary_from_bundle(filename)
         if binary_filename:
-            return read_dwarf(binary_filename, resolve_arch)
+            return read_dwarf(binary_filename, resolve_arch, mmap_sections, section_cache)
         
 def get_debug_sections(di):
     section_names = {name: "debug_%s_sec" % name
@@ -715,10 +872,18 @@ def get_debug_sections(di):
         for (display_name, field_name) in section_names.items()
         if hasattr(di, field_name)}
 
+def compressed_section_stats(di):
+    """ (decompressed, total) count of the sections of di that are decompressed
+        on first access.
+    """
+    streams = [section.stream for section in get_debug_sections(di).values()
+               if section is not None and isinstance(section.stream, LazySectionStream)]
+    return (sum(1 for stream in streams if stream.loaded), len(streams))
+
 # Section can be a SectionDescription or a raw dump
 def section_bytes(section):
     return section if isinstance(section, (bytes, bytearray, memoryview)) else section.stream.getbuffer()
-    # TODO: reliance on stream being a BytesIO
+    # TODO: reliance on stream being a BytesIO or a MemoryViewStream
 
 def write_to_file(filename, data):
     with open(filename, 'wb') as f:
@@ -0,0 +1,137 @@
+"""
+Library-mode view of the DIE tree, for the analysis commands.
+
+`DWARFTreeModel` and `load_children` exist for the tree view: children are
+sorted for display with `die_sort_key` and addressed by row. The searches in
+`core/__init__.py` only ever look children up by name, so `LibraryTree`
+keeps each parent's children in file order together with a name -> children
+dict, both built once per parent on first use. Nothing is sorted and every
+child's name is read once.
+
+It also holds the qualified names ("crate::module::Type") of the scope
+DIEs, computed for a whole CU in one top-down pass the first time a DIE of
+that CU is asked for: each name is its parent's prefix plus one component,
+interned, and kept in a table keyed by DIE offset.
+
+It shares the DIE objects (and pyelftools' per-CU DIE cache) with the tree
+model, but not the `_children`/`_i` decorations, so the two don't disturb
+each other.
+"""
+import sys
+from typing import Dict, List, Optional, Set
+
+from .dwarfutil import safe_DIE_name
+
+# DIEs that get a precomputed qualified name; anything else is named on request.
+QUALIFIED_NAME_TAGS = frozenset((
+    'DW_TAG_namespace',
+    'DW_TAG_structure_type',
+    'DW_TAG_union_type',
+    'DW_TAG_enumeration_type',
+    'DW_TAG_class_type',
+    'DW_TAG_subprogram',
+))
+
+
+def crate_of_cu(cu_die) -> Optional[str]:
+    """
+    The crate of a CU from its name, which rustc makes
+    "<crate root>/@/<crate>.<hash>-cgu.<n>"; None for other producers.
+    """
+    (_, separator, unit) = safe_DIE_name(cu_die, "").rpartition("/@/")
+    return unit.split(".", 1)[0] if separator else None
+
+
+class ChildIndex:
+    """The children of one DIE: in file order, and grouped by name."""
+    __slots__ = ("children", "by_name")
+
+    def __init__(self, parent_die):
+        self.children = []
+        self.by_name: Dict[str, list] = {}
+        if not parent_die.has_children:
+            return
+        for child in parent_die.iter_children():
+            if child.is_null():
+                continue
+            self.children.append(child)
+            name = safe_DIE_name(child, "")
+            if name:
+                self.by_name.setdefault(name, []).append(child)
+
+
+class LibraryTree:
+    """
+    Per-parent child indices and qualified names, both keyed by .debug_info
+    offset.
+    """
+
+    def __init__(self):
+        self._indices: Dict[int, ChildIndex] = {}
+        self._qualified_names: Dict[int, str] = {}
+        self._named_cus: Set[int] = set()
+
+    def __len__(self):
+        return len(self._indices)
+
+    def index(self, parent_die) -> ChildIndex:
+        index = self._indices.get(parent_die.offset)
+        if index is None:
+            index = self._indices[parent_die.offset] = ChildIndex(parent_die)
+        return index
+
+    def children(self, parent_die) -> list:
+        """Children of `parent_die` in file order, without null DIEs."""
+        return self.index(parent_die).children
+
+    def named(self, parent_die, name: str) -> List:
+        """Children of `parent_die` whose DW_AT_name is exactly `name`."""
+        return self.index(parent_die).by_name.get(name, [])
+
+    def find_child(self, parent_die, tag: str, name_fragment: str):
+        """
+        First child with `tag` whose name contains `name_fragment`; an exact
+        name match wins over a partial one.
+        """
+        index = self.index(parent_die)
+        for child in index.by_name.get(name_fragment, ()):
+            if child.tag == tag:
+                return child
+        for name, children in index.by_name.items():
+            if name_fragment in name:
+                for child in children:
+                    if child.tag == tag:
+                        return child
+        return None
+
+    def qualified_name(self, die) -> Optional[str]:
+        """
+        "::"-joined names of `die` and its named ancestors below the CU, or
+        None if `die` is unnamed or not one of QUALIFIED_NAME_TAGS.
+        """
+        if die.cu.cu_offset not in self._named_cus:
+            self._name_cu(die.cu)
+        return self._qualified_names.get(die.offset)
+
+    def _name_cu(self, cu):
+        self._named_cus.add(cu.cu_offset)
+        names = self._qualified_names
+        # Qualified name of each open parent; the CU itself contributes nothing
+        prefixes = []
+        for die in cu.iter_DIEs():
+            if die.is_null():
+                if prefixes:
+                    prefixes.pop()
+                continue
+            prefix = prefixes[-1] if prefixes else ""
+            name = safe_DIE_name(die, "") if die.tag not in ('DW_TAG_compile_unit', 'DW_TAG_partial_unit') else ""
+            qualified = (prefix + "::" + name if prefix else name) if name else prefix
+            if name and die.tag in QUALIFIED_NAME_TAGS:
+                qualified = names[die.offset] = sys.intern(qualified)
+            if die.has_children:
+                prefixes.append(qualified)
+
+    def clear(self):
+        self._indices.clear()
+        self._qualified_names.clear()
+        self._named_cus.clear()
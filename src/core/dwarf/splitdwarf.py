@@ -0,0 +1,348 @@
+"""
+Split DWARF: following skeleton units into .dwo and .dwp files.
+
+With `-C split-debuginfo=unpacked` (or `-gsplit-dwarf`) the main binary only
+keeps a skeleton unit per compile unit - the .dwo file name, compilation
+directory, DWO id and address table base - and the DIEs stay in one .dwo
+file per object. With `-C split-debuginfo=packed` the .dwo files are merged
+into `<binary>.dwp`, where .debug_cu_index locates each unit's pieces.
+
+Offsets in a split file start from 0 again, so each split file gets a range
+of its own: file i, numbered in the order the skeletons first name them (a
+.dwp is file 0), has its DIE offsets moved up by `split_base(i)`.
+async_deps.py and the in-GDB tree number the files the same way, so DIE
+offsets from async_deps.json resolve with `DWARFTreeModel.find_offset` as
+for any other unit.
+
+File discovery (`resolve_split_files`, `read_unit_index`) only needs the
+standard library, so async_deps.py can use it when run as a script.
+"""
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Split file i starts at (i + 1) << SPLIT_OFFSET_SHIFT, above any offset in a
+# 32-bit DWARF .debug_info
+SPLIT_OFFSET_SHIFT = 32
+
+# DW_SECT_* column ids of a .dwp unit index, the same in versions 2 and 5
+DW_SECT_INFO = 1
+DW_SECT_ABBREV = 3
+DW_SECT_LINE = 4
+DW_SECT_LOCLISTS = 5 # DW_SECT_LOC in version 2
+DW_SECT_STR_OFFSETS = 6
+DW_SECT_RNGLISTS = 8
+
+
+def split_base(index: int) -> int:
+    return (index + 1) << SPLIT_OFFSET_SHIFT
+
+
+class SplitFile:
+    """A .dwo or .dwp file, its offset range and the skeletons pointing into it."""
+    __slots__ = ("path", "base", "packed", "skeletons")
+
+    def __init__(self, path: str, base: int, packed: bool):
+        self.path = path
+        self.base = base
+        self.packed = packed
+        self.skeletons = []
+
+
+def dwp_path(binary_path: str) -> str:
+    return binary_path + ".dwp"
+
+
+def resolve_split_files(binary_path: str, skeletons) -> List[SplitFile]:
+    """
+    The split files of a binary, given its skeletons as (dwo name, comp dir,
+    skeleton) tuples in .debug_info order. A `<binary>.dwp` wins over the .dwo
+    files; a .dwo name is looked up relative to its comp dir, then next to the
+    binary. Missing files are listed all the same, so that the numbering does
+    not depend on which files are there.
+    """
+    skeletons = list(skeletons)
+    if not skeletons:
+        return []
+    dwp = dwp_path(binary_path)
+    if os.path.isfile(dwp):
+        split_file = SplitFile(os.path.realpath(dwp), split_base(0), True)
+        split_file.skeletons = [skeleton for (_, _, skeleton) in skeletons]
+        return [split_file]
+    files: Dict[str, SplitFile] = {}
+    for (dwo_name, comp_dir, skeleton) in skeletons:
+        path = _dwo_path(binary_path, dwo_name, comp_dir)
+        split_file = files.get(path)
+        if split_file is None:
+            split_file = files[path] = SplitFile(path, split_base(len(files)), False)
+        split_file.skeletons.append(skeleton)
+    return list(files.values())
+
+
+def _dwo_path(binary_path, dwo_name, comp_dir):
+    path = os.path.join(comp_dir or "", dwo_name)
+    if not os.path.isfile(path):
+        nearby = os.path.join(os.path.dirname(os.path.abspath(binary_path)), os.path.basename(dwo_name))
+        if os.path.isfile(nearby):
+            path = nearby
+    return os.path.realpath(path)
+
+
+class UnitIndexRow(NamedTuple):
+    signature: Optional[int]
+    sections: Dict[int, Tuple[int, int]] # DW_SECT_* -> (offset, size) of the unit's contribution
+
+
+def read_unit_index(data, little_endian: bool = True) -> List[UnitIndexRow]:
+    """Rows of a .dwp .debug_cu_index - DWARF 5 section 7.3.5, or the GNU version 2 before it."""
+    e = '<' if little_endian else '>'
+    (version,) = struct.unpack_from(e + 'H', data, 0) # Version 5 has a 2 byte version and padding
+    if version != 5:
+        (version,) = struct.unpack_from(e + 'I', data, 0)
+    if version not in (2, 5):
+        raise ValueError("Unsupported .debug_cu_index version %d" % version)
+    (section_count, unit_count, slot_count) = struct.unpack_from(e + '3I', data, 4)
+    signatures = struct.unpack_from(e + '%dQ' % slot_count, data, 16)
+    rows_at = 16 + 8 * slot_count
+    row_numbers = struct.unpack_from(e + '%dI' % slot_count, data, rows_at)
+    ids_at = rows_at + 4 * slot_count
+    section_ids = struct.unpack_from(e + '%dI' % section_count, data, ids_at)
+    offsets_at = ids_at + 4 * section_count
+    sizes_at = offsets_at + 4 * section_count * unit_count
+    signature_of_row = {row: signature for (signature, row) in zip(signatures, row_numbers) if row}
+    rows = []
+    for row in range(unit_count):
+        offsets = struct.unpack_from(e + '%dI' % section_count, data, offsets_at + 4 * section_count * row)
+        sizes = struct.unpack_from(e + '%dI' % section_count, data, sizes_at + 4 * section_count * row)
+        rows.append(UnitIndexRow(signature_of_row.get(row + 1), dict(zip(section_ids, zip(offsets, sizes)))))
+    return rows
+
+#------------------------------------------------
+# Loading split units with pyelftools
+#------------------------------------------------
+
+class SkeletonUnit(NamedTuple):
+    cu: object
+    dwo_id: Optional[int]
+    addr_base: int
+
+
+def _is_skeleton(cu):
+    if cu['version'] >= 5:
+        return cu['unit_type'] == 'DW_UT_skeleton'
+    # Before DWARF 5 only the top DIE tells; check its abbrev rather than parse it
+    from elftools.common.utils import struct_parse
+    code = struct_parse(cu.structs.the_Dwarf_uleb128, cu.dwarfinfo.debug_info_sec.stream, cu.cu_die_offset)
+    return code != 0 and any(name == 'DW_AT_GNU_dwo_name' for (name, _) in cu.get_abbrev_table().get_abbrev(code).iter_attr_specs())
+
+
+def _text(value):
+    return value.decode('utf-8', errors='replace') if isinstance(value, bytes) else value
+
+
+def skeleton_units(cus):
+    """(dwo name, comp dir, SkeletonUnit) for the skeleton units among `cus`, in order."""
+    for cu in cus:
+        if not _is_skeleton(cu):
+            continue
+        attributes = cu.get_top_DIE().attributes
+        name = attributes.get('DW_AT_dwo_name') or attributes.get('DW_AT_GNU_dwo_name')
+        if name is None:
+            continue
+        comp_dir = attributes.get('DW_AT_comp_dir')
+        dwo_id = cu['dwo_id'] if cu['version'] >= 5 else attributes['DW_AT_GNU_dwo_id'].value if 'DW_AT_GNU_dwo_id' in attributes else None
+        addr_base = attributes.get('DW_AT_addr_base') or attributes.get('DW_AT_GNU_addr_base')
+        yield (_text(name.value), _text(comp_dir.value) if comp_dir else "",
+               SkeletonUnit(cu, dwo_id, addr_base.value if addr_base else 0))
+
+
+# Index forms in split units. pyelftools can't parse the GNU ones, and resolves the
+# DWARF 5 ones through the DW_AT_*_base attributes, which split units don't have.
+# In split units they are renamed to SPLIT_FORM_SUFFIXed forms whose parsers
+# resolve the index in place.
+_STRING_INDEX_FORMS = ('DW_FORM_strx', 'DW_FORM_strx1', 'DW_FORM_strx2', 'DW_FORM_strx3', 'DW_FORM_strx4',
+                       'DW_FORM_GNU_str_index')
+_ADDRESS_INDEX_FORMS = ('DW_FORM_addrx', 'DW_FORM_addrx1', 'DW_FORM_addrx2', 'DW_FORM_addrx3', 'DW_FORM_addrx4',
+                        'DW_FORM_GNU_addr_index')
+_LIST_INDEX_FORMS = ('DW_FORM_loclistx', 'DW_FORM_rnglistx')
+SPLIT_FORM_SUFFIX = '.dwo'
+
+
+def _bind_index_forms(cu, skeleton: Optional[SkeletonUnit]):
+    from elftools.common.utils import struct_parse
+    from elftools.construct import Adapter
+    from elftools.dwarf.structs import DWARFStructs
+
+    class IndexedValue(Adapter):
+        def __init__(self, subcon, resolve):
+            Adapter.__init__(self, subcon)
+            self._resolve = resolve
+
+        def _decode(self, obj, context):
+            return self._resolve(obj)
+
+    # DWARFStructs are shared between CUs of the same shape - give this one its own forms
+    shared = cu.structs
+    structs = cu.structs = object.__new__(DWARFStructs)
+    structs.__dict__.update(shared.__dict__)
+    structs.Dwarf_dw_form = dict(shared.Dwarf_dw_form)
+
+    dwarfinfo = cu.dwarfinfo
+    offset_size = 4 if structs.dwarf_format == 32 else 8
+    # A DWARF 5 string offsets table starts with a header (length, version, padding)
+    str_base = 2 * offset_size if cu['version'] >= 5 else 0
+    str_offsets = dwarfinfo.debug_str_offsets_sec
+    addr_sec = dwarfinfo.debug_addr_sec
+    addr_base = skeleton.addr_base if skeleton else None
+    # The offsets of a list table follow its header (length, version, sizes, offset count)
+    lists_base = offset_size + 8
+
+    def string(index):
+        offset = struct_parse(structs.the_Dwarf_offset, str_offsets.stream, str_base + index * offset_size)
+        return dwarfinfo.get_string_from_table(offset)
+
+    def address(index):
+        if addr_base is None or addr_sec is None:
+            return index
+        return struct_parse(structs.the_Dwarf_target_addr, addr_sec.stream, addr_base + index * structs.address_size)
+
+    def list_offset(section):
+        def resolve(index):
+            return lists_base + struct_parse(structs.the_Dwarf_offset, section.stream, lists_base + index * offset_size)
+        return resolve if section else (lambda index: index)
+
+    bindings = ((_STRING_INDEX_FORMS, string), (_ADDRESS_INDEX_FORMS, address),
+                (('DW_FORM_loclistx',), list_offset(dwarfinfo.debug_loclists_sec)),
+                (('DW_FORM_rnglistx',), list_offset(dwarfinfo.debug_rnglists_sec)))
+    for (forms, resolve) in bindings:
+        for form in forms:
+            parser = shared.Dwarf_dw_form.get(form, structs.the_Dwarf_uleb128)
+            structs.Dwarf_dw_form[form + SPLIT_FORM_SUFFIX] = IndexedValue(parser, resolve)
+
+    # Abbrev tables are cached per DWARFInfo, and may have been renamed by an earlier unit
+    renamed = set(_STRING_INDEX_FORMS + _ADDRESS_INDEX_FORMS + _LIST_INDEX_FORMS)
+    for decl in cu.get_abbrev_table()._abbrev_map.values():
+        for spec in decl['attr_spec']:
+            if spec.form in renamed:
+                spec.form += SPLIT_FORM_SUFFIX
+
+
+def _gnu_dwo_id(cu) -> Optional[int]:
+    from elftools.dwarf.die import DIE
+    # Parsed outside the unit's DIE cache, which must not keep addresses bound to no skeleton
+    top = DIE(cu=cu, stream=cu.dwarfinfo.debug_info_sec.stream, offset=cu.cu_die_offset)
+    attribute = top.attributes.get('DW_AT_GNU_dwo_id')
+    return attribute.value if attribute else None
+
+
+def _section_view(section, view):
+    if section.compressed:
+        from .compressed import section_data
+        return memoryview(section_data(section))
+    offset, size = section['sh_offset'], section['sh_size']
+    return view[offset:offset + size]
+
+
+def load_split_units(split_file: SplitFile, dwarfinfo, mmap_sections: bool = False) -> list:
+    """
+    The compile units of one split file with their headers read, the DIEs left
+    for later, and DIE offsets in the file's range. Every unit gets a DWARFInfo
+    of its own over its contributions to the file's sections and the main
+    binary's .debug_addr.
+    """
+    from elftools.elf.elffile import ELFFile
+    from elftools.dwarf.dwarfinfo import DWARFInfo, DebugSectionDescriptor
+    from .formats import MemoryViewStream, map_file
+
+    with open(split_file.path, 'rb') as file:
+        view = map_file(file) if mmap_sections else memoryview(file.read())
+    elffile = ELFFile(MemoryViewStream(view))
+    sections = {section.name: _section_view(section, view)
+                for section in elffile.iter_sections()
+                if section.name.startswith('.debug_') and section['sh_type'] != 'SHT_NOBITS'}
+    info = sections.get('.debug_info.dwo')
+    if info is None:
+        return []
+
+    if split_file.packed:
+        rows = read_unit_index(sections['.debug_cu_index'], elffile.little_endian)
+    else:
+        # A .dwo holds one contribution per section; a GNU one identifies its unit by the skeleton only
+        only = split_file.skeletons[0].dwo_id if len(split_file.skeletons) == 1 else None
+        rows = [UnitIndexRow(only, {})]
+    skeletons = {skeleton.dwo_id: skeleton for skeleton in split_file.skeletons}
+
+    def descriptor(name, row=None, sect=None, origin=0):
+        data = sections.get(name)
+        if data is None:
+            return None
+        if row is not None and sect in row.sections:
+            (offset, size) = row.sections[sect]
+            data = data[offset:offset + size]
+        return DebugSectionDescriptor(MemoryViewStream(data, origin=origin), name, None, origin + len(data), 0)
+
+    info_sec = descriptor('.debug_info.dwo', origin=split_file.base)
+    str_sec = descriptor('.debug_str.dwo')
+    cus = []
+    for row in rows:
+        unit_di = DWARFInfo(
+            config=dwarfinfo.config,
+            debug_info_sec=info_sec,
+            debug_aranges_sec=None,
+            debug_abbrev_sec=descriptor('.debug_abbrev.dwo', row, DW_SECT_ABBREV),
+            debug_frame_sec=None,
+            eh_frame_sec=None,
+            debug_str_sec=str_sec,
+            debug_loc_sec=None,
+            debug_ranges_sec=None,
+            debug_line_sec=descriptor('.debug_line.dwo', row, DW_SECT_LINE),
+            debug_pubtypes_sec=None,
+            debug_pubnames_sec=None,
+            debug_addr_sec=dwarfinfo.debug_addr_sec,
+            debug_str_offsets_sec=descriptor('.debug_str_offsets.dwo', row, DW_SECT_STR_OFFSETS),
+            debug_line_str_sec=None,
+            debug_loclists_sec=descriptor('.debug_loclists.dwo', row, DW_SECT_LOCLISTS),
+            debug_rnglists_sec=descriptor('.debug_rnglists.dwo', row, DW_SECT_RNGLISTS),
+            debug_sup_sec=None,
+            gnu_debugaltlink_sec=None,
+            debug_types_sec=None)
+        for attr in ('_format', '_start_address', '_arch_code', '_frames'):
+            setattr(unit_di, attr, getattr(dwarfinfo, attr, None))
+
+        (offset, size) = row.sections.get(DW_SECT_INFO, (0, len(info)))
+        offset += split_file.base
+        end = offset + size
+        while offset < end:
+            cu = unit_di._cached_CU_at_offset(offset)
+            dwo_id = cu['dwo_id'] if cu['version'] >= 5 and 'dwo_id' in cu.header else row.signature
+            if dwo_id is None:
+                # A GNU .dwo named by several skeletons: its top DIE says which one it belongs to
+                _bind_index_forms(cu, None)
+                dwo_id = _gnu_dwo_id(cu)
+            _bind_index_forms(cu, skeletons.get(dwo_id))
+            cus.append(cu)
+            offset += cu['unit_length'] + cu.structs.initial_length_field_size()
+    return cus
+
+
+def load_split_dwarf(binary_path: str, dwarfinfo, cus, mmap_sections: bool = False, workers: int = 4):
+    """
+    Follows the skeleton units among `cus` into their split files and loads
+    those, `workers` files at a time. Returns the split files, the units
+    found in them in file order, and a (split file, exception) pair for each
+    file that could not be read.
+    """
+    split_files = resolve_split_files(binary_path, skeleton_units(cus))
+
+    def load(split_file):
+        try:
+            return (load_split_units(split_file, dwarfinfo, mmap_sections), None)
+        except Exception as e:
+            return ([], e)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(load, split_files))
+    units = [cu for (file_units, _) in results for cu in file_units]
+    failures = [(split_file, error) for (split_file, (_, error)) in zip(split_files, results) if error is not None]
+    return (split_files, units, failures)
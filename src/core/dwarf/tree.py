@@ -78,10 +78,56 @@ def load_children(parent_die: Union[DIE, DIEV1] , sort: bool): #(parent_die: Uni
             print("Warning: This executable file is corrupt or incompatible with the current version of DWARF Explorer.")
             parent_die._children = []
 
+class LazyTopDIEs:
+    """
+    The top DIEs of a list of CUs, each parsed on first access.
+
+    Stands in for the eager top DIE list in lazy mode: up front only the CU
+    headers (offset and length) have been read, and a CU's DIEs are read
+    once something indexes or iterates into it. Supports what the callers
+    of `DWARFTreeModel.top_dies` use - len, indexing, slicing, iteration
+    and item assignment.
+    """
+    def __init__(self, cus):
+        self.cus = cus
+        self._dies = [None] * len(cus)
+
+    def __len__(self):
+        return len(self.cus)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self.cus)))]
+        if i < 0:
+            i += len(self.cus)
+        die = self._dies[i]
+        if die is None:
+            die = self._dies[i] = decorate_die(self.cus[i].get_top_DIE(), i)
+        return die
+
+    def __setitem__(self, i, die):
+        self._dies[i] = die
+
+    def __iter__(self):
+        for i in range(len(self.cus)):
+            yield self[i]
+
+    @property
+    def parsed(self):
+        return sum(1 for die in self._dies if die is not None)
+
 class DWARFTreeModel:
-    def __init__(self, di, prefix, sortcus, sortdies):
+    def __init__(self, di, prefix, sortcus, sortdies, lazy=False):
         self.prefix = prefix
-        self.top_dies = [decorate_die(CU.get_top_DIE(), i) for (i, CU) in enumerate(di._CUs)]
+        self.cus = di._CUs
+        self.lazy = lazy
+        # For find_offset: CUs by their offset in .debug_info, whatever the display order
+        self._cus_by_offset = sorted(di._CUs, key=lambda cu: cu.cu_offset)
+        self._cu_offsets = [cu.cu_offset for cu in self._cus_by_offset]
+        if lazy:
+            self.top_dies = LazyTopDIEs(di._CUs)
+        else:
+            self.top_dies = [decorate_die(CU.get_top_DIE(), i) for (i, CU) in enumerate(di._CUs)]
         self.highlight_condition = None
         self.sortcus = sortcus
         self.sortdies = sortdies
@@ -373,22 +419,45 @@ class DWARFTreeModel:
         return False            
 
     
-    def find_offset(self, offset):
-        cu = next((td.cu
-            for td
-            in self.top_dies
-            if 0 <= offset-td.cu.cu_die_offset < td.cu.header.unit_length), False)
-        if not cu:
+    # Number of CUs, CUs whose top DIE was read, CUs with DIEs read below the
+    # top one, and DIEs read overall - what the lazy mode saved
+    def parse_stats(self):
+        opened = parsed = dies = 0
+        for cu in self.cus:
+            if cu._diemap:
+                opened += 1
+                dies += len(cu._diemap)
+                if len(cu._diemap) > 1:
+                    parsed += 1
+        return {"cus": len(self.cus), "opened": opened, "parsed": parsed, "dies": dies}
+
+    # Returns the index of the DIE at offset, or of the closest DIE at or before it.
+    # exact promises that offset is the start of a DIE (e.g. an offset from objdump),
+    # so that one DIE can be parsed in place.
+    def find_offset(self, offset, exact=False):
+        i = bisect_right(self._cu_offsets, offset) - 1
+        if i < 0:
             return None
+        cu = self._cus_by_offset[i]
+        if not 0 <= offset-cu.cu_die_offset < cu.header.unit_length:
+            return None
+        self.top_dies[cu._i] # index_for_die stops at the decorated top DIE
         # On an off chance it's already parsed and the offset is precise
         i = bisect_right(cu._diemap, offset)
-        if offset == cu._diemap[i - 1]:
+        if i > 0 and offset == cu._diemap[i - 1]:
             return self.index_for_die(cu._dielist[i - 1])
-        # Now the hard way
-        # It would be possible to optimize that, parse not all DIEs but just some
-        # But let's not.
-        for die in cu.iter_DIEs():
-            pass
-        i = bisect_right(cu._diemap, offset)
-        return self.index_for_die(cu._dielist[i - 1])
-
+        if exact and hasattr(cu, '_get_cached_DIE'):
+            # Parse just that DIE; the parents are found on demand by get_parent()
+            return self.index_for_die(cu._get_cached_DIE(offset))
+        # Walk down from the top DIE, parsing only the children along the way
+        die = cu.get_top_DIE()
+        while die.offset < offset and die.has_children:
+            closest = None
+            for child in die.iter_children():
+                if child.offset > offset:
+                    break
+                closest = child
+            if closest is None:
+                break
+            die = closest
+        return self.index_for_die(die)
@@ -0,0 +1,85 @@
+"""
+Flame-graph aggregation of the async stacks collected by the tracer.
+
+Snapshot counts come straight from `StackTrie.counts` (one per poll entry,
+sampled ones weighted by the hits they stand for); time weights come from
+the store's `PollTimer`, which credits each poll's self time to the stack
+it was entered with. Both are updated incrementally by
+`AsyncBacktraceTracer`, so exporting is just a walk over the non-zero nodes.
+
+Outputs:
+- Brendan Gregg folded stacks ("root;...;leaf count" per line), for
+  flamegraph.pl, inferno and most viewers;
+- speedscope JSON (https://www.speedscope.app/file-format-schema.json),
+  with one sampled profile for snapshot counts and one for poll time.
+"""
+import json
+from typing import Dict, Iterator, Optional
+
+from core.runtime_plugins.async_backtrace_data import StackTrie, PollTimer
+
+
+def _frame_name(name: str) -> str:
+    # `;` separates frames in the folded format.
+    return name.replace(";", ":")
+
+
+def folded_lines(trie: StackTrie, weights: Optional[Dict[int, int]] = None) -> Iterator[str]:
+    """
+    Folded-stack lines for every node with a non-zero weight; `weights`
+    defaults to the trie's snapshot counts.
+    """
+    if weights is None:
+        weights = {node: count for node, count in enumerate(trie.counts) if count}
+    names = trie.frames.names
+    for node, weight in sorted(weights.items()):
+        if weight and node != StackTrie.ROOT:
+            stack = ";".join(_frame_name(names[frame_id]) for frame_id in trie.frame_path(node))
+            yield f"{stack} {weight}"
+
+
+def write_folded(path: str, trie: StackTrie, weights: Optional[Dict[int, int]] = None) -> int:
+    """Writes folded stacks to `path`; returns the number of lines."""
+    lines = 0
+    with open(path, "w") as f:
+        for line in folded_lines(trie, weights):
+            f.write(line)
+            f.write("\n")
+            lines += 1
+    return lines
+
+
+def _sampled_profile(trie: StackTrie, name: str, unit: str, weights: Dict[int, int]) -> dict:
+    samples, values = [], []
+    for node, weight in sorted(weights.items()):
+        if weight and node != StackTrie.ROOT:
+            samples.append(trie.frame_path(node))
+            values.append(weight)
+    total = sum(values)
+    return {
+        "type": "sampled",
+        "name": name,
+        "unit": unit,
+        "startValue": 0,
+        "endValue": total,
+        "samples": samples,
+        "weights": values,
+    }
+
+
+def write_speedscope(path: str, trie: StackTrie, timer: Optional[PollTimer] = None,
+                     name: str = "async backtraces"):
+    """Writes a speedscope file; frame indices are the trie's frame ids."""
+    counts = {node: count for node, count in enumerate(trie.counts) if count}
+    profiles = [_sampled_profile(trie, f"{name} (snapshots)", "none", counts)]
+    if timer is not None and timer.self_ns:
+        profiles.append(_sampled_profile(trie, f"{name} (poll time)", "nanoseconds", timer.self_ns))
+    data = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": [{"name": frame} for frame in trie.frames.names]},
+        "profiles": profiles,
+        "name": name,
+        "exporter": "rust-future-tracing",
+    }
+    with open(path, "w") as f:
+        json.dump(data, f)
@@ -0,0 +1,73 @@
+"""
+Future struct <-> poll function pairs precomputed by dwarf/async_deps.py.
+
+For every `{async_fn_env#N}` / `{async_block_env#N}` struct, async_deps.py
+records the `{async_fn#N}` / `{async_block#N}` subprogram declared next to
+it ("future_polls" in async_deps.json): its DIE offset, qualified name,
+low_pc and the address GDB breaks at once past the prologue. When
+async_deps.json was generated from the binary being debugged - it records
+the binary's build id, or path, size and mtime - start-async-debug maps
+poll functions to futures and back through a `FuturePollIndex` instead of
+scanning siblings in the DWARF tree; for any other build it uses the tree.
+"""
+from typing import Dict, List, NamedTuple, Optional
+
+from elftools.common.exceptions import ELFError
+
+from core.dwarf.compressed import binary_identity
+
+
+class FuturePoll(NamedTuple):
+    future_offset: int
+    future_name: str
+    poll_offset: int
+    poll_name: str
+    # File addresses, before any relocation of a PIE
+    low_pc: Optional[int]
+    post_prologue_pc: Optional[int]
+
+
+def is_fresh(deps_data: dict, binary_path: str) -> bool:
+    """Whether async_deps.json was generated from this build of the binary."""
+    recorded = deps_data.get("binary")
+    if not recorded:
+        return False
+    try:
+        return recorded == binary_identity(binary_path)
+    except (OSError, ELFError):
+        return False
+
+
+class FuturePollIndex:
+    """The pairs of an async_deps.json, by future offset and by qualified name."""
+
+    def __init__(self, pairs: List[FuturePoll]):
+        self._by_future_offset: Dict[int, FuturePoll] = {}
+        self._by_future_name: Dict[str, List[FuturePoll]] = {}
+        self._by_poll_name: Dict[str, List[FuturePoll]] = {}
+        for pair in pairs:
+            self._by_future_offset[pair.future_offset] = pair
+            self._by_future_name.setdefault(pair.future_name, []).append(pair)
+            self._by_poll_name.setdefault(pair.poll_name, []).append(pair)
+
+    @classmethod
+    def from_deps(cls, deps_data: dict) -> Optional["FuturePollIndex"]:
+        """The index of `deps_data`, or None if it was written without the pairs."""
+        future_polls = deps_data.get("future_polls")
+        if future_polls is None:
+            return None
+        return cls([FuturePoll(int(future_offset, 16), pair["future_name"], int(pair["poll_offset"], 16),
+                               pair["poll_name"], pair.get("low_pc"), pair.get("post_prologue_pc"))
+                    for (future_offset, pair) in future_polls.items()])
+
+    def __len__(self):
+        return len(self._by_future_offset)
+
+    def for_future(self, future_offset: int) -> Optional[FuturePoll]:
+        return self._by_future_offset.get(future_offset)
+
+    def futures_named(self, future_name: str) -> List[FuturePoll]:
+        return self._by_future_name.get(future_name, [])
+
+    def polls_named(self, poll_name: str) -> List[FuturePoll]:
+        return self._by_poll_name.get(poll_name, [])
@@ -0,0 +1,194 @@
+"""
+Overhead governor for instrumented breakpoints.
+
+Tracks, per governed `EntryBreakpoint`, how often it is hit and how much
+wall time its handling costs. Once per window it compares the total to
+`OVERHEAD_BUDGET`, a fraction of wall time; while over budget, the hottest
+point is downgraded one level per window:
+
+    full     -> sampled   (a 1-in-OVERHEAD_SAMPLE_EVERY SamplingPolicy)
+    sampled  -> counting  (ignore_count; GDB only counts the hits)
+
+Every change is logged and shown by the `async-governor` command.
+
+The cost of a hit is mostly in the stops themselves - the ptrace stop and
+resume, GDB's event handling and, for the temporary breakpoint, its CLI
+commands - not in the Python handlers. A traced entry is timed from the
+end of the entry breakpoint's `stop()` to the end of `run_tracers`, which
+spans the resume, the temporary breakpoint's stop and its command: one
+full stop round trip. Its running average (`stop_seconds`) is charged for
+each stop that can't be timed from Python: the entry stop itself (and the
+`continue` after the temporary one) on every hit, and the finish
+breakpoint's stop.
+"""
+import time
+from typing import Dict, List, Optional
+
+import gdb
+
+from core.config import OVERHEAD_BUDGET, OVERHEAD_WINDOW_SECONDS, OVERHEAD_SAMPLE_EVERY
+from core.sampling import SamplingPolicy
+
+LEVEL_FULL = "full"
+LEVEL_SAMPLED = "sampled"
+LEVEL_COUNTING = "counting"
+
+# Large enough that a counting-only breakpoint never stops again.
+COUNTING_IGNORE_COUNT = 2**31 - 1
+
+# Weight of the latest round trip in the running average of stop_seconds
+_STOP_SMOOTHING = 0.2
+
+
+class _PointStats:
+    __slots__ = ("breakpoint", "level", "hits", "seconds", "window_hits", "window_seconds", "rate", "load")
+
+    def __init__(self, breakpoint):
+        self.breakpoint = breakpoint
+        self.level = LEVEL_FULL
+        self.hits = 0
+        self.seconds = 0.0
+        self.window_hits = 0
+        self.window_seconds = 0.0
+        self.rate = 0.0 # hits/s over the last complete window
+        self.load = 0.0 # fraction of wall time in handlers over the last complete window
+
+
+class OverheadGovernor:
+    """Keeps breakpoint handling time within a fraction of wall time."""
+
+    def __init__(self, budget: float = OVERHEAD_BUDGET, window: float = OVERHEAD_WINDOW_SECONDS,
+                 sample_every: int = OVERHEAD_SAMPLE_EVERY):
+        self.budget = budget
+        self.window = window
+        self.sample_every = sample_every
+        self.points: Dict[str, _PointStats] = {}
+        self.changes: List[tuple] = [] # (time, symbol, old level, new level, reason)
+        self.overhead = 0.0 # handler time / wall time over the last complete window
+        self.stop_seconds = 0.0 # running average of one stop round trip, 0 until measured
+        self._window_start = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.budget > 0
+
+    def reset(self):
+        self.points.clear()
+        self.changes.clear()
+        self.overhead = 0.0
+        self.stop_seconds = 0.0
+        self._window_start = time.monotonic()
+
+    def register(self, breakpoint: gdb.Breakpoint):
+        stats = self.points[breakpoint.symbol_name] = _PointStats(breakpoint)
+        if breakpoint.sampling is not None:
+            stats.level = LEVEL_SAMPLED
+
+    def record(self, symbol: str, seconds: float, hit: bool = False, stops: int = 0):
+        """
+        Accounts handler time, plus `stops` untimed stop round trips (and
+        optionally a hit) to `symbol`.
+        """
+        stats = self.points.get(symbol)
+        if stats is None:
+            return
+        seconds += stops * self.stop_seconds
+        stats.seconds += seconds
+        stats.window_seconds += seconds
+        if hit:
+            stats.hits += 1
+            stats.window_hits += 1
+
+        now = time.monotonic()
+        if now - self._window_start >= self.window:
+            self._close_window(now)
+
+    def record_round_trip(self, symbol: str, seconds: float):
+        """Accounts a timed stop round trip to `symbol` and folds it into `stop_seconds`."""
+        if self.stop_seconds:
+            self.stop_seconds += _STOP_SMOOTHING * (seconds - self.stop_seconds)
+        else:
+            self.stop_seconds = seconds
+        self.record(symbol, seconds)
+
+    def _close_window(self, now: float):
+        elapsed = now - self._window_start
+        self._window_start = now
+        total = 0.0
+        for stats in self.points.values():
+            stats.rate = stats.window_hits / elapsed
+            stats.load = stats.window_seconds / elapsed
+            total += stats.window_seconds
+            stats.window_hits = 0
+            stats.window_seconds = 0.0
+        self.overhead = total / elapsed
+
+        if self.enabled and self.overhead > self.budget:
+            candidates = [s for s in self.points.values() if s.level != LEVEL_COUNTING and s.load > 0]
+            if candidates:
+                hottest = max(candidates, key=lambda s: s.load)
+                self._downgrade(hottest, f"overhead {self.overhead:.0%} > budget {self.budget:.0%}, "
+                                         f"{hottest.rate:.0f} hits/s, {hottest.load:.0%} of wall time")
+
+    def _downgrade(self, stats: _PointStats, reason: str):
+        breakpoint = stats.breakpoint
+        if not breakpoint.is_valid():
+            return
+        old_level = stats.level
+        if old_level == LEVEL_FULL:
+            breakpoint.set_sampling(SamplingPolicy(every=self.sample_every))
+            stats.level = LEVEL_SAMPLED
+        else:
+            breakpoint.ignore_count = COUNTING_IGNORE_COUNT
+            stats.level = LEVEL_COUNTING
+        self.changes.append((time.time(), breakpoint.symbol_name, old_level, stats.level, reason))
+        print(f"[rust-future-tracing] Governor: {breakpoint.symbol_name} {old_level} -> {stats.level} ({reason})")
+
+    def hit_count(self, symbol: str) -> Optional[int]:
+        """Total hits including those only counted by GDB in counting mode."""
+        stats = self.points.get(symbol)
+        if stats is None:
+            return None
+        if stats.level == LEVEL_COUNTING and stats.breakpoint.is_valid():
+            return stats.hits + stats.breakpoint.hit_count
+        return stats.hits
+
+
+governor = OverheadGovernor()
+
+
+class AsyncGovernorCommand(gdb.Command):
+    """
+    Shows the overhead governor's state and the downgrades it made.
+    Usage: async-governor [N]   (N = number of hottest points to list, default 20)
+    """
+    def __init__(self):
+        super().__init__("async-governor", gdb.COMMAND_USER)
+
+    def invoke(self, arg, from_tty):
+        self.dont_repeat()
+        try:
+            limit = int(arg) if arg.strip() else 20
+        except ValueError:
+            print("Usage: async-governor [N]")
+            return
+
+        state = f"budget {governor.budget:.0%}" if governor.enabled else "disabled (OVERHEAD_BUDGET = 0)"
+        print(f"[rust-future-tracing] Overhead governor: {state}, "
+              f"last window overhead {governor.overhead:.1%}, {len(governor.points)} governed points, "
+              f"stop round trip {governor.stop_seconds * 1e6:.0f}us")
+
+        if governor.points:
+            print(f"{'Level':<9} {'Hits':>10} {'Hits/s':>9} {'Load':>6} {'Total (s)':>10}  Symbol")
+            ranked = sorted(governor.points.items(), key=lambda item: item[1].seconds, reverse=True)
+            for symbol, stats in ranked[:limit]:
+                print(f"{stats.level:<9} {governor.hit_count(symbol):>10} {stats.rate:>9.0f} "
+                      f"{stats.load:>6.0%} {stats.seconds:>10.3f}  {symbol}")
+
+        if governor.changes:
+            print("Changes:")
+            for timestamp, symbol, old_level, new_level, reason in governor.changes:
+                stamp = time.strftime("%H:%M:%S", time.localtime(timestamp))
+                print(f"  {stamp} {symbol}: {old_level} -> {new_level} ({reason})")
+        else:
+            print("No breakpoints were downgraded.")
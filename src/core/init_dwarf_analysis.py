@@ -1,7 +1,10 @@
 import gdb
 import os
-from .dwarf.tree import DWARFTreeModel, cu_sort_key
-from .dwarf.formats import read_dwarf
+import time
+from .config import (DWARF_LAZY_CUS, DWARF_MMAP_SECTIONS, DWARF_SPLIT_UNITS, DWARF_SPLIT_WORKERS,
+                     DWARF_SECTION_CACHE, DWARF_SECTION_CACHE_DIR, DWARF_SECTION_CACHE_MAX_MB)
+# The DWARF modules (and elftools with them) are imported by the command, not
+# when main.py registers it
 
 class initDwarfAnalysisCommand(gdb.Command):
     """Initialize Dwarf analysis.
@@ -39,6 +42,7 @@ class initDwarfAnalysisCommand(gdb.Command):
         
         try:
             print(f"Loading DWARF information from: {executable_path}")
+            started = time.perf_counter()
             
             # Read DWARF information from the executable
             # Using a simple resolver that returns the first arch for multi-arch binaries
@@ -48,7 +52,11 @@ class initDwarfAnalysisCommand(gdb.Command):
                 return None
             
             try:
-                dwarf_info = read_dwarf(executable_path, simple_resolver)
+                from .dwarf.formats import read_dwarf
+                from .dwarf.compressed import SectionCache, default_cache_dir
+                section_cache = SectionCache(DWARF_SECTION_CACHE_DIR or default_cache_dir(),
+                                             DWARF_SECTION_CACHE_MAX_MB << 20) if DWARF_SECTION_CACHE else None
+                dwarf_info = read_dwarf(executable_path, simple_resolver, DWARF_MMAP_SECTIONS, section_cache)
             except ImportError as e:
                 if "PyQt" in str(e) or "Qt" in str(e):
                     print("Error: Qt dependencies detected but not available in this environment")
@@ -65,6 +73,9 @@ class initDwarfAnalysisCommand(gdb.Command):
                 print("Error: Failed to read DWARF information (operation cancelled)")
                 return
             
+            from .dwarf.tree import DWARFTreeModel, cu_sort_key
+            from .dwarf.libtree import LibraryTree
+
             # Initialize the DWARF tree model
             # Set up similar to the original dwex application
             def decorate_cu(cu, i):
@@ -73,36 +84,88 @@ class initDwarfAnalysisCommand(gdb.Command):
                 cu._exprparser = None
                 return cu
             
-            # Cache compilation units
-            dwarf_info._unsorted_CUs = [decorate_cu(cu, i) for (i, cu) in enumerate(dwarf_info.iter_CUs())]
+            # Cache compilation units (headers only, iter_CUs doesn't read any DIEs)
+            cus = [decorate_cu(cu, i) for (i, cu) in enumerate(dwarf_info.iter_CUs())]
+            # Split DWARF units follow the main ones; their offsets are above any in .debug_info
+            if DWARF_SPLIT_UNITS:
+                cus += [decorate_cu(cu, i) for (i, cu) in enumerate(load_split_units(executable_path, dwarf_info, cus), len(cus))]
+            dwarf_info._unsorted_CUs = cus
             dwarf_info._CU_offsets = [cu.cu_offset for cu in dwarf_info._unsorted_CUs]
             dwarf_info._CUs = list(dwarf_info._unsorted_CUs)
             
-            # Sort compilation units by filename
-            dwarf_info._CUs.sort(key=cu_sort_key)
-            for (i, cu) in enumerate(dwarf_info._CUs):
-                cu._i = i
+            # Sort compilation units by filename - this reads every CU's top DIE
+            sort_cus = not DWARF_LAZY_CUS
+            if sort_cus:
+                dwarf_info._CUs.sort(key=cu_sort_key)
+                for (i, cu) in enumerate(dwarf_info._CUs):
+                    cu._i = i
                 
             dwarf_info._locparser = None
             
             # Create the tree model
-            # Parameters: dwarf_info, prefix, sortcus, sortdies
-            self.dwarf_tree = DWARFTreeModel(dwarf_info, True, True, True)
+            # Parameters: dwarf_info, prefix, sortcus, sortdies, lazy
+            self.dwarf_tree = DWARFTreeModel(dwarf_info, True, sort_cus, True, DWARF_LAZY_CUS)
+            self.dwarf_tree.load_seconds = time.perf_counter() - started
+            self.dwarf_tree.dwarf_info = dwarf_info
             
             print(f"Successfully initialized DWARF analysis for: {executable_path}")
             print(f"Found {len(dwarf_info._CUs)} compilation units")
+            print_load_stats(self.dwarf_tree)
             print("You can now access the tree with: python tree = gdb.dwarf_tree")
             print("Or access DWARF info with: python info = gdb.dwarf_info")
             
             # Store references for later use
             gdb.dwarf_info = dwarf_info
             gdb.dwarf_tree = self.dwarf_tree
+            gdb.dwarf_library_tree = LibraryTree()
             
         except Exception as e:
             print(f"Error initializing DWARF analysis: {str(e)}")
             import traceback
             traceback.print_exc()
 
+def load_split_units(executable_path, dwarf_info, cus):
+    """Loads the units of the .dwo/.dwp files the skeleton units in `cus` point to."""
+    from .dwarf.splitdwarf import load_split_dwarf
+    split_files, units, failures = load_split_dwarf(executable_path, dwarf_info, cus,
+                                                    DWARF_MMAP_SECTIONS, DWARF_SPLIT_WORKERS)
+    for (split_file, error) in failures:
+        print(f"Warning: Could not read split DWARF from '{split_file.path}': {error}")
+    if split_files:
+        print(f"Found {len(units)} split units in {len(split_files) - len(failures)} of {len(split_files)} .dwo/.dwp files")
+    return units
+
+def print_load_stats(tree):
+    """Prints how long loading took and how much of the DWARF has been parsed since."""
+    from .dwarf.formats import compressed_section_stats
+    stats = tree.parse_stats()
+    mode = "lazy" if tree.lazy else "eager"
+    print(f"DWARF loaded in {tree.load_seconds:.2f}s ({mode}); "
+          f"{stats['opened']}/{stats['cus']} CUs opened, {stats['parsed']} parsed below the top DIE, "
+          f"{stats['dies']} DIEs read")
+    decompressed, compressed = compressed_section_stats(tree.dwarf_info)
+    if compressed:
+        print(f"{decompressed}/{compressed} compressed debug sections decompressed so far")
+
+class dwarfLoadStatsCommand(gdb.Command):
+    """Show DWARF load time and how many compilation units were parsed.
+    
+    Usage: dwarf-load-stats
+    
+    With lazy loading (DWARF_LAZY_CUS in config.py) CUs are parsed only when a
+    lookup reaches them, so the counts grow as the session goes on.
+    """
+
+    def __init__(self):
+        super().__init__("dwarf-load-stats", gdb.COMMAND_USER)
+
+    def invoke(self, arg, from_tty):
+        tree = get_dwarf_tree()
+        if tree is None:
+            print("Error: DWARF tree not initialized. Run 'init-dwarf-analysis' first.")
+            return
+        print_load_stats(tree)
+
 def get_dwarf_tree():
     """Get the initialized DWARF tree model.
     
@@ -111,6 +174,15 @@ def get_dwarf_tree():
     """
     return getattr(gdb, 'dwarf_tree', None)
 
+def get_library_tree():
+    """Get the library-mode view of the initialized DWARF tree.
+    
+    Returns:
+        LibraryTree: Unsorted, name-indexed children for the analysis searches,
+        or None if not initialized
+    """
+    return getattr(gdb, 'dwarf_library_tree', None)
+
 def get_dwarf_info():
     """Get the initialized DWARF information.
     
@@ -121,3 +193,4 @@ def get_dwarf_info():
 
 
 initDwarfAnalysisCommand()
+dwarfLoadStatsCommand()
@@ -2,15 +2,197 @@
 This module defines the data store for asynchronous backtrace information.
 It uses a singleton pattern to ensure that all parts of the debugger
 (plugins, tracers, commands) access the same data instance.
+
+Frame names are interned to integer ids (`FrameTable`) and every stack is a
+node of a global `StackTrie`, so a snapshot is a single integer and common
+prefixes are stored once. Events are `AsyncStackEvent` records with
+`__slots__` rather than dicts.
 """
+from array import array
 from collections import defaultdict
 import itertools
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, List, Tuple
+
+
+class FrameTable:
+    """Interns frame names to dense integer ids."""
+    __slots__ = ("ids", "names")
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        frame_id = self.ids.get(name)
+        if frame_id is None:
+            frame_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return frame_id
+
+    def clear(self):
+        self.ids.clear()
+        self.names.clear()
+
+
+class StackTrie:
+    """
+    Every stack ever seen, as a trie of (parent node, frame id) nodes, so
+    common prefixes are stored once and a whole stack is one node id.
+    Node 0 is the empty stack. Two stacks are equal iff their node ids are.
+
+    `counts[node]` is how many snapshots ended exactly at `node`, each
+    weighted by the hits it stands for, which is what a flame graph needs.
+    """
+    ROOT = 0
+
+    __slots__ = ("frames", "_children", "parents", "frame_ids", "depths", "counts")
+
+    def __init__(self):
+        self.frames = FrameTable()
+        self._children: Dict[Tuple[int, int], int] = {}
+        self.parents = array("I", [0])
+        self.frame_ids = array("I", [0])
+        self.depths = array("I", [0])
+        self.counts = array("Q", [0])
+
+    def __len__(self):
+        return len(self.parents)
+
+    def child(self, parent: int, frame_id: int) -> int:
+        key = (parent, frame_id)
+        node = self._children.get(key)
+        if node is None:
+            node = self._children[key] = len(self.parents)
+            self.parents.append(parent)
+            self.frame_ids.append(frame_id)
+            self.depths.append(self.depths[parent] + 1)
+            self.counts.append(0)
+        return node
+
+    def insert(self, frame_names: Iterable[str]) -> int:
+        """Node of the stack `frame_names` (root first), adding what is missing."""
+        node = self.ROOT
+        intern = self.frames.intern
+        for name in frame_names:
+            node = self.child(node, intern(name))
+        return node
+
+    def record(self, frame_names: Iterable[str], weight: int = 1) -> int:
+        """`insert` plus `weight` counts for the resulting node."""
+        node = self.insert(frame_names)
+        self.counts[node] += weight
+        return node
+
+    def depth(self, node: int) -> int:
+        return self.depths[node]
+
+    def frame_path(self, node: int) -> List[int]:
+        """Frame ids of the stack at `node`, root first."""
+        path = []
+        parents, frame_ids = self.parents, self.frame_ids
+        while node != self.ROOT:
+            path.append(frame_ids[node])
+            node = parents[node]
+        path.reverse()
+        return path
+
+    def resolve(self, node: int) -> List[str]:
+        names = self.frames.names
+        return [names[frame_id] for frame_id in self.frame_path(node)]
+
+    def clear(self):
+        self.frames.clear()
+        self._children.clear()
+        for column in (self.parents, self.frame_ids, self.depths, self.counts):
+            del column[1:]
+        self.counts[0] = 0
+
+
+class PollTimer:
+    """
+    Accumulates self time (ns) per stack node from poll entry/exit pairs.
+    Each traced poll entry opens a frame on its thread and the matching exit
+    closes it; the poll's duration minus the polls nested inside it is
+    credited to the entry's stack node, so the totals add up like a
+    profiler's. A sampled entry's credit is scaled by its sample weight, so
+    the totals estimate every poll, traced or not.
+    """
+    __slots__ = ("self_ns", "_open", "unmatched_exits")
+
+    # A thread's open polls beyond this depth are assumed to have lost their
+    # exits (e.g. unwound by a panic) and are dropped, oldest first.
+    MAX_OPEN = 1024
+
+    def __init__(self):
+        self.self_ns: Dict[int, int] = {}
+        self._open: Dict[Tuple[int, int], List[list]] = {} # (pid, tid) -> [[node, entry_ns, child_ns, weight], ...]
+        self.unmatched_exits = 0
+
+    def enter(self, pid: int, tid: int, node: int, timestamp_ns: int, weight: int = 1):
+        frames = self._open.setdefault((pid, tid), [])
+        if len(frames) >= self.MAX_OPEN:
+            del frames[0]
+        frames.append([node, timestamp_ns, 0, weight])
+
+    def exit(self, pid: int, tid: int, timestamp_ns: int):
+        frames = self._open.get((pid, tid))
+        if not frames:
+            self.unmatched_exits += 1
+            return
+        node, entry_ns, child_ns, weight = frames.pop()
+        duration = max(0, timestamp_ns - entry_ns)
+        self.self_ns[node] = self.self_ns.get(node, 0) + max(0, duration - child_ns) * weight
+        if frames:
+            frames[-1][2] += duration
+
+    def clear(self):
+        self.self_ns.clear()
+        self._open.clear()
+        self.unmatched_exits = 0
+
+
+class AsyncStackEvent:
+    """One entry/exit/snapshot of a coroutine's async stack."""
+    __slots__ = ("event", "coroutine", "future", "future_offset", "stack",
+                 "process_id", "thread_id", "sequence", "timestamp")
+
+    def __init__(self, event: str, coroutine: int, future: str, future_offset: int, stack: int,
+                 process_id: int, thread_id: int, sequence: int, timestamp: float):
+        self.event = event
+        self.coroutine = coroutine
+        self.future = future
+        self.future_offset = future_offset
+        self.stack = stack
+        self.process_id = process_id
+        self.thread_id = thread_id
+        self.sequence = sequence
+        self.timestamp = timestamp
+
+    def to_dict(self, trie: StackTrie) -> Dict[str, Any]:
+        """The event with its stack node resolved to frame names, for export."""
+        return {
+            "event": self.event,
+            "coroutine": self.coroutine,
+            "future": self.future,
+            "future_offset": self.future_offset,
+            "stack_depth": trie.depth(self.stack),
+            "stack_snapshot": trie.resolve(self.stack),
+            "process_id": self.process_id,
+            "thread_id": self.thread_id,
+            "thread_update_sequence": self.sequence,
+            "thread_update_timestamp": self.timestamp,
+        }
+
+    def __repr__(self) -> str:
+        return f"AsyncStackEvent({self.event}, coroutine={self.coroutine}, stack node={self.stack})"
+
 
 class _AsyncBacktraceDataStore:
     _instance = None
-    backtraces: Dict[int, Dict[int, Dict[int, list]]]
+    trie: StackTrie
+    poll_timer: PollTimer
+    stacks: Dict[Tuple[int, int, int], int]
     offset_to_name_map: Dict[int, str]
     thread_recency: Dict[int, Dict[int, Dict[str, Any]]]
     _update_counter: itertools.count
@@ -18,9 +200,11 @@ class _AsyncBacktraceDataStore:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(_AsyncBacktraceDataStore, cls).__new__(cls)
-            # The multi-level dictionary to store async backtraces:
-            # dict[process_id][thread_id][coroutine_id] -> [future_name, ...]
-            cls._instance.backtraces = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+            cls._instance.trie = StackTrie()
+            cls._instance.poll_timer = PollTimer()
+            # Current async stack of every coroutine:
+            # stacks[(process_id, thread_id, coroutine_id)] -> StackTrie node
+            cls._instance.stacks = {}
             # Helper to map future offsets to names for quick lookups
             cls._instance.offset_to_name_map = {}
             # Track recency information per thread per process
@@ -28,9 +212,27 @@ class _AsyncBacktraceDataStore:
             cls._instance._update_counter = itertools.count()
         return cls._instance
 
+    def get_stack(self, pid: int, tid: int, coroutine_id: int) -> int:
+        return self.stacks.get((pid, tid, coroutine_id), StackTrie.ROOT)
+
+    def set_stack(self, pid: int, tid: int, coroutine_id: int, frame_names: Iterable[str], weight: int = 1) -> int:
+        """
+        Records a snapshot of a coroutine's stack, counted `weight` times in
+        the flame graph (0 to only update the stack); returns its trie node.
+        """
+        node = self.trie.record(frame_names, weight)
+        self.stacks[(pid, tid, coroutine_id)] = node
+        return node
+
     def get_backtraces(self):
-        """Returns the main backtrace data structure."""
-        return self.backtraces
+        """
+        Returns the backtraces as dict[process_id][thread_id][coroutine_id]
+        -> [future_name, ...], built from the flat store on each call.
+        """
+        backtraces = {}
+        for (pid, tid, coroutine_id), stack in self.stacks.items():
+            backtraces.setdefault(pid, {}).setdefault(tid, {})[coroutine_id] = self.trie.resolve(stack)
+        return backtraces
 
     def get_offset_to_name_map(self):
         """Returns the offset-to-name map."""
@@ -51,23 +253,25 @@ class _AsyncBacktraceDataStore:
         metadata["timestamp"] = timestamp
         metadata["coroutine_id"] = coroutine_id
         return metadata
-        
+
     def build_offset_to_name_map(self, validated_futures: dict):
         """
         Builds a map from DIE offset to future name for quick lookups.
         This should be called once before tracing starts.
         """
         self.offset_to_name_map.clear()
-        
+
         for future_info in validated_futures.get("future_structs", []):
             self.offset_to_name_map[future_info["offset"]] = future_info["name"]
-        
+
         for func_info in validated_futures.get("async_functions", []):
             self.offset_to_name_map[func_info["offset"]] = func_info["name"]
 
     def clear(self):
         """Clears all stored data."""
-        self.backtraces.clear()
+        self.trie.clear()
+        self.poll_timer.clear()
+        self.stacks.clear()
         self.offset_to_name_map.clear()
         self.thread_recency.clear()
         self._update_counter = itertools.count()
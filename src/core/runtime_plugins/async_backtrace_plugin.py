@@ -8,6 +8,9 @@ class AsyncBacktracePlugin(RuntimePlugin):
     A runtime plugin to capture asynchronous backtraces.
     This plugin implements Step 5 and the first part of Step 6.
     """
+    # Poll functions are sampled under POLL_SAMPLE_* and governed
+    sample_by_default = True
+
     def __init__(self, poll_functions_to_instrument: List[str], expansion_results: Dict[str, Any], debug_command=None):
         """
         Initializes the plugin with the list of poll functions to instrument
@@ -62,6 +65,19 @@ class AsyncBacktracePlugin(RuntimePlugin):
             
             # We need the debug command to convert future to poll
             # Use the passed debug_command instance to avoid creating a new one
+            # Paired offline by async_deps.py (see core/future_polls.py)
+            pair = future_info.get("poll")
+            if pair is not None:
+                poll_to_future_map[pair.poll_name] = {
+                    "future_name": pair.future_name,
+                    "coroutine_id": coroutine_id,
+                    "future_offset": future_offset
+                }
+                continue
+            if future_die is None:
+                print(f"[rust-future-tracing] Warning: No poll function known for future {future_name}")
+                continue
+
             try:
                 if self._debug_command:
                     # Build full future struct name and find corresponding poll function
@@ -85,25 +101,28 @@ class AsyncBacktracePlugin(RuntimePlugin):
         for func_name in self._poll_functions:
             future_info = poll_to_future_map.get(func_name)
             if future_info:
-                # Create tracer factory with pre-computed information
-                tracer_factory = lambda fi=future_info: AsyncBacktraceTracer(
+                # Create tracer factories with pre-computed information
+                tracer_factory = lambda fi=future_info, phase="entry": AsyncBacktraceTracer(
                     fi["future_name"], 
                     fi["coroutine_id"], 
-                    fi["future_offset"]
+                    fi["future_offset"],
+                    phase,
                 )
             else:
                 # Fallback: create tracer with basic information
                 print(f"[rust-future-tracing] Warning: No future mapping found for {func_name}, using fallback")
-                tracer_factory = lambda fn=func_name: AsyncBacktraceTracer(
+                tracer_factory = lambda fn=func_name, phase="entry": AsyncBacktraceTracer(
                     fn,  # Use poll function name as future name
                     hash(fn) % 1000000,  # Generate a simple coroutine ID
-                    0  # Unknown future offset
+                    0,  # Unknown future offset
+                    phase,
                 )
+            exit_tracer_factory = lambda factory=tracer_factory: factory(phase="exit")
 
             instrumentation.append({
                 "symbol": func_name,
                 "entry_tracers": [tracer_factory],
-                "exit_tracers": [tracer_factory] 
+                "exit_tracers": [exit_tracer_factory]
             })
             print(f"  - Will instrument: {func_name}")
         
@@ -2,7 +2,14 @@ class RuntimePlugin:
     """
     Base class for runtime-specific plugins. A plugin defines what to trace
     and how to process the collected data.
+
+    Several plugins can be active at once (see registry.py); points they
+    share are merged into one breakpoint. `sample_by_default` says whether
+    this plugin's points may be sampled and governed like poll functions
+    (see core/sampling.py, core/governor.py) or need every hit.
     """
+    sample_by_default = False
+
     @property
     def name(self):
         """Returns the name of the runtime (e.g., 'tokio')."""
@@ -20,10 +27,25 @@ class RuntimePlugin:
         """
         raise NotImplementedError
 
+    def on_event(self, symbol_name: str, phase: str, invocation_data: dict):
+        """
+        Called right after the tracers of an instrument point ran, with
+        `phase` being "entry" or "exit". Plugins that keep a live model
+        update it here; the default does nothing.
+        """
+        pass
+
     def process_data(self, all_traced_data: dict):
         """
         Processes and typically prints the data collected from all tracers.
         `all_traced_data` is a dictionary where keys are instrumented symbols
         and values are lists of trace results for each invocation.
         """
-        raise NotImplementedError 
\ No newline at end of file
+        raise NotImplementedError 
+
+    def export_data(self, path: str):
+        """
+        Writes the processed data to `path` in a machine-readable format.
+        Plugins without an export keep this default.
+        """
+        raise NotImplementedError
@@ -0,0 +1,123 @@
+"""
+Registry of the runtime plugins active in a session.
+
+Each plugin names its instrument points by symbol. Plugins may overlap - the
+tokio plugin and the async backtrace plugin can both want a poll function -
+and a breakpoint per plugin would stop the inferior once per plugin on every
+hit. `merged_points()` groups the points of all plugins by the locations
+their symbols resolve to, giving one `MergedPoint` per location with the
+tracers of every plugin fanned out from it; a tracer factory that several
+plugins share runs once per hit.
+
+The dispatch table maps each merged point's symbol to the plugins that asked
+for it and the name each of them used, so `on_event` and `process_data` see
+the data under their own symbol names.
+"""
+import importlib
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from .base import RuntimePlugin
+
+
+class MergedPoint:
+    """One breakpoint location and everything the plugins want traced there."""
+    __slots__ = ("symbol", "location", "subscribers", "entry_tracers", "exit_tracers", "sample_by_default")
+
+    def __init__(self, symbol: str, location: Hashable):
+        self.symbol = symbol
+        self.location = location
+        # (plugin, the symbol name that plugin used), in registration order
+        self.subscribers: List[Tuple[RuntimePlugin, str]] = []
+        self.entry_tracers: list = []
+        self.exit_tracers: list = []
+        self.sample_by_default = True
+
+    def add(self, plugin: RuntimePlugin, point: dict):
+        self.subscribers.append((plugin, point["symbol"]))
+        for (factories, merged) in ((point.get("entry_tracers", []), self.entry_tracers),
+                                    (point.get("exit_tracers", []), self.exit_tracers)):
+            merged.extend(factory for factory in factories if factory not in merged)
+        # Sampled only if every subscriber can live with missing hits
+        self.sample_by_default = self.sample_by_default and plugin.sample_by_default
+
+    @property
+    def plugin_names(self) -> List[str]:
+        return [plugin.name for (plugin, _) in self.subscribers]
+
+
+class PluginRegistry:
+    """The active runtime plugins, by name, in registration order."""
+
+    def __init__(self):
+        self._plugins: Dict[str, RuntimePlugin] = {}
+        self._dispatch: Dict[str, List[Tuple[RuntimePlugin, str]]] = {}
+        self._loaded = False
+
+    def __iter__(self):
+        return iter(list(self._plugins.values()))
+
+    def __len__(self):
+        return len(self._plugins)
+
+    def register(self, plugin: RuntimePlugin):
+        """Adds `plugin`, replacing an earlier plugin of the same name."""
+        self._plugins[plugin.name] = plugin
+
+    def get(self, name: str) -> Optional[RuntimePlugin]:
+        return self._plugins.get(name)
+
+    def load(self, module_names) -> List[Tuple[str, Exception]]:
+        """
+        Imports the plugin packages in `module_names` (once per session) and
+        registers the RuntimePlugin each exposes as `plugin`. Returns the
+        (module name, error) of those that failed to load.
+        """
+        failures = []
+        if self._loaded:
+            return failures
+        self._loaded = True
+        for module_name in module_names:
+            try:
+                plugin_module = importlib.import_module(module_name)
+                # Plugin packages expose their RuntimePlugin instance as `plugin`.
+                plugin = getattr(plugin_module, "plugin", plugin_module)
+                self.register(plugin)
+                print(f"[rust-future-tracing] Loaded runtime plugin: {plugin.name}")
+            except (ImportError, AttributeError) as e:
+                failures.append((module_name, e))
+        return failures
+
+    def merged_points(self, resolve: Callable[[str], Hashable] = lambda symbol: symbol) -> List[MergedPoint]:
+        """
+        Instrument points of all plugins, one per location. `resolve` maps a
+        symbol to its location (e.g. the addresses GDB resolves it to); by
+        default points only merge when their symbols are equal. Also rebuilds
+        the dispatch table.
+        """
+        points: Dict[Hashable, MergedPoint] = {}
+        for plugin in self:
+            try:
+                plugin_points = plugin.instrument_points()
+            except NotImplementedError:
+                continue
+            for point in plugin_points:
+                location = resolve(point["symbol"])
+                merged = points.get(location)
+                if merged is None:
+                    merged = points[location] = MergedPoint(point["symbol"], location)
+                merged.add(plugin, point)
+        self._dispatch = {merged.symbol: merged.subscribers for merged in points.values()}
+        return list(points.values())
+
+    def subscribers(self, symbol: str) -> List[Tuple[RuntimePlugin, str]]:
+        """(plugin, its name for the symbol) of everyone instrumenting `symbol`."""
+        return self._dispatch.get(symbol, [])
+
+    def traced_data_for(self, plugin: RuntimePlugin, traced_data: dict) -> dict:
+        """The part of `traced_data` instrumented for `plugin`, under its own symbol names."""
+        return {alias: traced_data[symbol]
+                for (symbol, subscribers) in self._dispatch.items() if symbol in traced_data
+                for (subscriber, alias) in subscribers if subscriber is plugin}
+
+
+registry = PluginRegistry()
@@ -0,0 +1,122 @@
+"""
+Sampling of instrumented breakpoints.
+
+Tracing every hit of a hot poll function stops the inferior three times per
+poll (entry, traced entry, finish). A `SamplingPolicy` decides, per
+instrument point, which hits run their tracers: every Nth hit (1-in-N) and/or
+at most a number of hits per second (token bucket). Skipped hits return from
+`EntryBreakpoint.stop` immediately; when the token bucket runs dry the
+breakpoint is disabled outright until the next token is due.
+
+Each traced hit records `sample_weight`, the number of observed hits it
+stands for, so counts can be scaled back up. Hits that happen while a
+breakpoint is disabled are not observed, so under rate limiting the weights
+are a lower bound; `disabled_seconds` says how long that was the case.
+"""
+import threading
+import time
+from typing import Optional
+
+import gdb
+
+from core.config import POLL_SAMPLE_EVERY, POLL_SAMPLE_MAX_PER_SEC, POLL_SAMPLE_OVERRIDES
+
+
+class SamplingPolicy:
+    """1-in-N counter plus token-bucket rate limit for one instrument point."""
+
+    def __init__(self, every: int = 1, max_per_sec: float = 0):
+        self.every = max(1, int(every))
+        self.max_per_sec = max(0.0, float(max_per_sec))
+        # The bucket holds up to one second worth of tokens.
+        self.capacity = max(1.0, self.max_per_sec)
+        self.tokens = self.capacity
+        self.refilled_at = time.monotonic()
+        self.hits = 0
+        self.sampled = 0
+        self.paused = 0
+        self.disabled_seconds = 0.0
+        self._pending_weight = 0
+
+    @property
+    def active(self) -> bool:
+        return self.every > 1 or self.max_per_sec > 0
+
+    @property
+    def ratio(self) -> float:
+        """Observed hits per traced hit."""
+        return self.hits / self.sampled if self.sampled else 0.0
+
+    def admit(self) -> Optional[int]:
+        """
+        Counts one hit. Returns its sample weight if the hit should be traced,
+        or None if it should be skipped.
+        """
+        self.hits += 1
+        self._pending_weight += 1
+        if self.hits % self.every:
+            return None
+        if self.max_per_sec and not self._take_token():
+            return None
+        weight = self._pending_weight
+        self._pending_weight = 0
+        self.sampled += 1
+        return weight
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.refilled_at) * self.max_per_sec)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    @property
+    def exhausted(self) -> bool:
+        return self.max_per_sec > 0 and self.tokens < 1
+
+    def pause(self, breakpoint: gdb.Breakpoint):
+        """
+        Disables `breakpoint` until the next token is due. The re-enable runs
+        on GDB's thread via `gdb.post_event`; in all-stop mode it takes effect
+        when the inferior next resumes.
+        """
+        delay = (1 - self.tokens) / self.max_per_sec
+        disabled_at = time.monotonic()
+        self.paused += 1
+        breakpoint.enabled = False
+
+        def resume():
+            self.disabled_seconds += time.monotonic() - disabled_at
+            if breakpoint.is_valid():
+                breakpoint.enabled = True
+
+        timer = threading.Timer(delay, gdb.post_event, args=(resume,))
+        timer.daemon = True
+        timer.start()
+
+    def describe(self) -> str:
+        parts = [f"{self.sampled}/{self.hits} hits traced"]
+        if self.sampled:
+            parts.append(f"ratio 1:{self.ratio:.1f}")
+        if self.paused:
+            parts.append(f"paused {self.paused}x for {self.disabled_seconds:.2f}s")
+        return ", ".join(parts)
+
+
+def sampling_policy_for(symbol: str, use_defaults: bool = True) -> Optional[SamplingPolicy]:
+    """
+    Builds the policy for an instrument point, or None if every hit is traced.
+    `POLL_SAMPLE_OVERRIDES` entries match by substring of the symbol; without
+    a match, the global settings apply only if `use_defaults` is set.
+    """
+    for fragment, (every, max_per_sec) in POLL_SAMPLE_OVERRIDES.items():
+        if fragment in symbol:
+            break
+    else:
+        if not use_defaults:
+            return None
+        every, max_per_sec = POLL_SAMPLE_EVERY, POLL_SAMPLE_MAX_PER_SEC
+    policy = SamplingPolicy(every, max_per_sec)
+    return policy if policy.active else None
@@ -8,19 +8,20 @@ import time
 from typing import List
 from .base import Tracer
 from ..config import ASYNC_STACK_HEAD_LIMIT, ASYNC_STACK_TAIL_LIMIT
-from ..runtime_plugins.async_backtrace_data import async_backtrace_store
+from ..runtime_plugins.async_backtrace_data import async_backtrace_store, AsyncStackEvent
 
 class AsyncBacktraceTracer(Tracer):
     """
     A tracer that builds an asynchronous call stack.
     """
-    def __init__(self, future_name: str, coroutine_id: int, future_offset: int):
+    def __init__(self, future_name: str, coroutine_id: int, future_offset: int, phase: str = "entry"):
         super().__init__()
+        # "entry" or "exit" of the poll function; pairs feed the store's PollTimer.
+        self.phase = phase
         # Pre-computed information stored when setting up instrumentation
         self.future_name = future_name
         self.coroutine_id = coroutine_id
         self.future_offset = future_offset
-        self.backtraces = async_backtrace_store.get_backtraces()
 
     def start(self, inferior_thread: gdb.Thread):
         """
@@ -32,35 +33,40 @@ class AsyncBacktraceTracer(Tracer):
             tid = getattr(inferior_thread, "ptid", (0, 0, 0))[1]
             
             # Snapshot the previously recorded stack for event inference
-            stack_container = self.backtraces[pid][tid][self.coroutine_id]
-            previous_stack = list(stack_container)
-
-            # Capture the current call stack from GDB and replace stored stack
-            current_stack = self._capture_call_stack()
-            stack_container.clear()
-            stack_container.extend(current_stack)
+            previous_stack = async_backtrace_store.get_stack(pid, tid, self.coroutine_id)
+
+            # Capture the current call stack from GDB and replace stored stack.
+            # Only entries count towards the flame graph, weighted by the hits
+            # they stand for: an exit is snapshotted in the caller's frame after
+            # the poll has returned.
+            weight = self.sample_weight if self.phase == "entry" else 0
+            current_stack = async_backtrace_store.set_stack(pid, tid, self.coroutine_id, self._capture_call_stack(), weight)
+            if self.phase == "entry":
+                async_backtrace_store.poll_timer.enter(pid, tid, current_stack, time.perf_counter_ns(), self.sample_weight)
+            else:
+                async_backtrace_store.poll_timer.exit(pid, tid, time.perf_counter_ns())
 
             # Determine event type heuristically based on stack depth changes
+            trie = async_backtrace_store.trie
             event = "snapshot"
-            if len(current_stack) > len(previous_stack):
+            if trie.depth(current_stack) > trie.depth(previous_stack):
                 event = "entry"
-            elif len(current_stack) < len(previous_stack):
+            elif trie.depth(current_stack) < trie.depth(previous_stack):
                 event = "exit"
 
             recency_meta = async_backtrace_store.record_thread_update(pid, tid, self.coroutine_id)
 
-            self.data = {
-                "event": event,
-                "coroutine": self.coroutine_id,
-                "future": self.future_name,
-                "future_offset": self.future_offset,
-                "stack_depth": len(current_stack),
-                "stack_snapshot": current_stack,
-                "process_id": pid,
-                "thread_id": tid,
-                "thread_update_sequence": recency_meta.get("sequence"),
-                "thread_update_timestamp": recency_meta.get("timestamp"),
-            }
+            self.data = AsyncStackEvent(
+                event,
+                self.coroutine_id,
+                self.future_name,
+                self.future_offset,
+                current_stack,
+                pid,
+                tid,
+                recency_meta.get("sequence"),
+                recency_meta.get("timestamp"),
+            )
 
             self.show_coroutine_lists()
             # Print current backtrace for comparison with async stack
@@ -108,11 +114,12 @@ class AsyncBacktraceTracer(Tracer):
         return frames
 
     def show_coroutine_lists(self):
+        backtraces = async_backtrace_store.get_backtraces()
         offset_to_name = async_backtrace_store.get_offset_to_name_map()
         thread_recency = async_backtrace_store.get_thread_recency()
         now = time.time()
 
-        if not self.backtraces:
+        if not backtraces:
             print("[rust-future-tracing] No asynchronous backtrace data collected.")
             print("Hint: Run the 'start-async-debug' command and then 'continue' or 'run' the program.")
             return
@@ -121,7 +128,7 @@ class AsyncBacktraceTracer(Tracer):
         print(" " * 28 + "Asynchronous Backtraces")
         print("=" * 80)
 
-        for pid, thread_map in self.backtraces.items():
+        for pid, thread_map in backtraces.items():
             pid_recency = thread_recency.get(pid, {})
             latest_tid = None
             latest_sequence = -1
@@ -1,4 +1,4 @@
-from gdb_debugger.tracers.base import Tracer
+from .base import Tracer
 import gdb
 
 class BacktraceTracer(Tracer):
@@ -4,6 +4,8 @@ class Tracer:
     """Base class for all tracers."""
     def __init__(self):
         self.data = None
+        # Hits the current one stands for (see core/sampling.py); set by TracerSet.run
+        self.sample_weight = 1
 
     def start(self, inferior_thread: gdb.Thread):
         """
@@ -22,4 +24,49 @@ class Tracer:
         """
         Returns the collected data.
         """
-        return self.data 
\ No newline at end of file
+        return self.data
+
+    def reset(self):
+        """
+        Prepares the tracer for its next hit. Tracers are reused across hits
+        of an instrument point (see `TracerSet`), so per-hit state must be
+        cleared here rather than relying on a fresh object; `data` is
+        rebound, never mutated, so earlier records stay intact.
+        """
+        self.data = None
+
+
+class TracerSet:
+    """
+    The tracers of one instrument point phase (entry or exit), created once
+    from their factories on first use and reused for every hit.
+    """
+    __slots__ = ("factories", "names", "tracers")
+
+    def __init__(self, factories):
+        self.factories = tuple(factories)
+        self.names = None
+        self.tracers = None
+
+    def __len__(self):
+        return len(self.factories)
+
+    def _instantiate(self):
+        # Deferred to the first hit: some tracers need a live inferior to construct.
+        self.tracers = tuple(factory() for factory in self.factories)
+        self.names = tuple(str(tracer) for tracer in self.tracers)
+
+    def run(self, inferior_thread: gdb.Thread, sample_weight: int = 1) -> dict:
+        """
+        Runs every tracer for one hit, standing for `sample_weight` hits, and
+        returns their data by tracer name.
+        """
+        if self.tracers is None:
+            self._instantiate()
+        record = {}
+        for name, tracer in zip(self.names, self.tracers):
+            tracer.reset()
+            tracer.sample_weight = sample_weight
+            tracer.start(inferior_thread)
+            record[name] = tracer.read_data()
+        return record
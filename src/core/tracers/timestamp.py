@@ -0,0 +1,62 @@
+from .base import Tracer
+import gdb
+import time
+
+
+class ThreadClock:
+    """
+    Per-thread monotonic time (ns) that stands still while the debugger
+    handles that thread's breakpoints: from the start of an entry
+    breakpoint's stop() to the end of its tracers, and for a finish
+    breakpoint's stop(). Stops too early or too late for Python to time
+    are charged by the handlers, at the governor's stop round trip
+    estimate (see core/governor.py). A duration on this clock is the
+    thread's run time with the tracing of nested breakpoints taken out.
+    """
+    def __init__(self):
+        self._handled_ns = {} # ptid -> handling time so far
+        self._paused_at = {} # ptid -> perf_counter_ns() at the start of the current handling
+
+    def reset(self):
+        self._handled_ns.clear()
+        self._paused_at.clear()
+
+    def pause(self, ptid):
+        self._paused_at.setdefault(ptid, time.perf_counter_ns())
+
+    def resume(self, ptid):
+        paused_at = self._paused_at.pop(ptid, None)
+        if paused_at is not None:
+            self.charge(ptid, time.perf_counter_ns() - paused_at)
+
+    def charge(self, ptid, ns: int):
+        """Takes `ns` of handling that could not be timed off the thread's clock."""
+        self._handled_ns[ptid] = self._handled_ns.get(ptid, 0) + ns
+
+    def now(self, ptid) -> int:
+        paused_at = self._paused_at.get(ptid)
+        return (time.perf_counter_ns() if paused_at is None else paused_at) - self._handled_ns.get(ptid, 0)
+
+
+thread_clock = ThreadClock()
+
+
+class TimestampTracer(Tracer):
+    """
+    A tracer that records the thread's `thread_clock` time. Used as both an
+    entry and an exit tracer to time a function call; the difference leaves
+    out the breakpoint handling in between, the entry's own tracers and
+    those of any instrumented function it calls included.
+    """
+    def __init__(self):
+        super().__init__()
+
+    def start(self, inferior_thread: gdb.Thread):
+        self.data = thread_clock.now(inferior_thread.ptid)
+
+    def stop(self):
+        """This is a single-shot tracer, so stop is a no-op."""
+        pass
+
+    def __str__(self) -> str:
+        return "TimestampTracer"
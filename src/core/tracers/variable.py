@@ -1,12 +1,96 @@
-from gdb_debugger.tracers.base import Tracer
+from .base import Tracer
 import gdb
+import re
 import struct
 
+_FORMATS = {8: 'Q', 4: 'I', 2: 'H', 1: 'B'}
+
+# Only plain `name.field.field` paths are compiled; anything else is evaluated.
+_FIELD_PATH_RE = re.compile(r'^[A-Za-z_]\w*(\.\w+)*$')
+
+_POINTER_CODES = (gdb.TYPE_CODE_PTR, gdb.TYPE_CODE_REF)
+
+# Registers that hold the same value at every hit of a given pc, so an
+# address at a fixed offset from them can be compiled.
+_BASE_REGISTERS = {"sp", "rsp", "esp", "fp", "rbp", "ebp", "x29", "s0"}
+
+# How `info address` describes the two kinds of location that are compiled:
+# DW_OP_fbreg with a frame base of DW_OP_reg/DW_OP_breg, and DW_OP_breg.
+# Anything longer (DW_OP_fbreg N; DW_OP_deref for an argument passed
+# indirectly, say) is printed as "a complex DWARF expression" and evaluated.
+_FRAME_BASE_LOCATION_RE = re.compile(r'a variable at frame base reg \$(\w+) offset (-?\d+)\+(-?\d+)')
+_BASE_REG_LOCATION_RE = re.compile(r'a variable at offset (-?\d+) from base reg \$(\w+)')
+# One entry of a location list: "  Range 0x1000-0x1010: a variable in $rax"
+_RANGE_RE = re.compile(r'\s*Range (0x[0-9a-f]+)-(0x[0-9a-f]+): (.*)')
+
+_byte_order = None
+
+
+def byte_order() -> str:
+    """The struct byte order character of the target, '<' or '>'."""
+    global _byte_order
+    if _byte_order is None:
+        _byte_order = '>' if 'big endian' in gdb.execute("show endian", to_string=True) else '<'
+    return _byte_order
+
+
+def _register_location(description: str, pc: int):
+    """
+    (register, offset) of a variable that `info address` describes as at a
+    fixed offset from the stack or frame pointer at `pc`, else None.
+    """
+    if 'multi-location' in description:
+        entries = (_RANGE_RE.match(line) for line in description.splitlines())
+        description = next((m.group(3) for m in entries
+                            if m and int(m.group(1), 16) <= pc < int(m.group(2), 16)), "")
+    m = _FRAME_BASE_LOCATION_RE.search(description)
+    if m:
+        (register, offset) = (m.group(1), int(m.group(2)) + int(m.group(3)))
+    else:
+        m = _BASE_REG_LOCATION_RE.search(description)
+        if not m:
+            return None
+        (register, offset) = (m.group(2), int(m.group(1)))
+    return (register, offset) if register in _BASE_REGISTERS else None
+
+
+class _CompiledAccessor:
+    """
+    Address recipe for one variable path at one pc: a base (an offset from
+    the stack or frame pointer, or an absolute address for statics) followed
+    by ops, each either ("offset", n) or ("deref", pointer size, format), and
+    the size of the final read.
+    """
+    __slots__ = ("register", "base", "ops", "size", "fmt")
+
+    def __init__(self, register, base, ops, size):
+        self.register = register
+        self.base = base
+        self.ops = ops
+        self.size = size
+        self.fmt = byte_order() + _FORMATS[size]
+
+    def read(self, frame: gdb.Frame, inferior: gdb.Inferior):
+        address = self.base
+        if self.register:
+            address += int(frame.read_register(self.register))
+        for op in self.ops:
+            if op[0] == "offset":
+                address += op[1]
+            else:
+                address = struct.unpack(op[2], inferior.read_memory(address, op[1]))[0]
+        return struct.unpack(self.fmt, inferior.read_memory(address, self.size))[0]
+
+
 class VariableTracer(Tracer):
     """
     A tracer that reads a variable's value from the specified scope
     using a hybrid, robust approach.
     """
+    # (variable_name, scope, pc) -> _CompiledAccessor, or None when the
+    # variable has to be evaluated (e.g. it lives in a register there).
+    _accessors = {}
+
     def __init__(self, variable_name: str, scope: str = 'local'):
         """
         Initializes the tracer.
@@ -18,42 +102,128 @@ class VariableTracer(Tracer):
 
     def start(self, inferior_thread: gdb.Thread):
         """
-        Reads the variable's value using a hybrid strategy:
-        1. Try a non-intrusive memory read first.
-        2. If that fails, fall back to the powerful (but intrusive)
-           gdb.parse_and_eval(), which can read from registers.
+        Reads the variable's value. The first hit at a given pc compiles the
+        field path into an accessor (see `_compile`); later hits at that pc
+        only read one register and the bytes they need. Variables that are
+        not at a fixed offset from the stack or frame pointer fall back to
+        the hybrid strategy of `_evaluate`.
         """
         try:
             inferior_thread.switch()
-            val = gdb.parse_and_eval(self.variable_name)
+            frame = gdb.selected_frame()
+            key = (self.variable_name, self.scope, frame.pc())
+            if key not in VariableTracer._accessors:
+                VariableTracer._accessors[key] = self._compile(frame)
 
-            # --- Non-intrusive read first ---
-            if val.address:
+            accessor = VariableTracer._accessors[key]
+            if accessor is not None:
                 try:
-                    val_type = val.type
-                    val_size = val_type.sizeof
-                    memory = gdb.selected_inferior().read_memory(val.address, val_size)
-                    
-                    if val_size == 8: self.data = struct.unpack('<Q', memory)[0]
-                    elif val_size == 4: self.data = struct.unpack('<I', memory)[0]
-                    elif val_size == 2: self.data = struct.unpack('<H', memory)[0]
-                    elif val_size == 1: self.data = struct.unpack('<B', memory)[0]
-                    else: self.data = f"Unsupported size: {val_size}"
+                    self.data = accessor.read(frame, gdb.selected_inferior())
                     return
                 except gdb.MemoryError:
-                    # Fall through to the intrusive method if memory is not valid
+                    # Fall through to evaluation if memory is not valid
                     pass
-            
-            # --- Fallback to intrusive read (for registers) ---
-            self.data = int(val)
+
+            self._evaluate()
 
         except gdb.error as e:
             self.data = f"Error: {e}"
             print(f"[gdb_debugger] tracer warning: could not read '{self.variable_name}': {e}")
 
+    def _compile(self, frame: gdb.Frame):
+        """
+        Resolves the root variable's location and the member offsets once.
+        A local is compiled only if its DWARF location at this pc, as `info
+        address` describes it, is DW_OP_fbreg or DW_OP_breg of the stack or
+        frame pointer. The result is checked against `parse_and_eval` before
+        it is trusted.
+        """
+        if not _FIELD_PATH_RE.match(self.variable_name):
+            return None
+        root, *members = self.variable_name.split('.')
+        register = None
+        try:
+            if self.scope == 'static':
+                symbol = gdb.lookup_global_symbol(root) or gdb.lookup_static_symbol(root)
+                if symbol is None:
+                    return None
+                root_val = symbol.value()
+            else:
+                location = _register_location(gdb.execute(f"info address {root}", to_string=True), frame.pc())
+                if location is None:
+                    return None
+                register = location[0]
+                root_val = frame.read_var(root)
+        except (ValueError, gdb.error):
+            return None
+        if root_val.address is None:
+            return None
+
+        base = int(root_val.address)
+        if register:
+            # The location described has to be the one GDB reads the variable from
+            if location[1] + int(frame.read_register(register)) != base:
+                return None
+            base = location[1]
+
+        ops = []
+        val_type = root_val.type
+        for member in members:
+            val_type = val_type.strip_typedefs()
+            if val_type.code in _POINTER_CODES:
+                if val_type.sizeof not in _FORMATS:
+                    return None
+                ops.append(("deref", val_type.sizeof, byte_order() + _FORMATS[val_type.sizeof]))
+                val_type = val_type.target().strip_typedefs()
+            field = next((f for f in val_type.fields() if f.name == member), None) \
+                if val_type.code in (gdb.TYPE_CODE_STRUCT, gdb.TYPE_CODE_UNION) else None
+            if field is None or not hasattr(field, "bitpos"):
+                return None
+            if field.bitpos:
+                ops.append(("offset", field.bitpos // 8))
+            val_type = field.type
+
+        if val_type.sizeof not in _FORMATS:
+            return None
+        accessor = _CompiledAccessor(register, base, tuple(ops), val_type.sizeof)
+
+        try:
+            expected = int(gdb.parse_and_eval(self.variable_name))
+            if accessor.read(frame, gdb.selected_inferior()) != expected:
+                return None
+        except (gdb.error, gdb.MemoryError):
+            return None
+        return accessor
+
+    def _evaluate(self):
+        """
+        Reads the variable using a hybrid strategy:
+        1. Try a non-intrusive memory read first.
+        2. If that fails, fall back to the powerful (but intrusive)
+           gdb.parse_and_eval(), which can read from registers.
+        """
+        val = gdb.parse_and_eval(self.variable_name)
+
+        # --- Non-intrusive read first ---
+        if val.address:
+            try:
+                val_type = val.type
+                val_size = val_type.sizeof
+                memory = gdb.selected_inferior().read_memory(val.address, val_size)
+
+                if val_size in _FORMATS: self.data = struct.unpack(byte_order() + _FORMATS[val_size], memory)[0]
+                else: self.data = f"Unsupported size: {val_size}"
+                return
+            except gdb.MemoryError:
+                # Fall through to the intrusive method if memory is not valid
+                pass
+
+        # --- Fallback to intrusive read (for registers) ---
+        self.data = int(val)
+
     def stop(self):
         """This is a single-shot tracer, so stop is a no-op."""
         pass
 
     def __str__(self) -> str:
-        return f"VariableTracer({self.variable_name})" 
\ No newline at end of file
+        return f"VariableTracer({self.variable_name})"
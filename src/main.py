@@ -13,6 +13,11 @@ script_dir = os.path.dirname(os.path.realpath(__file__))
 if script_dir not in sys.path:
     sys.path.insert(0, script_dir)
 
+# 记录启动耗时：从这里开始计时每个被导入的模块（类似 `python -X importtime`），
+# 用 `async-startup-times` 命令查看。elftools、调用图和运行时插件在命令第一次用到时才导入。
+from startup import import_timer, finish_startup, AsyncStartupTimesCommand
+import_timer.install()
+
 
 # define core utilities and register all GDB commands
 # 注意，即使只 import 一个方法/函数/常量，整个模块都会被执行（执行的入口是 __init__.py）
@@ -42,6 +47,10 @@ from core import InspectAsync # NOTE: 这个语句实际上是没有必要的，
 
 # 6. 利用 `dump-async-data` 命令，dump 异步数据为火焰图
 
+# 命令注册完毕，启动阶段结束；之后的导入记为"首次使用时加载"
+AsyncStartupTimesCommand()
+finish_startup()
+
 
 
 # 用户手动调用 future analyzer 获得 json
@@ -0,0 +1,138 @@
+"""
+Startup timing for `source src/main.py`.
+
+main.py installs `import_timer` before it imports anything else. It is a
+meta path finder that times every module executed from then on, like
+`python -X importtime` (which GDB's embedded Python can't be started
+with): self and cumulative microseconds per module, children before their
+parent and indented under it.
+
+Imports made while main.py runs count as startup; once the commands are
+registered, main.py calls `finish_startup()` and later imports - elftools
+on `init-dwarf-analysis`, the call graph and the runtime plugins on
+`start-async-debug` - are recorded as loaded on first use.
+`async-startup-times` prints both.
+
+This module lives next to main.py rather than in `core`, because importing
+anything from `core` runs `core/__init__.py`, the code being timed.
+"""
+import sys
+import time
+from importlib.machinery import ExtensionFileLoader, SourceFileLoader, SourcelessFileLoader
+from typing import List, NamedTuple
+
+import gdb
+
+# Loaders that are created per module, so their exec_module can be wrapped
+# without affecting other modules
+_TIMED_LOADERS = (SourceFileLoader, SourcelessFileLoader, ExtensionFileLoader)
+
+PHASE_STARTUP = "startup"
+PHASE_FIRST_USE = "first use"
+
+
+class ImportRecord(NamedTuple):
+    name: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+    phase: str
+
+
+class ImportTimer:
+    """Meta path finder that times module execution; it finds nothing itself."""
+
+    def __init__(self):
+        self.records: List[ImportRecord] = []
+        self.phase = PHASE_STARTUP
+        self.started = None
+        self.startup_seconds = None
+        # [start time, cumulative time of the children] of each module being executed
+        self._stack = []
+
+    def install(self):
+        if self not in sys.meta_path:
+            self.started = time.perf_counter()
+            sys.meta_path.insert(0, self)
+
+    def finish_startup(self):
+        self.startup_seconds = time.perf_counter() - self.started
+        self.phase = PHASE_FIRST_USE
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                if isinstance(spec.loader, _TIMED_LOADERS):
+                    self._wrap(spec.loader, fullname)
+                return spec
+        return None
+
+    def _wrap(self, loader, name):
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            self._stack.append([time.perf_counter(), 0.0])
+            try:
+                exec_module(module)
+            finally:
+                started, children = self._stack.pop()
+                cumulative = time.perf_counter() - started
+                if self._stack:
+                    self._stack[-1][1] += cumulative
+                self.records.append(ImportRecord(name, len(self._stack), int((cumulative - children) * 1e6),
+                                                 int(cumulative * 1e6), self.phase))
+
+        loader.exec_module = timed_exec_module
+
+
+import_timer = ImportTimer()
+
+
+def finish_startup():
+    import_timer.finish_startup()
+
+
+def print_import_table(records: List[ImportRecord], min_us: int):
+    """Prints records in `-X importtime` layout, leaving out those under `min_us`."""
+    print("import time: self [us] | cumulative | imported package")
+    for record in records:
+        if record.cumulative_us >= min_us:
+            print(f"import time: {record.self_us:>9} | {record.cumulative_us:>10} | {'  ' * record.depth}{record.name}")
+
+
+class AsyncStartupTimesCommand(gdb.Command):
+    """
+    Shows where the time went when main.py was sourced, and what was loaded on first use since.
+    Usage: async-startup-times [MIN_MS]   (hide imports faster than MIN_MS, default 1; 0 shows all)
+    """
+    def __init__(self):
+        super().__init__("async-startup-times", gdb.COMMAND_USER)
+
+    def invoke(self, arg, from_tty):
+        self.dont_repeat()
+        try:
+            min_us = int(float(arg) * 1000) if arg.strip() else 1000
+        except ValueError:
+            print("Usage: async-startup-times [MIN_MS]")
+            return
+
+        timer = import_timer
+        if timer.startup_seconds is None:
+            print("[rust-future-tracing] Startup times are recorded when src/main.py is sourced.")
+            return
+        for phase in (PHASE_STARTUP, PHASE_FIRST_USE):
+            records = [record for record in timer.records if record.phase == phase]
+            top_level_us = sum(record.cumulative_us for record in records if record.depth == 0)
+            if phase == PHASE_STARTUP:
+                print(f"[rust-future-tracing] src/main.py sourced in {timer.startup_seconds * 1000:.1f} ms, "
+                      f"{top_level_us / 1000:.1f} ms of it importing {len(records)} modules")
+            elif records:
+                print(f"[rust-future-tracing] Loaded on first use since: {len(records)} modules in {top_level_us / 1000:.1f} ms")
+            else:
+                print("[rust-future-tracing] Nothing loaded on first use yet.")
+            if records:
+                print_import_table(records, min_us)
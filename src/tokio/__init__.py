@@ -1,2 +1,3 @@
 # Tokio tracing parts
-# NOT working yet
\ No newline at end of file
+# Loaded by core as one of the runtime plugins listed in `PLUGIN_NAMES`.
+from .runtime_plugins.tokio import plugin
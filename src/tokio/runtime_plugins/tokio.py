@@ -1,10 +1,18 @@
 import gdb
-from gdb_debugger.runtime_plugins.base import RuntimePlugin
-from gdb_debugger.runtime_plugins.tokio_model import Runtime
-from gdb_debugger.tracers.variable import VariableTracer
-from gdb_debugger.tracers.backtrace import BacktraceTracer
-from gdb_debugger.tracers.tokio_task_id import TokioTaskIDTracer
-from gdb_debugger.tracers.task_list import TaskListTracer
+import json
+import time
+from core.runtime_plugins.base import RuntimePlugin
+from core.tracers.variable import VariableTracer
+from core.tracers.backtrace import BacktraceTracer
+from core.tracers.timestamp import TimestampTracer
+from .tokio_model import Runtime
+from ..tracers.tokio_task_id import TokioTaskIDTracer
+from ..tracers.task_list import TaskListTracer, OwnedTasksWalker
+
+RAW_TASK_NEW = "tokio::runtime::task::raw::RawTask::new"
+RAW_TASK_POLL = "tokio::runtime::task::raw::RawTask::poll"
+RAW_TASK_SHUTDOWN = "tokio::runtime::task::raw::RawTask::shutdown"
+RAW_TASK_DEALLOC = "tokio::runtime::task::raw::RawTask::dealloc"
 
 # --- Tracer Factory Functions ---
 
@@ -32,6 +40,10 @@ def new_task_backtrace_tracer():
     """Backtrace tracer for RawTask::new to find the spawn location."""
     return BacktraceTracer()
 
+def poll_timestamp_tracer():
+    """Thread clock time (handling excluded) on entry to and return from RawTask::poll."""
+    return TimestampTracer()
+
 def thread_id_tracer():
     """A tracer to get the current thread's ID."""
     return gdb.selected_thread().ptid
@@ -42,6 +54,20 @@ def thread_id_tracer():
 class TokioPlugin(RuntimePlugin):
     """A plugin to instrument the Tokio runtime."""
 
+    def __init__(self):
+        # Live model, updated from on_event() as breakpoints are hit.
+        self.runtime = Runtime()
+        self.task_walker = OwnedTasksWalker()
+        self._event_handlers = {
+            RAW_TASK_NEW: self._on_task_new,
+            RAW_TASK_POLL: self._on_task_poll,
+            RAW_TASK_SHUTDOWN: self._on_task_shutdown,
+            RAW_TASK_DEALLOC: self._on_task_dealloc,
+        }
+        self._exit_handlers = {
+            RAW_TASK_POLL: self._on_task_poll_exit,
+        }
+
     @property
     def name(self):
         return "tokio"
@@ -52,95 +78,121 @@ class TokioPlugin(RuntimePlugin):
         """
         return [
             {
-                "symbol": "tokio::runtime::task::raw::RawTask::new",
+                "symbol": RAW_TASK_NEW,
                 "entry_tracers": [new_task_id_tracer, new_task_backtrace_tracer],
                 "exit_tracers": [],
             },
             {
-                "symbol": "tokio::runtime::task::raw::RawTask::poll",
-                "entry_tracers": [self_tracer, poll_task_id_tracer, task_list_tracer],
-                "exit_tracers": [],
+                "symbol": RAW_TASK_POLL,
+                # The timestamp tracers bracket the poll as tightly as possible.
+                "entry_tracers": [self_tracer, poll_task_id_tracer, task_list_tracer, poll_timestamp_tracer],
+                "exit_tracers": [poll_timestamp_tracer],
             },
             {
-                "symbol": "tokio::runtime::task::raw::RawTask::shutdown",
+                "symbol": RAW_TASK_SHUTDOWN,
                 "entry_tracers": [self_tracer],
                 "exit_tracers": [],
             },
             {
-                "symbol": "tokio::runtime::task::raw::RawTask::dealloc",
+                "symbol": RAW_TASK_DEALLOC,
                 "entry_tracers": [self_tracer],
                 "exit_tracers": [],
             },
         ]
 
+    def on_event(self, symbol_name: str, phase: str, invocation_data: dict):
+        """Update the live runtime model from a single breakpoint hit."""
+        handlers = self._event_handlers if phase == "entry" else self._exit_handlers
+        handler = handlers.get(symbol_name)
+        if handler:
+            handler(self.runtime, invocation_data)
+
     def process_data(self, all_traced_data: dict):
         """
-        Builds a model of the runtime from the traced data and prints a report.
+        Prints a report from the live runtime model. If nothing reached the
+        live model (e.g. data loaded from elsewhere), it is rebuilt from the
+        traced data instead.
         """
         print("\n[gdb_debugger] ----- Tokio Runtime Report -----")
-        runtime = self._build_runtime_model(all_traced_data)
+        runtime = self.runtime
+        if not runtime.tasks and all_traced_data:
+            runtime = self._build_runtime_model(all_traced_data)
         self._print_task_summary(runtime)
         print("\n[gdb_debugger] -------------------------------------\n")
 
     def _build_runtime_model(self, all_traced_data: dict) -> Runtime:
+        """Replay recorded invocations, in event order, into a fresh model."""
         runtime = Runtime()
-        pointer_to_id = {}
-
-        # Process task creations first to populate the tasks
-        if "tokio::runtime::task::raw::RawTask::new" in all_traced_data:
-            for invocation in all_traced_data["tokio::runtime::task::raw::RawTask::new"]:
-                entry_data = invocation.get('entry_tracers', {})
-                task_id = entry_data.get('VariableTracer(id.__0)')
-                backtrace = entry_data.get('BacktraceTracer')
-                
-                if isinstance(task_id, int):
-                    runtime.get_or_create_task(task_id, backtrace)
-
-        # Process polls to link pointers to IDs and count polls
-        if "tokio::runtime::task::raw::RawTask::poll" in all_traced_data:
-            for invocation in all_traced_data["tokio::runtime::task::raw::RawTask::poll"]:
-                entry_data = invocation.get('entry_tracers', {})
-                thread_id = invocation.get('thread_id')
-                task_id = entry_data.get('TokioTaskIDTracer')
-                task_ptr = entry_data.get('VariableTracer(self.ptr.pointer)')
-                task_list_val = entry_data.get('TaskListTracer')
-
-                if isinstance(task_id, int):
-                    task = runtime.get_or_create_task(task_id)
-                    task.inc_poll()
-                    if isinstance(task_ptr, int):
-                        pointer_to_id[task_ptr] = task_id
-                        task.add_pointer(task_ptr)
-                
-                if thread_id and "Error" not in str(task_list_val) and isinstance(task_list_val, gdb.Value):
-                    runtime.thread_task_lists[thread_id] = task_list_val
-
-        # Process drops using the pointer-to-ID mapping
-        def process_drops(symbol_name):
-            if symbol_name in all_traced_data:
-                for invocation in all_traced_data[symbol_name]:
-                    entry_data = invocation.get('entry_tracers', {})
-                    task_ptr = entry_data.get('VariableTracer(self.ptr.pointer)')
-                    
-                    if isinstance(task_ptr, int) and task_ptr in pointer_to_id:
-                        task_id = pointer_to_id[task_ptr]
-                        task = runtime.get_or_create_task(task_id)
-                        task.set_dropped()
-        
-        process_drops("tokio::runtime::task::raw::RawTask::shutdown")
-        process_drops("tokio::runtime::task::raw::RawTask::dealloc")
-
+        events = []
+        for symbol_name, handler in self._event_handlers.items():
+            for invocation in all_traced_data.get(symbol_name, []):
+                events.append((invocation.get("timestamp", 0.0), handler, invocation))
+        for symbol_name, handler in self._exit_handlers.items():
+            for invocation in all_traced_data.get(symbol_name, []):
+                if "exit_timestamp" in invocation:
+                    events.append((invocation["exit_timestamp"], handler, invocation))
+        events.sort(key=lambda event: event[0])
+        for _, handler, invocation in events:
+            handler(runtime, invocation)
         return runtime
 
+    def _on_task_new(self, runtime: Runtime, invocation: dict):
+        entry_data = invocation.get('entry_tracers', {})
+        task_id = entry_data.get('VariableTracer(id.__0)')
+        if isinstance(task_id, int):
+            runtime.on_task_new(task_id, entry_data.get('BacktraceTracer'), invocation.get('timestamp'))
+
+    def _on_task_poll(self, runtime: Runtime, invocation: dict):
+        entry_data = invocation.get('entry_tracers', {})
+        thread_id = invocation.get('thread_id')
+        task_id = entry_data.get('TokioTaskIDTracer')
+        task_list_val = entry_data.get('TaskListTracer')
+
+        if isinstance(task_id, int):
+            runtime.on_task_poll(
+                task_id,
+                entry_data.get('VariableTracer(self.ptr.pointer)'),
+                invocation.get('timestamp'),
+                invocation.get('sample_weight', 1),
+            )
+
+        if thread_id and isinstance(task_list_val, gdb.Value):
+            runtime.thread_task_lists[thread_id] = task_list_val
+
+    def _on_task_poll_exit(self, runtime: Runtime, invocation: dict):
+        task_id = invocation.get('entry_tracers', {}).get('TokioTaskIDTracer')
+        started = invocation.get('entry_tracers', {}).get('TimestampTracer')
+        finished = invocation.get('exit_tracers', {}).get('TimestampTracer')
+        if not isinstance(task_id, int):
+            return
+        if isinstance(started, int) and isinstance(finished, int):
+            duration_ns = finished - started
+        elif "timestamp" in invocation and "exit_timestamp" in invocation:
+            duration_ns = int((invocation["exit_timestamp"] - invocation["timestamp"]) * 1e9)
+        else:
+            return
+        runtime.on_task_poll_end(task_id, duration_ns)
+
+    def _on_task_shutdown(self, runtime: Runtime, invocation: dict):
+        task_ptr = invocation.get('entry_tracers', {}).get('VariableTracer(self.ptr.pointer)')
+        if isinstance(task_ptr, int):
+            runtime.on_task_drop(task_ptr, invocation.get('timestamp'), state="shutdown")
+
+    def _on_task_dealloc(self, runtime: Runtime, invocation: dict):
+        task_ptr = invocation.get('entry_tracers', {}).get('VariableTracer(self.ptr.pointer)')
+        if isinstance(task_ptr, int):
+            runtime.on_task_drop(task_ptr, invocation.get('timestamp'), state="deallocated")
+
     def _print_task_summary(self, runtime: Runtime):
         if not runtime.tasks:
             print("No tasks were traced.")
             return
 
         # Header
-        header = f"{'ID':<5} {'Polls':<7} {'Lifetime (s)':<15} {'Spawn Location':<60}"
+        header = (f"{'ID':<5} {'State':<12} {'Polls':<7} {'Lifetime (s)':<15} "
+                  f"{'p50 (us)':>10} {'p99 (us)':>10} {'max (us)':>10}  {'Spawn Location':<60}")
         print(header)
-        print("-" * 100)
+        print("-" * 135)
 
         # Rows
         for task_id in sorted(runtime.tasks.keys()):
@@ -152,16 +204,66 @@ class TokioPlugin(RuntimePlugin):
             if len(spawn_loc) > 58:
                 spawn_loc = "..." + spawn_loc[-55:]
             
-            row = f"{task.id:<5} {task.poll_count:<7} {lifetime_secs:<15} {spawn_loc:<60}"
+            row = (f"{task.id:<5} {task.state:<12} {task.poll_count:<7} {lifetime_secs:<15} "
+                   f"{self._format_latency(task.poll_latency)}  {spawn_loc:<60}")
             print(row)
 
+        if runtime.location_latency:
+            print("\nPoll latency by spawn location:")
+            print(f"{'Polls':<7} {'p50 (us)':>10} {'p99 (us)':>10} {'max (us)':>10}  {'Spawn Location':<60}")
+            print("-" * 100)
+            ranked = sorted(runtime.location_latency.items(), key=lambda item: item[1].max, reverse=True)
+            for location, histogram in ranked:
+                print(f"{histogram.count:<7} {self._format_latency(histogram)}  {location}")
+
+        if runtime.observed_polls != runtime.traced_polls:
+            print(f"\nRawTask::poll is sampled: {runtime.traced_polls} of ~{runtime.observed_polls} polls traced. "
+                  f"Per-task poll counts and latencies cover the traced polls only.")
+
+    @staticmethod
+    def _format_latency(histogram) -> str:
+        if histogram is None or not histogram.count:
+            return f"{'-':>10} {'-':>10} {'-':>10}"
+        p50, p99, peak = (value / 1000 for value in
+                          (histogram.percentile(50), histogram.percentile(99), histogram.max))
+        return f"{p50:>10.1f} {p99:>10.1f} {peak:>10.1f}"
+
+    def export_data(self, path: str):
+        """Writes the task table and poll latency histograms to `path` as JSON."""
+        runtime = self.runtime
+        data = {
+            "runtime": self.name,
+            "latency_unit": "ns",
+            # Run time between entry and return, less the debugger's handling of that thread's breakpoints
+            "latency_clock": "thread time outside breakpoint handling",
+            # Per-task "polls" are traced polls; these totals tell how many polls they sample
+            "traced_polls": runtime.traced_polls,
+            "observed_polls": runtime.observed_polls,
+            "tasks": [
+                {
+                    "id": task.id,
+                    "state": task.state,
+                    "polls": task.poll_count,
+                    "lifetime_s": task.lifetime.total_seconds(),
+                    "spawn_location": task.spawn_location,
+                    "poll_latency": task.poll_latency.to_dict() if task.poll_latency else None,
+                }
+                for _, task in sorted(runtime.tasks.items())
+            ],
+            "spawn_locations": {
+                location: histogram.to_dict()
+                for location, histogram in runtime.location_latency.items()
+            },
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        print(f"[gdb_debugger] Exported {len(data['tasks'])} tasks to {path}")
+
     def invoke(self, arg, from_tty):
         if not gdb.selected_inferior().is_valid():
             print("No inferior process is currently being debugged.")
             return
 
-        # This is more reliable than a live inspection.
-        runtime = plugin._build_runtime_model(traced_data)
         worker_threads = self._find_worker_threads()
 
         if not worker_threads:
@@ -172,18 +274,11 @@ class TokioPlugin(RuntimePlugin):
         for thread in worker_threads:
             print(f"  - Thread {thread.ptid}: {thread.name}")
             
-            # In the new design, we don't need to find CONTEXT. We can
-            # get the task list directly from the last poll event.
-            last_poll_task_list = None
-            if "tokio::runtime::task::raw::RawTask::poll" in traced_data:
-                for invocation in reversed(traced_data["tokio::runtime::task::raw::RawTask::poll"]):
-                    if invocation.get("thread_id") == thread.ptid:
-                        task_list_val = invocation.get('entry_tracers', {}).get('TaskListTracer')
-                        if "Error" not in str(task_list_val) and isinstance(task_list_val, gdb.Value):
-                            last_poll_task_list = task_list_val
-                            break
+            # In the new design, we don't need to find CONTEXT. The live model
+            # keeps the task list from each thread's last poll event.
+            last_poll_task_list = self.runtime.thread_task_lists.get(thread.ptid)
             
-            if not last_poll_task_list:
+            if last_poll_task_list is None:
                 print(f"    Task List: Not captured. (Has this thread polled a task?)")
             else:
                 print(f"    Task List: Captured")
@@ -197,12 +292,12 @@ class TokioPlugin(RuntimePlugin):
         to extract all task header pointers.
         """
         try:
-            task_list = owned_tasks_val['list']
-            
-            # Now, walk the linked list.
-            head = task_list['head']
-            # ... rest of the method ...
-        except Exception as e:
+            started = time.perf_counter()
+            headers = self.task_walker.walk(owned_tasks_val)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"    Walked {len(headers)} tasks in {elapsed_ms:.1f}ms")
+            return headers
+        except (gdb.error, gdb.MemoryError) as e:
             print(f"Error extracting task headers: {e}")
             return []
 
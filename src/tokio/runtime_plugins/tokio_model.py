@@ -1,24 +1,135 @@
 import datetime
+import time
+from array import array
+
+class LatencyHistogram:
+    """
+    A fixed-size, log-linear (HDR-style) histogram of durations in nanoseconds.
+
+    Values below `SUB_BUCKETS` get one bucket each; above that, every power of
+    two is split into `SUB_BUCKETS` linear buckets, so any recorded value is
+    known to within 1/SUB_BUCKETS of itself. Values above `MAX_VALUE` (about
+    36 minutes) land in the last bucket. Memory is allocated once, up front.
+    """
+    SUB_BUCKET_BITS = 3
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+    MAX_VALUE = (1 << 41) - 1
+    BUCKET_COUNT = (MAX_VALUE.bit_length() - SUB_BUCKET_BITS + 1) * SUB_BUCKETS
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * self.BUCKET_COUNT))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @classmethod
+    def bucket_index(cls, value: int) -> int:
+        if value < cls.SUB_BUCKETS:
+            return value
+        value = min(value, cls.MAX_VALUE)
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS - 1
+        return (shift + 1) * cls.SUB_BUCKETS + (value >> shift) - cls.SUB_BUCKETS
+
+    @classmethod
+    def bucket_bounds(cls, index: int):
+        """Returns the (lowest, highest) value that falls in bucket `index`."""
+        if index < cls.SUB_BUCKETS:
+            return index, index
+        shift = index // cls.SUB_BUCKETS - 1
+        sub = index % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        return sub << shift, ((sub + 1) << shift) - 1
+
+    def record(self, value: int):
+        value = max(0, int(value))
+        self.counts[self.bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> int:
+        """
+        Returns the highest value equivalent to the given percentile, capped
+        at the exact maximum. Returns 0 for an empty histogram.
+        """
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.bucket_bounds(index)[1], self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        """Summary plus the non-empty buckets as [lowest, highest, count]."""
+        return {
+            "count": self.count,
+            "min": self.min or 0,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": [
+                [*self.bucket_bounds(index), n]
+                for index, n in enumerate(self.counts) if n
+            ],
+        }
+
 
 class Task:
-    """Represents a single Tokio task and its collected metrics."""
-    def __init__(self, task_id, backtrace=None):
+    """Represents a single Tokio task and its collected metrics.
+
+    All timestamps are event times (`time.time()` taken when the breakpoint
+    was hit), not the time the report is built.
+    """
+    def __init__(self, task_id, backtrace=None, created_at=None):
         self.id = task_id
         self.pointers = set()
         self.poll_count = 0
-        self.created_at = datetime.datetime.now()
+        self.state = "created"
+        self.created_at = created_at
+        self.first_poll_at = None
+        self.last_poll_at = None
         self.dropped_at = None
+        self.poll_latency = None # LatencyHistogram, allocated on the first timed poll
         self.spawn_location = self._extract_spawn_location(backtrace)
 
     def add_pointer(self, ptr):
         if ptr:
             self.pointers.add(ptr)
 
-    def inc_poll(self):
+    def inc_poll(self, timestamp=None):
+        # Traced polls only: a sampled RawTask::poll weight covers all tasks, not this one.
         self.poll_count += 1
+        self.state = "polled"
+        if timestamp is not None:
+            if self.first_poll_at is None:
+                self.first_poll_at = timestamp
+            self.last_poll_at = timestamp
+            if self.created_at is None:
+                # Spawned before tracing started; the first poll is the earliest we know of.
+                self.created_at = timestamp
+
+    def record_poll_duration(self, duration_ns: int):
+        if self.poll_latency is None:
+            self.poll_latency = LatencyHistogram()
+        self.poll_latency.record(duration_ns)
 
-    def set_dropped(self):
-        self.dropped_at = datetime.datetime.now()
+    def set_dropped(self, timestamp=None, state="deallocated"):
+        self.state = state
+        if self.dropped_at is None:
+            self.dropped_at = timestamp if timestamp is not None else time.time()
 
     @property
     def is_dropped(self):
@@ -27,15 +138,17 @@ class Task:
     @property
     def lifetime(self):
         """Returns the task's lifetime as a timedelta."""
-        end_time = self.dropped_at or datetime.datetime.now()
-        return end_time - self.created_at
+        if self.created_at is None:
+            return datetime.timedelta(0)
+        end_time = self.dropped_at if self.dropped_at is not None else time.time()
+        return datetime.timedelta(seconds=max(0.0, end_time - self.created_at))
 
     def _extract_spawn_location(self, backtrace):
         """
         A simple heuristic to find where a task was spawned. It looks for the
         first frame in the backtrace that isn't inside tokio's own code.
         """
-        if not backtrace:
+        if not backtrace or not isinstance(backtrace, list):
             return "Unknown"
 
         for frame in backtrace:
@@ -46,13 +159,65 @@ class Task:
 
 
 class Runtime:
-    """Represents the state of the Tokio runtime and all its tasks."""
+    """Represents the state of the Tokio runtime and all its tasks.
+
+    The model is updated online, one event per breakpoint hit, so it is
+    always current and never needs a rescan of the traced data.
+    """
     def __init__(self):
         self.tasks = {} # Dict of task_id -> Task
+        self.pointer_to_id = {} # Dict of RawTask header pointer -> task_id
         self.thread_task_lists = {} # Dict of thread_id -> last known OwnedTasks gdb.Value
+        self.location_latency = {} # Dict of spawn location -> LatencyHistogram
+        self.traced_polls = 0
+        self.observed_polls = 0 # traced polls scaled by their sample weight (see core/sampling.py)
 
-    def get_or_create_task(self, task_id, backtrace=None) -> Task:
+    def get_or_create_task(self, task_id, backtrace=None, created_at=None) -> Task:
         """Gets a task by ID, creating it if it doesn't exist."""
-        if task_id not in self.tasks:
-            self.tasks[task_id] = Task(task_id, backtrace)
-        return self.tasks[task_id] 
\ No newline at end of file
+        task = self.tasks.get(task_id)
+        if task is None:
+            task = self.tasks[task_id] = Task(task_id, backtrace, created_at)
+        return task
+
+    def on_task_new(self, task_id, backtrace=None, timestamp=None):
+        """`RawTask::new` was hit."""
+        task = self.get_or_create_task(task_id, backtrace, timestamp)
+        if task.created_at is None:
+            task.created_at = timestamp
+        return task
+
+    def on_task_poll(self, task_id, task_ptr=None, timestamp=None, weight=1):
+        """
+        `RawTask::poll` was entered. `weight` is the number of polls, of any
+        task, that this traced one stands for; it only scales the totals.
+        """
+        self.traced_polls += 1
+        self.observed_polls += weight
+        task = self.get_or_create_task(task_id)
+        task.inc_poll(timestamp)
+        if isinstance(task_ptr, int):
+            self.pointer_to_id[task_ptr] = task_id
+            task.add_pointer(task_ptr)
+        return task
+
+    def on_task_poll_end(self, task_id, duration_ns):
+        """`RawTask::poll` returned after `duration_ns` nanoseconds."""
+        task = self.get_or_create_task(task_id)
+        task.record_poll_duration(duration_ns)
+        histogram = self.location_latency.get(task.spawn_location)
+        if histogram is None:
+            histogram = self.location_latency[task.spawn_location] = LatencyHistogram()
+        histogram.record(duration_ns)
+        return task
+
+    def on_task_drop(self, task_ptr, timestamp=None, state="deallocated"):
+        """`RawTask::shutdown` or `RawTask::dealloc` was hit; returns the task if known."""
+        task_id = self.pointer_to_id.get(task_ptr)
+        if task_id is None:
+            return None
+        task = self.get_or_create_task(task_id)
+        task.set_dropped(timestamp, state)
+        if state == "deallocated":
+            # The allocation may be reused by a later task.
+            del self.pointer_to_id[task_ptr]
+        return task
@@ -1,56 +1,81 @@
-from ...core.tracers.base import Tracer
+from core.tracers.base import Tracer
+from .tls import TLSResolver
 import gdb
-import subprocess
+
+CONTEXT_TYPE = "tokio::runtime::context::Context"
+# Mangled-name fragment of the `CONTEXT` thread-local's storage symbol.
+CONTEXT_SYMBOL = "5tokio7runtime7context7CONTEXT"
+# std wrappers a `thread_local!` value may be stored in, depending on the toolchain.
+CONTEXT_STORAGE_TYPES = (
+    f"std::sys::thread_local::native::eager::Storage<{CONTEXT_TYPE}>",
+    f"std::sys::thread_local::native::lazy::Storage<{CONTEXT_TYPE}, ()>",
+    f"std::thread::local::fast::Key<{CONTEXT_TYPE}>",
+)
+
+
+def _offset_of_type(gdb_type: gdb.Type, type_name: str, depth: int = 4):
+    """Byte offset of the first nested field whose type is `type_name`, or None."""
+    gdb_type = gdb_type.strip_typedefs()
+    if gdb_type.name == type_name:
+        return 0
+    if depth < 0 or gdb_type.code not in (gdb.TYPE_CODE_STRUCT, gdb.TYPE_CODE_UNION):
+        return None
+    for field in gdb_type.fields():
+        if not hasattr(field, "bitpos"):
+            continue
+        found = _offset_of_type(field.type, type_name, depth - 1)
+        if found is not None:
+            return field.bitpos // 8 + found
+    return None
+
 
 class ContextTracer(Tracer):
     """
-    A highly specialized tracer that finds the Tokio CONTEXT variable by
-    calling an external C program to perform the complex memory parsing.
+    A highly specialized tracer that finds the Tokio CONTEXT thread-local of
+    the current thread. The address is computed in-process from the ELF TLS
+    layout and the thread pointer (see `TLSResolver`), cached per thread.
     """
+    _resolver = None
+    _context_offset = None
+
     def __init__(self):
         super().__init__()
 
+    @classmethod
+    def _resolve_context_offset(cls, context_type: gdb.Type) -> int:
+        """Where `Context` sits inside the thread-local's storage."""
+        if cls._context_offset is None:
+            if cls._resolver.symbol_size == context_type.sizeof:
+                cls._context_offset = 0
+            else:
+                for storage_name in CONTEXT_STORAGE_TYPES:
+                    try:
+                        storage_type = gdb.lookup_type(storage_name)
+                    except gdb.error:
+                        continue
+                    cls._context_offset = _offset_of_type(storage_type, CONTEXT_TYPE)
+                    if cls._context_offset is not None:
+                        break
+                else:
+                    raise gdb.error("could not locate Context inside the CONTEXT thread-local storage")
+        return cls._context_offset
+
     def start(self, inferior_thread: gdb.Thread):
         try:
             inferior_thread.switch()
-            
-            # 1. Get the Header pointer from self.ptr.pointer
-            header_ptr_val = gdb.parse_and_eval("self.ptr.pointer")
-            header_addr = int(header_ptr_val)
-
-            # 2. Get the vtable from the Header struct
-            vtable_ptr_val = header_ptr_val.dereference()['vtable']
-            
-            # 3. Get the scheduler_offset from the VTable struct
-            vtable_struct = vtable_ptr_val.dereference()
-            scheduler_offset = int(vtable_struct['scheduler_offset'])
-            
-            # 4. Calculate the address of the scheduler Handle
-            scheduler_addr = header_addr + scheduler_offset
-            
-            # 5. Call the external C program to get the context address
-            result = subprocess.run(
-                ['./gdb_debugger/get_context', hex(scheduler_addr)],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode != 0:
-                self.data = f"Error: get_context helper failed: {result.stderr}"
-                return
-
-            context_addr = int(result.stdout.strip(), 16)
-            
-            # 6. Cast this raw address to a gdb.Value
-            context_type = gdb.lookup_type("tokio::runtime::context::Context")
+            if ContextTracer._resolver is None:
+                ContextTracer._resolver = TLSResolver(CONTEXT_SYMBOL)
+
+            context_type = gdb.lookup_type(CONTEXT_TYPE)
+            context_addr = self._resolver.address(inferior_thread) + self._resolve_context_offset(context_type)
             self.data = gdb.Value(context_addr).cast(context_type.pointer())
 
-        except (gdb.error, gdb.MemoryError) as e:
+        except (gdb.error, gdb.MemoryError, OSError) as e:
             self.data = f"Error: {e}"
-            print(f"[gdb_debugger] tracer warning: could not trace CONTEXT from helper: {e}")
+            print(f"[gdb_debugger] tracer warning: could not resolve CONTEXT thread-local: {e}")
 
     def stop(self):
         pass
         
     def __str__(self) -> str:
-        return "ContextTracer" 
\ No newline at end of file
+        return "ContextTracer"
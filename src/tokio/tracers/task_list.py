@@ -1,5 +1,6 @@
-from ...core.tracers.base import Tracer
+from core.tracers.base import Tracer
 import gdb
+import struct
 
 class TaskListTracer(Tracer):
     """
@@ -43,4 +44,151 @@ class TaskListTracer(Tracer):
         pass
         
     def __str__(self) -> str:
-        return "TaskListTracer" 
\ No newline at end of file
+        return "TaskListTracer" 
+
+HEADER_TYPE = "tokio::runtime::task::core::Header"
+TRAILER_TYPE = "tokio::runtime::task::core::Trailer"
+VTABLE_TYPE = "tokio::runtime::task::raw::Vtable"
+
+
+def _field_offset(gdb_type: gdb.Type, name: str, depth: int = 6):
+    """
+    Byte offset of the first field called `name`, searching depth-first
+    through nested structs (e.g. `UnsafeCell`/`Mutex` wrappers). Returns
+    `(offset, field_type)`, or `None` when there is no such field.
+    """
+    gdb_type = gdb_type.strip_typedefs()
+    if depth < 0 or gdb_type.code not in (gdb.TYPE_CODE_STRUCT, gdb.TYPE_CODE_UNION):
+        return None
+    for field in gdb_type.fields():
+        if field.name == name:
+            return field.bitpos // 8, field.type
+    for field in gdb_type.fields():
+        if not hasattr(field, "bitpos"):
+            continue
+        found = _field_offset(field.type, name, depth - 1)
+        if found is not None:
+            return field.bitpos // 8 + found[0], found[1]
+    return None
+
+
+class OwnedTasksWalker:
+    """
+    Enumerates the task headers linked into a tokio `OwnedTasks` list.
+
+    Field offsets are resolved once from the debug info; the walk itself
+    only issues raw `read_memory` calls and decodes them with `struct`,
+    usually one read per task: the read covers the header up to the
+    `next` pointer of the previous task's layout, since tasks of the same
+    future type share a vtable. Handles both the single `LinkedList` and
+    the `ShardedList` (tokio >= 1.37) layouts.
+    """
+    # Largest single read used to fetch a task's header and trailer together.
+    MAX_SPAN = 4096
+
+    def __init__(self, max_tasks: int = 1_000_000):
+        self.max_tasks = max_tasks
+        self._layout = None
+        self._trailer_offsets = {} # vtable address -> Vtable::trailer_offset
+
+    def _resolve_layout(self):
+        if self._layout is not None:
+            return self._layout
+        header = gdb.lookup_type(HEADER_TYPE)
+        trailer = gdb.lookup_type(TRAILER_TYPE)
+        vtable = gdb.lookup_type(VTABLE_TYPE)
+        owned = _field_offset(trailer, "owned")
+        next_in_pointers = owned and _field_offset(owned[1], "next")
+        vtable_field = _field_offset(header, "vtable")
+        trailer_offset_field = _field_offset(vtable, "trailer_offset")
+        if not (next_in_pointers and vtable_field and trailer_offset_field):
+            raise gdb.error("unrecognized tokio task layout (Header/Trailer/Vtable fields not found)")
+
+        ptr_size = gdb.lookup_type("usize").sizeof
+        self._layout = {
+            "ptr_size": ptr_size,
+            "ptr_format": "<Q" if ptr_size == 8 else "<I",
+            "vtable": vtable_field[0],
+            "next": owned[0] + next_in_pointers[0],
+            "trailer_offset": trailer_offset_field[0],
+        }
+        return self._layout
+
+    def _read_pointer(self, inferior, address: int) -> int:
+        layout = self._layout
+        return struct.unpack(layout["ptr_format"], inferior.read_memory(address, layout["ptr_size"]))[0]
+
+    def _trailer_offset(self, inferior, vtable_addr: int) -> int:
+        offset = self._trailer_offsets.get(vtable_addr)
+        if offset is None:
+            offset = self._read_pointer(inferior, vtable_addr + self._layout["trailer_offset"])
+            self._trailer_offsets[vtable_addr] = offset
+        return offset
+
+    def list_heads(self, owned_tasks_val: gdb.Value):
+        """Addresses of the first task in each list (shard) of `OwnedTasks`."""
+        layout = self._resolve_layout()
+        inferior = gdb.selected_inferior()
+        task_list = owned_tasks_val['list']
+        list_type = task_list.type.strip_typedefs()
+
+        head = _field_offset(list_type, "head", depth=0)
+        if head is not None:
+            return [self._read_pointer(inferior, int(task_list.address) + head[0])]
+
+        # ShardedList: `lists` is a Box<[Mutex<LinkedList>]>; read every shard in one go.
+        lists = task_list['lists']
+        shard_count = int(lists['length'])
+        data_ptr = lists['data_ptr']
+        shard_type = data_ptr.type.strip_typedefs().target()
+        head = _field_offset(shard_type, "head")
+        if head is None:
+            raise gdb.error(f"no `head` field in {shard_type}")
+        stride = shard_type.sizeof
+        buf = bytes(inferior.read_memory(int(data_ptr), stride * shard_count))
+        return [
+            struct.unpack_from(layout["ptr_format"], buf, index * stride + head[0])[0]
+            for index in range(shard_count)
+        ]
+
+    def walk(self, owned_tasks_val: gdb.Value):
+        """
+        Returns the header address of every task in the list, in list order.
+        Stops at a repeated node (a torn list read from a running process)
+        or after `max_tasks` entries.
+        """
+        layout = self._resolve_layout()
+        inferior = gdb.selected_inferior()
+        ptr_format = layout["ptr_format"]
+        ptr_size = layout["ptr_size"]
+        vtable_at = layout["vtable"]
+        header_span = vtable_at + ptr_size
+        span = header_span
+
+        headers = []
+        visited = set()
+        for node in self.list_heads(owned_tasks_val):
+            while node and node not in visited:
+                if len(headers) >= self.max_tasks:
+                    print(f"[gdb_debugger] task list walk stopped at {self.max_tasks} tasks")
+                    return headers
+                visited.add(node)
+                headers.append(node)
+
+                try:
+                    buf = inferior.read_memory(node, span)
+                except gdb.MemoryError:
+                    # `span` fits the previous task's type; this one may be smaller
+                    # and end at the edge of a mapping.
+                    if span == header_span:
+                        raise
+                    buf = inferior.read_memory(node, header_span)
+                vtable_addr = struct.unpack_from(ptr_format, buf, vtable_at)[0]
+                next_at = self._trailer_offset(inferior, vtable_addr) + layout["next"]
+                if next_at + ptr_size <= len(buf):
+                    node = struct.unpack_from(ptr_format, buf, next_at)[0]
+                else:
+                    node = self._read_pointer(inferior, node + next_at)
+                # Size the next read for this task type, if it is small enough.
+                span = next_at + ptr_size if next_at + ptr_size <= self.MAX_SPAN else header_span
+        return headers
@@ -0,0 +1,116 @@
+import gdb
+from elftools.elf.elffile import ELFFile
+
+# Size of the thread control block that precedes the static TLS blocks on
+# "variant I" architectures (thread pointer at the TCB, TLS blocks above it).
+_VARIANT_I_TCB_SIZE = {
+    "EM_AARCH64": 16,
+    "EM_RISCV": 0,
+}
+
+# Register holding the thread pointer, per architecture.
+_THREAD_POINTER_REGISTER = {
+    "EM_X86_64": "fs_base",
+    "EM_AARCH64": "tpidr",
+    "EM_RISCV": "tp",
+}
+
+
+def _round_up(value: int, align: int) -> int:
+    return (value + align - 1) // align * align if align > 1 else value
+
+
+class TLSResolver:
+    """
+    Resolves the address of a `#[thread_local]` static of the main executable
+    for a given thread, entirely in-process.
+
+    The ELF is read once for the PT_TLS segment and the STT_TLS symbol; the
+    address is then the thread pointer register plus the static TLS offset
+    (local-exec model, as laid out by glibc), and is cached per thread.
+    Where glibc's layout is not reproduced here - a variant I segment whose
+    p_vaddr is not a multiple of its alignment - GDB evaluates the address.
+    """
+    def __init__(self, symbol_fragment: str):
+        # Substring of the mangled symbol name, e.g. "5tokio7runtime7context7CONTEXT".
+        self.symbol_fragment = symbol_fragment
+        # (filename, machine, symbol name, symbol value, symbol size, block offset or None) once loaded
+        self._module = None
+        self._per_thread = {} # ptid -> resolved address
+        if hasattr(gdb.events, "thread_exited"):
+            gdb.events.thread_exited.connect(self._on_thread_exited)
+        gdb.events.exited.connect(self._on_exited)
+
+    def _on_thread_exited(self, event):
+        # ptids are reused by later threads, whose TLS block lives elsewhere.
+        self._per_thread.pop(event.inferior_thread.ptid, None)
+
+    def _on_exited(self, event):
+        self._per_thread.clear()
+
+    def _load_module(self):
+        filename = gdb.current_progspace().filename
+        if self._module is not None and self._module[0] == filename:
+            return self._module
+        if not filename:
+            raise gdb.error("no executable loaded")
+
+        with open(filename, "rb") as f:
+            elf = ELFFile(f)
+            machine = elf["e_machine"]
+            tls_segment = next((seg for seg in elf.iter_segments() if seg["p_type"] == "PT_TLS"), None)
+            if tls_segment is None:
+                raise gdb.error(f"{filename} has no PT_TLS segment")
+            symtab = elf.get_section_by_name(".symtab")
+            if symtab is None:
+                raise gdb.error(f"{filename} has no .symtab; thread-locals cannot be located")
+            symbol = next(
+                (sym for sym in symtab.iter_symbols()
+                 if sym["st_info"]["type"] == "STT_TLS" and self.symbol_fragment in sym.name),
+                None,
+            )
+            if symbol is None:
+                raise gdb.error(f"no thread-local symbol matching {self.symbol_fragment!r}")
+
+            align = max(1, tls_segment["p_align"])
+            memsz = tls_segment["p_memsz"]
+            # l_tls_firstbyte_offset in glibc
+            firstbyte_offset = tls_segment["p_vaddr"] & (align - 1)
+            if machine in _VARIANT_I_TCB_SIZE:
+                # Variant I: the block starts after the TCB, above the thread pointer.
+                block_offset = _round_up(_VARIANT_I_TCB_SIZE[machine], align) if firstbyte_offset == 0 else None
+            elif machine == "EM_X86_64":
+                # Variant II: the block ends at the thread pointer (_dl_determine_tlsoffset, TLS_TCB_AT_TP).
+                firstbyte = -firstbyte_offset & (align - 1)
+                block_offset = -(_round_up(memsz - firstbyte, align) + firstbyte)
+            else:
+                raise gdb.error(f"thread-local resolution not supported on {machine}")
+
+        self._module = (filename, machine, symbol.name, symbol["st_value"], symbol["st_size"], block_offset)
+        self._per_thread.clear()
+        return self._module
+
+    @property
+    def symbol_size(self) -> int:
+        return self._load_module()[4]
+
+    def address(self, inferior_thread: gdb.Thread) -> int:
+        """Address of the thread-local in `inferior_thread`; it must be selected."""
+        address = self._per_thread.get(inferior_thread.ptid)
+        if address is not None:
+            return address
+
+        _, machine, symbol_name, symbol_offset, _, block_offset = self._load_module()
+        if block_offset is None:
+            address = int(gdb.parse_and_eval(f"&'{symbol_name}'"))
+            self._per_thread[inferior_thread.ptid] = address
+            return address
+
+        register = _THREAD_POINTER_REGISTER[machine]
+        thread_pointer = int(gdb.selected_frame().read_register(register))
+        if thread_pointer == 0:
+            raise gdb.error(f"${register} is zero; thread pointer unavailable")
+
+        address = thread_pointer + block_offset + symbol_offset
+        self._per_thread[inferior_thread.ptid] = address
+        return address
@@ -1,4 +1,4 @@
-from ...core.tracers.base import Tracer
+from core.tracers.base import Tracer
 import gdb
 import struct
 
@@ -0,0 +1,65 @@
+"""
+Tests for the regex pre-filter of src/core/callgraph.py. conftest.py makes
+`core` importable without GDB.
+"""
+import json
+
+from core.callgraph import CallGraph, _required_literals
+
+
+def test_plain_literals():
+    assert _required_literals(r"tokio::runtime::.*::poll") == ["tokio::runtime::", "::poll"]
+    assert _required_literals(r"a\.b") == ["a.b"]
+
+
+def test_optional_and_alternation():
+    assert _required_literals(r"polls?") == ["poll"]
+    assert _required_literals(r"poll|wake") == []
+
+
+def test_escapes_contribute_no_digits():
+    assert _required_literals(r"\x70oll") == ["oll"]
+    assert _required_literals(r"\u0070oll") == ["oll"]
+    assert _required_literals(r"\N{LATIN SMALL LETTER P}oll") == ["oll"]
+    assert _required_literals(r"\0123") == ["3"]  # \012, then a literal 3
+    assert _required_literals(r"(p)\1oll") == ["oll"]
+    assert _required_literals(r"\dpoll") == ["poll"]
+
+
+def test_find_nodes_with_escaped_regex():
+    graph = CallGraph({"n1": "app::Task::poll", "n2": "app::Task::wake"}, {})
+    assert graph.find_nodes(r"\x70oll", regex=True) == graph.find_nodes(r"poll", regex=True)
+    assert graph.find_nodes(r"\x70oll", regex=True)
+
+
+def _write_dot(tmp_path):
+    dot = tmp_path / "graph.dot"
+    dot.write_text('n1 [label="{app::main}"];\nn2 [label="{app::run}"];\nn1 -> n2;\n')
+    return dot
+
+
+def test_cache_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    dot = _write_dot(tmp_path)
+    CallGraph.from_dot(dot, use_cache=True)
+    assert CallGraph._cache_path(dot).exists()
+    graph = CallGraph._load_cache(dot)
+    assert graph.find_nodes("app::run") == ["app::run"]
+    assert graph.descendants(["app::main"], 1) == {"app::run"}
+
+
+def test_cache_that_is_not_a_dict_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    dot = _write_dot(tmp_path)
+    cache_path = CallGraph._cache_path(dot)
+    cache_path.parent.mkdir(parents=True)
+    cache_path.write_text(json.dumps(["not", "a", "dict"]))
+    graph = CallGraph.from_dot(dot, use_cache=True)
+    assert graph.find_nodes("app::run") == ["app::run"]
+
+
+def test_budget_skips_uncounted_descendants():
+    graph = CallGraph({"n1": "app::main", "n2": "app::a", "n3": "app::b", "n4": "app::c"},
+                      {"app::main": {"app::a", "app::b"}, "app::b": {"app::c"}})
+    reach = graph.descendants_by_seed(["app::main"], 2, budget=1, uncounted={"app::a"})
+    assert reach["app::main"] == {"app::a": 1, "app::b": 1}
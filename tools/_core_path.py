@@ -0,0 +1,18 @@
+"""
+Makes the debugger's `core` package importable outside GDB.
+
+core/__init__.py needs GDB, so importing this module registers `core` as a
+bare package over src/core instead, and its submodules (core.callgraph,
+core.dwarf.*) then import on their own. Used by the tools in this directory
+and by tests/conftest.py.
+"""
+import sys
+import types
+from pathlib import Path
+
+CORE_PATH = Path(__file__).resolve().parents[1] / "src" / "core"
+
+if "core" not in sys.modules:
+    _core = types.ModuleType("core")
+    _core.__path__ = [str(CORE_PATH)]
+    sys.modules["core"] = _core
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Memory/time benchmark for the async backtrace store.
+
+Replays synthetic poll events through the store used by the debugger
+(`src/core/runtime_plugins/async_backtrace_data.py`) and, for comparison,
+through the previous representation (a 10-key dict per event holding a copy
+of the stack as a list of strings). Stacks share a runtime prefix
+(worker -> scheduler -> harness) and differ in their future chain, like real
+tokio captures.
+
+Example:
+  ./tools/bench_async_store.py --events 1000000
+"""
+import argparse
+import gc
+import importlib.util
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
+# The runtime_plugins package needs GDB, so load the data module by path.
+_DATA_PATH = Path(__file__).resolve().parents[1] / "src" / "core" / "runtime_plugins" / "async_backtrace_data.py"
+_spec = importlib.util.spec_from_file_location("async_backtrace_data", _DATA_PATH)
+async_backtrace_data = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(async_backtrace_data)
+
+RUNTIME_PREFIX = [
+    "std::sys::pal::unix::thread::Thread::new::thread_start",
+    "std::thread::Builder::spawn_unchecked_::{{closure}}",
+    "tokio::runtime::blocking::pool::Inner::run",
+    "tokio::runtime::scheduler::multi_thread::worker::run",
+    "tokio::runtime::scheduler::multi_thread::worker::Context::run",
+    "tokio::runtime::scheduler::multi_thread::worker::Context::run_task",
+    "tokio::runtime::task::raw::poll",
+    "tokio::runtime::task::harness::Harness<T,S>::poll",
+    "tokio::runtime::task::core::Core<T,S>::poll",
+]
+
+
+def synthetic_stacks(futures: int, max_depth: int, seed: int):
+    """Pool of distinct stacks: the runtime prefix plus a chain of futures."""
+    rng = random.Random(seed)
+    names = [f"app::module_{i % 17}::future_{i}::{{{{closure}}}}" for i in range(futures)]
+    stacks = []
+    for _ in range(futures * 4):
+        depth = rng.randint(1, max_depth)
+        stacks.append(RUNTIME_PREFIX + rng.sample(names, depth))
+    return stacks
+
+
+def events(count: int, stacks, seed: int):
+    rng = random.Random(seed)
+    for sequence in range(count):
+        yield sequence, rng.randrange(4), rng.randrange(64), stacks[rng.randrange(len(stacks))]
+
+
+def run_baseline(count: int, stacks, seed: int):
+    records = []
+    current = {}
+    for sequence, tid, coroutine, frames in events(count, stacks, seed):
+        previous = current.get((tid, coroutine), [])
+        stack = list(frames)
+        current[(tid, coroutine)] = stack
+        records.append({
+            "event": "entry" if len(stack) > len(previous) else "exit",
+            "coroutine": coroutine,
+            "future": frames[-1],
+            "future_offset": 0,
+            "stack_depth": len(stack),
+            "stack_snapshot": list(stack),
+            "process_id": 1,
+            "thread_id": tid,
+            "thread_update_sequence": sequence,
+            "thread_update_timestamp": float(sequence),
+        })
+    return records
+
+
+def run_store(count: int, stacks, seed: int):
+    store = async_backtrace_data.async_backtrace_store
+    store.clear()
+    Event = async_backtrace_data.AsyncStackEvent
+    records = []
+    for sequence, tid, coroutine, frames in events(count, stacks, seed):
+        previous = store.get_stack(1, tid, coroutine)
+        stack = store.set_stack(1, tid, coroutine, frames)
+        records.append(Event("entry" if store.trie.depth(stack) > store.trie.depth(previous) else "exit",
+                             coroutine, frames[-1], 0, stack, 1, tid, sequence, float(sequence)))
+    return records, store
+
+
+def measure(label: str, fn, *args):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {elapsed:>8.2f}s {current / 2**20:>10.1f} MiB")
+    return result
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    p.add_argument('--events', type=int, default=1_000_000, help='Number of synthetic events (default: 1000000)')
+    p.add_argument('--futures', type=int, default=200, help='Distinct future names (default: 200)')
+    p.add_argument('--max-depth', type=int, default=12, help='Maximum future chain depth (default: 12)')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--skip-baseline', action='store_true', help='Only measure the current store')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    stacks = synthetic_stacks(args.futures, args.max_depth, args.seed)
+    print(f"{args.events} events over {len(stacks)} distinct stacks")
+    print(f"{'':<10} {'time':>9} {'retained':>14}")
+    if not args.skip_baseline:
+        baseline = measure("dicts", run_baseline, args.events, stacks, args.seed)
+        del baseline
+    records, store = measure("store", run_store, args.events, stacks, args.seed)
+    print(f"store: {len(store.trie.frames.names)} interned frames, {len(store.trie)} trie nodes, {len(records)} events")
+
+
+if __name__ == '__main__':
+    main()
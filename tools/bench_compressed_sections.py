@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark of reading DWARF from a binary with compressed debug sections
+(`-Z debuginfo-compression=zlib|zstd`, or `objcopy --compress-debug-sections`).
+
+Each mode loads the DWARF, then reads the top DIE of every CU (what
+init-dwarf-analysis does with DWARF_LAZY_CUS off) and, with --dies, every
+DIE of the first CUs:
+
+- eager:  stock pyelftools - `ELFFile.get_dwarf_info()` decompresses every
+          debug section into memory up front (zlib only: it fails on zstd);
+- lazy:   `read_dwarf(..., mmap_sections=True)` - each section is
+          decompressed on first access, no cache;
+- cold:   lazy, with an empty `SectionCache`: decompress, write to the
+          cache, map the cached file;
+- warm:   lazy, with the cache from the cold run: map, don't decompress.
+
+Every mode runs in a process of its own so that peak RSS is its own; peak
+Python allocations come from tracemalloc. The trade-off to read off: lazy
+saves the sections never touched, the cache turns the rest from private
+memory into page cache that other sessions share, and a warm cache skips
+decompression entirely, at the cost of the decompressed size on disk.
+
+Example:
+  ./tools/bench_compressed_sections.py target/release/app --dies 20
+"""
+import argparse
+import json
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import _core_path # noqa: F401 - `core` without GDB
+
+MODES = ("eager", "lazy", "cold", "warm")
+
+
+def load(binary, mode, cache_dir):
+    if mode == "eager":
+        from elftools.elf.elffile import ELFFile
+        # The file stays open; pyelftools reads the uncompressed sections through it
+        return ELFFile(open(binary, 'rb')).get_dwarf_info()
+    from core.dwarf.formats import read_dwarf
+    from core.dwarf.compressed import SectionCache
+    cache = SectionCache(cache_dir) if mode in ("cold", "warm") else None
+    return read_dwarf(binary, lambda arches, title=None, message=None: 0, True, cache)
+
+
+def measure(binary, mode, cache_dir, dies):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        di = load(binary, mode, cache_dir)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    if not di:
+        sys.exit(f"No DWARF information in {binary}")
+    loaded = time.perf_counter() - started
+    read = 0
+    for (i, cu) in enumerate(di.iter_CUs()):
+        cu.get_top_DIE()
+        if i < dies:
+            read += sum(1 for _ in cu.iter_DIEs())
+    total = time.perf_counter() - started
+    (_, peak) = tracemalloc.get_traced_memory()
+    from core.dwarf.formats import compressed_section_stats
+    (decompressed, compressed) = compressed_section_stats(di) if mode != "eager" else (None, None)
+    return {
+        "load": loaded,
+        "total": total,
+        "peak_mb": peak / (1 << 20),
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "dies": read,
+        "sections": f"{decompressed}/{compressed}" if compressed is not None else "all",
+    }
+
+
+def run(binary, mode, cache_dir, dies):
+    output = subprocess.run([sys.executable, __file__, binary, '--mode', mode, '--cache-dir', cache_dir,
+                             '--dies', str(dies)], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    p.add_argument('binary', help='Executable with compressed debug sections')
+    p.add_argument('--dies', type=int, default=0, help='Also read every DIE of the first N CUs (default: 0)')
+    p.add_argument('--mode', choices=MODES, help=argparse.SUPPRESS)
+    p.add_argument('--cache-dir', help=argparse.SUPPRESS)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.mode:
+        print(json.dumps(measure(args.binary, args.mode, args.cache_dir, args.dies)))
+        return
+    cache_dir = tempfile.mkdtemp(prefix='bench-sections-')
+    try:
+        print(f"{'':<6} {'load':>8} {'total':>8} {'py peak':>9} {'max rss':>9} {'sections':>9} {'dies':>7}")
+        for mode in MODES:
+            r = run(args.binary, mode, cache_dir, args.dies)
+            if "error" in r:
+                print(f"{mode:<6} failed - {r['error']}")
+                continue
+            print(f"{mode:<6} {r['load']:>7.2f}s {r['total']:>7.2f}s {r['peak_mb']:>7.1f}MB "
+                  f"{r['rss_mb']:>7.1f}MB {r['sections']:>9} {r['dies']:>7}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
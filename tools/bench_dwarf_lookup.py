@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the name lookups used by start-async-debug's DWARF searches.
+
+Resolves every future struct (`{async_fn_env#N}` / `{async_block_env#N}`)
+found in a binary by its namespace path, then pairs it with its poll
+function, twice:
+
+- tree:    `load_children(die, True)` (the tree view's sorted children) and
+           a linear scan comparing `safe_DIE_name` at every level, as the
+           searches did before;
+- library: `LibraryTree`, children in file order with a name -> children
+           dict per parent (`src/core/dwarf/libtree.py`).
+
+Both start from freshly read DWARF. The first pass pays for parsing the DIEs
+and building the per-parent children; the repeat passes show the lookups
+alone, which is what later searches in a session cost.
+
+Example:
+  ./tools/bench_dwarf_lookup.py tests/tokio_test_project/target/debug/tokio_test_project
+"""
+import argparse
+import re
+import sys
+import time
+
+import _core_path # noqa: F401 - `core` without GDB
+
+from core.dwarf.formats import read_dwarf
+from core.dwarf.tree import load_children
+from core.dwarf.libtree import LibraryTree
+from core.dwarf.dwarfutil import safe_DIE_name
+
+FUTURE_STRUCT = re.compile(r'\{(async_fn|async_block)_env#(\d+)\}')
+
+
+def load(binary):
+    di = read_dwarf(binary, lambda arches, title=None, message=None: 0)
+    if not di:
+        sys.exit(f"No DWARF information in {binary}")
+    return [cu.get_top_DIE() for cu in di.iter_CUs()]
+
+
+def future_paths(top_dies, limit):
+    """Namespace paths of the future structs, from one full pass over the DIEs."""
+    paths = []
+    for top_die in top_dies:
+        for die in top_die.cu.iter_DIEs():
+            if die.tag == 'DW_TAG_structure_type' and FUTURE_STRUCT.search(safe_DIE_name(die, "")):
+                path = []
+                node = die
+                while node is not None and node.tag != 'DW_TAG_compile_unit':
+                    path.append(safe_DIE_name(node, ""))
+                    node = node.get_parent()
+                paths.append(path[::-1])
+                if len(paths) >= limit:
+                    return paths
+    return paths
+
+
+def tree_search(parent, hierarchy, depth, matches):
+    load_children(parent, True)
+    for child in parent._children:
+        if safe_DIE_name(child, "") == hierarchy[depth]:
+            if depth == len(hierarchy) - 1:
+                if child.tag == 'DW_TAG_structure_type':
+                    matches.append(child)
+            else:
+                tree_search(child, hierarchy, depth + 1, matches)
+        if child.has_children:
+            tree_search(child, hierarchy, depth, matches)
+
+
+def tree_sibling(die, tag, fragment):
+    load_children(die._parent, True)
+    return next((s for s in die._parent._children if s.tag == tag and fragment in safe_DIE_name(s, "")), None)
+
+
+def library_search(tree, parent, hierarchy, depth, matches):
+    named = tree.named(parent, hierarchy[depth])
+    if depth == len(hierarchy) - 1:
+        matches.extend(d for d in named if d.tag == 'DW_TAG_structure_type')
+    else:
+        for child in named:
+            library_search(tree, child, hierarchy, depth + 1, matches)
+    for child in tree.children(parent):
+        if child.has_children:
+            library_search(tree, child, hierarchy, depth, matches)
+
+
+def lookup_all(top_dies, tree, paths, library):
+    found = paired = 0
+    for path in paths:
+        matches = []
+        for top_die in top_dies:
+            if library:
+                library_search(tree, top_die, path, 0, matches)
+            else:
+                tree_search(top_die, path, 0, matches)
+        found += bool(matches)
+        for future in matches[:1]:
+            base, counter = FUTURE_STRUCT.search(safe_DIE_name(future, "")).groups()
+            fragment = f"{{{base}#{counter}}}"
+            if library:
+                poll = tree.find_child(future._parent, 'DW_TAG_subprogram', fragment)
+            else:
+                poll = tree_sibling(future, 'DW_TAG_subprogram', fragment)
+            paired += poll is not None
+    return found, paired
+
+
+def run(binary, paths, library, repeat):
+    top_dies = load(binary)
+    tree = LibraryTree()
+    started = time.perf_counter()
+    found, paired = lookup_all(top_dies, tree, paths, library)
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(repeat):
+        lookup_all(top_dies, tree, paths, library)
+    return first, (time.perf_counter() - started) / max(repeat, 1), found, paired
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    p.add_argument('binary', help='Executable with DWARF information')
+    p.add_argument('--futures', type=int, default=200, help='Maximum future structs to resolve (default: 200)')
+    p.add_argument('--repeat', type=int, default=3, help='Timed passes after the first (default: 3)')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    paths = future_paths(load(args.binary), args.futures)
+    print(f"{len(paths)} future structs")
+    print(f"{'':<8} {'first':>9} {'repeat':>9} {'found':>6} {'paired':>7}")
+    for label, library in (("tree", False), ("library", True)):
+        first, repeat, found, paired = run(args.binary, paths, library, args.repeat)
+        print(f"{label:<8} {first:>8.2f}s {repeat:>8.3f}s {found:>6} {paired:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,15 @@
 """
 Extract a subgraph from a GraphViz DOT call graph.
 
-- Picks all nodes whose label matches a regex/pattern.
+- Picks all nodes whose (demangled) label matches a substring or regex.
 - Includes outgoing descendants up to a specified depth.
 - Writes a standalone DOT with nodes + intra-subgraph edges.
 
+Parsing, demangling and the label search index are shared with the debugger
+(`src/core/callgraph.py`) and cached as JSON under
+~/.cache/rust-future-tracing/call-graphs, so repeated queries against the
+same graph skip the parse.
+
 Example:
   ./tools/dot_subgraph.py \
     --input tests/tokio_test_project/target/debug/deps/tokio_test_project-*.callgraph.dot \
@@ -17,10 +22,12 @@ If --input is a glob, the first match is used.
 """
 import argparse
 import glob
-import re
-from collections import defaultdict, deque
+import time
 from pathlib import Path
 
+import _core_path  # noqa: F401 - `core` without GDB
+from core.callgraph import CallGraph
+
 
 def parse_args():
     p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
@@ -29,80 +36,10 @@ def parse_args():
     p.add_argument('--depth', type=int, default=3, help='Descendant depth to include (default: 3)')
     p.add_argument('--output', required=True, help='Output DOT path')
     p.add_argument('--regex', action='store_true', help='Treat pattern as regular expression (default: substring)')
+    p.add_argument('--no-cache', action='store_true', help='Do not read or write the parsed-graph cache')
     return p.parse_args()
 
 
-def read_dot(path: Path):
-    text = path.read_text()
-    lines = text.splitlines()
-    node_labels = {}
-    edges = defaultdict(set)
-
-    current = []
-    collecting = False
-    for line in lines:
-        stripped = line.strip()
-        if '->' in stripped and stripped.endswith(';'):
-            src_part, dst_part = stripped.split('->', 1)
-            src = src_part.strip()
-            dst = dst_part.rstrip(';').strip()
-            edges[src].add(dst)
-            continue
-        if '[' in stripped and 'label=' in stripped:
-            current = [stripped]
-            collecting = not stripped.endswith('];')
-            if not collecting:
-                joined = ''.join(current)
-                node_id = joined.split()[0]
-                m = re.search(r'label="(.*)"', joined)
-                label = m.group(1) if m else ''
-                node_labels[node_id] = label
-            continue
-        if collecting:
-            current.append(stripped)
-            if stripped.endswith('];'):
-                joined = ''.join(current)
-                node_id = joined.split()[0]
-                m = re.search(r'label="(.*)"', joined)
-                label = m.group(1) if m else ''
-                node_labels[node_id] = label
-                collecting = False
-                current = []
-
-    return node_labels, edges
-
-
-def select_subgraph(node_labels, edges, matcher, depth):
-    starts = [n for n, lbl in node_labels.items() if matcher(lbl)]
-    if not starts:
-        raise SystemExit('No nodes matched the given pattern')
-
-    selected = set(starts)
-    q = deque((n, 0) for n in starts)
-    while q:
-        node, d = q.popleft()
-        if d >= depth:
-            continue
-        for child in edges.get(node, ()):            
-            if child not in selected:
-                selected.add(child)
-                q.append((child, d + 1))
-    return selected
-
-
-def write_dot(path: Path, selected, node_labels, edges, name='subgraph'):
-    with path.open('w') as f:
-        f.write(f'digraph "{name}" {{\n')
-        for node in selected:
-            label = node_labels.get(node, node)
-            f.write(f'    {node} [label="{label}"];\n')
-        for src in selected:
-            for dst in edges.get(src, ()):            
-                if dst in selected:
-                    f.write(f'    {src} -> {dst};\n')
-        f.write('}\n')
-
-
 def main():
     args = parse_args()
 
@@ -112,19 +49,20 @@ def main():
         raise SystemExit(f'No files match: {args.input}')
     inp = Path(matches[0])
 
-    node_labels, edges = read_dot(inp)
+    started = time.perf_counter()
+    graph = CallGraph.from_dot(inp, use_cache=not args.no_cache)
+    loaded = time.perf_counter()
 
-    if args.regex:
-        pattern = re.compile(args.pattern)
-        matcher = lambda lbl: bool(pattern.search(lbl))
-    else:
-        matcher = lambda lbl: args.pattern in lbl
+    selected = graph.subgraph(args.pattern, args.depth, regex=args.regex)
+    queried = time.perf_counter()
+    if not selected:
+        raise SystemExit('No nodes matched the given pattern')
 
-    selected = select_subgraph(node_labels, edges, matcher, args.depth)
     out = Path(args.output)
     out.parent.mkdir(parents=True, exist_ok=True)
-    write_dot(out, selected, node_labels, edges, name=f'{args.pattern}_depth{args.depth}')
-    print(f'Wrote subgraph with {len(selected)} nodes to {out}')
+    graph.write_dot(out, selected, graph_name=f'{args.pattern}_depth{args.depth}')
+    print(f'Wrote subgraph with {len(selected)} nodes to {out} '
+          f'(load {loaded - started:.3f}s, query {(queried - loaded) * 1000:.1f}ms)')
 
 
 if __name__ == '__main__':